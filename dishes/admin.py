@@ -1,50 +1,109 @@
 from django.contrib import admin
-from .models import Category, Dishes, Drink, Reservation 
+from django.core.exceptions import PermissionDenied
+from django.db import transaction
+from django.db.models import OuterRef, Subquery
+from django.db.models.functions import ExtractIsoWeekDay
+from django.template.response import TemplateResponse
+from django.urls import path
+from django.utils import timezone
+from .archive import history_rows
+from .dietary import FLAGS, matching
+from .exports import export_response
+from .forms import MenuItemAdminForm
+from .menu import bump_menu_version
+from .models import (
+    Category, Dishes, Drink, OutboxEmail, Reservation, ReservationArchive, ReservationDaySummary, SlotCapacity,
+)
+from .outbox import queue_status_emails
+from .pagination import EstimatedCountPaginator, KeysetChangeList
+from .search import matching_ids, set_published
+from .summary import record_status_change
+
+HISTORY_LIMIT = 100 # Rows on the reservation history page.
+
+class DietaryFilter(admin.SimpleListFilter):
+    title = 'dietary attribute'
+    parameter_name = 'diet'
+
+    def lookups(self, request, model_admin):
+        return [(str(bit), label) for bit, _, label in FLAGS]
+
+    def queryset(self, request, queryset):
+        if self.value() in {str(bit) for bit, _, _ in FLAGS}:
+            return queryset.filter(matching(int(self.value()))) # An IN over the (status, dietary) index.
+        return queryset
 
 @admin.register(Category)
 class CategoryAdmin(admin.ModelAdmin):
-    list_display = ('name',)
+    list_display = ('name', 'display_order')
+    list_editable = ('display_order',) # Lets staff reorder the menu straight from the list.
     search_fields = ('name',)
 
 @admin.register(Dishes)
 class DishesAdmin(admin.ModelAdmin):
     list_display = ('title', 'category', 'price', 'status', 'created_on', 'author')
+    list_select_related = ('category', 'author') # Joins them instead of one query per row.
     search_fields = ('title', 'description')
-    list_filter = ('status', 'created_on', 'category')
+    list_filter = ('status', DietaryFilter, 'created_on', 'category')
     prepopulated_fields = {'slug': ('title',)}
+    form = MenuItemAdminForm # Dietary attributes as checkboxes.
     date_hierarchy = 'created_on'
 
     def change_status_to_published(self, request, queryset):
-        queryset.update(status=1)
+        queryset.update(status=1, updated_on=timezone.now()) # Keeps the menu's Last-Modified/ETag honest.
+        set_published(queryset, True) # update() sends no signals, so refresh the search index
+        bump_menu_version() # and retire the cached menu here.
         self.message_user(request, "Selected dishes successfully marked as Published.")
     change_status_to_published.short_description = "Mark selected dishes as Published" 
 
     def change_status_to_draft(self, request, queryset):
-        queryset.update(status=0)
+        queryset.update(status=0, updated_on=timezone.now()) # Keeps the menu's Last-Modified/ETag honest.
+        set_published(queryset, False) # update() sends no signals, so refresh the search index
+        bump_menu_version() # and retire the cached menu here.
         self.message_user(request, "Selected dishes successfully marked as Draft.")
     change_status_to_draft.short_description = "Mark selected dishes as Draft" 
 
+    def get_search_results(self, request, queryset, search_term):
+        # Looks the words up in the full-text index instead of scanning every
+        # title and description with LIKE; see dishes/search.py.
+        if not search_term.strip():
+            return queryset, False
+        return queryset.filter(pk__in=matching_ids('dish', search_term)), False
+
     actions = ['change_status_to_published', 'change_status_to_draft']
 
 
 @admin.register(Drink)
 class DrinkAdmin(admin.ModelAdmin):
     list_display = ('title', 'category', 'price', 'status', 'created_on', 'author')
+    list_select_related = ('category', 'author') # Joins them instead of one query per row.
     search_fields = ('title', 'description')
-    list_filter = ('status', 'created_on', 'category')
+    list_filter = ('status', DietaryFilter, 'created_on', 'category')
     prepopulated_fields = {'slug': ('title',)}
+    form = MenuItemAdminForm # Dietary attributes as checkboxes.
     date_hierarchy = 'created_on'
 
     def change_status_to_published(self, request, queryset):
-        queryset.update(status=1)
+        queryset.update(status=1, updated_on=timezone.now()) # Keeps the menu's Last-Modified/ETag honest.
+        set_published(queryset, True) # update() sends no signals, so refresh the search index
+        bump_menu_version() # and retire the cached menu here.
         self.message_user(request, "Selected drinks successfully marked as Published.")
     change_status_to_published.short_description = "Mark selected drinks as Published" 
 
     def change_status_to_draft(self, request, queryset):
-        queryset.update(status=0)
+        queryset.update(status=0, updated_on=timezone.now()) # Keeps the menu's Last-Modified/ETag honest.
+        set_published(queryset, False) # update() sends no signals, so refresh the search index
+        bump_menu_version() # and retire the cached menu here.
         self.message_user(request, "Selected drinks successfully marked as Draft.")
     change_status_to_draft.short_description = "Mark selected drinks as Draft" 
 
+    def get_search_results(self, request, queryset, search_term):
+        # Looks the words up in the full-text index instead of scanning every
+        # title and description with LIKE; see dishes/search.py.
+        if not search_term.strip():
+            return queryset, False
+        return queryset.filter(pk__in=matching_ids('drink', search_term)), False
+
     actions = ['change_status_to_published', 'change_status_to_draft']
 
 
@@ -52,18 +111,158 @@ class DrinkAdmin(admin.ModelAdmin):
 class ReservationAdmin(admin.ModelAdmin):
     list_display = ('name', 'email', 'guests', 'date', 'time', 'status', 'created_on')
     search_fields = ('name', 'email')
+    # No date_hierarchy: its MIN/MAX and DISTINCT month queries walk every row.
+    # The created_on filter's ranges (today, past 7 days, ...) are index ranges.
     list_filter = ('status', 'date', 'created_on')
-    date_hierarchy = 'created_on'
     readonly_fields = ('created_on', 'updated_on')
+    # Millions of rows: count up to a limit and estimate past it, skip the
+    # unfiltered total and the per-filter facet counts, and page by keyset.
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    show_facets = admin.ShowFacets.NEVER
+
+    def get_changelist(self, request, **kwargs):
+        return KeysetChangeList
+
+    def get_urls(self):
+        return [
+            path('history/', self.admin_site.admin_view(self.history_view), name='dishes_reservation_history'),
+            *super().get_urls(),
+        ]
+
+    def history_view(self, request):
+        # Read-through history over the live and archived reservations, e.g.
+        # every booking of one customer, in one UNION ALL query.
+        if not self.has_view_permission(request):
+            raise PermissionDenied
+        query = request.GET.get('q', '').strip()
+        rows = history_rows(query, HISTORY_LIMIT)
+        for row in rows:
+            row['status_display'] = dict(Reservation.STATUS)[row['status']]
+        return TemplateResponse(request, 'admin/dishes/reservation/history.html', {
+            **self.admin_site.each_context(request),
+            'opts': self.opts,
+            'title': "Reservation history",
+            'query': query,
+            'rows': rows,
+            'limit': HISTORY_LIMIT,
+        })
+
+    def set_status(self, queryset, status):
+        # Only reservations whose status actually changes get an e-mail.
+        with transaction.atomic():
+            changed = list(queryset.exclude(status=status))
+            queryset.filter(pk__in=[r.pk for r in changed]).update(status=status)
+            record_status_change(changed, status) # update() sends no signals.
+            for reservation in changed:
+                reservation.status = status
+            queue_status_emails(changed, status) # Sent later by the send_outbox worker.
+
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        if change and 'status' in form.changed_data:
+            queue_status_emails([obj], obj.status)
 
     def mark_as_confirmed(self, request, queryset):
-        queryset.update(status=1)
+        self.set_status(queryset, 1)
         self.message_user(request, "Selected reservations marked as confirmed.")
     mark_as_confirmed.short_description = "Mark as confirmed"
 
     def mark_as_cancelled(self, request, queryset):
-        queryset.update(status=2)
+        self.set_status(queryset, 2)
         self.message_user(request, "Selected reservations marked as cancelled.")
     mark_as_cancelled.short_description = "Mark as cancelled"
 
-    actions = ['mark_as_confirmed', 'mark_as_cancelled']
+    # Exports stream straight from the database, so "select all" over a
+    # filtered list (e.g. a month or a year) is safe.
+    def export_as_csv(self, request, queryset):
+        return export_response(queryset.order_by('date', 'time', 'pk'), 'csv')
+    export_as_csv.short_description = "Export selected as CSV"
+
+    def export_as_ndjson(self, request, queryset):
+        return export_response(queryset.order_by('date', 'time', 'pk'), 'ndjson')
+    export_as_ndjson.short_description = "Export selected as NDJSON"
+
+    actions = ['mark_as_confirmed', 'mark_as_cancelled', 'export_as_csv', 'export_as_ndjson']
+
+
+@admin.register(ReservationArchive)
+class ReservationArchiveAdmin(admin.ModelAdmin):
+    # Past reservations moved out of the live table (see dishes/archive.py),
+    # browsed read-only.
+    list_display = ('name', 'email', 'guests', 'date', 'time', 'status', 'archived_on')
+    search_fields = ('name', 'email')
+    list_filter = ('status', 'date') # No date_hierarchy: its year links scan every row.
+    paginator = EstimatedCountPaginator # The archive only grows.
+    show_full_result_count = False
+    show_facets = admin.ShowFacets.NEVER
+    # Same columns as the live reservations' exports.
+    export_as_csv = ReservationAdmin.export_as_csv
+    export_as_ndjson = ReservationAdmin.export_as_ndjson
+    actions = ['export_as_csv', 'export_as_ndjson']
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(ReservationDaySummary)
+class ReservationDaySummaryAdmin(admin.ModelAdmin):
+    # Occupancy per day and slot, read from the summary table only, so the
+    # page costs the same however many reservations there are.
+    list_display = ('date', 'time', 'pending', 'confirmed', 'cancelled', 'guests', 'covers', 'occupancy')
+    list_filter = ('date',)
+    date_hierarchy = 'date'
+
+    def get_queryset(self, request):
+        # The slot's configured covers; SlotCapacity.weekday counts from Monday = 0.
+        capacity = SlotCapacity.objects.filter(
+            weekday=ExtractIsoWeekDay(OuterRef('date')) - 1, time=OuterRef('time'),
+        ).values('covers')
+        return super().get_queryset(request).annotate(capacity=Subquery(capacity))
+
+    def covers(self, obj):
+        return obj.capacity
+    covers.short_description = "Capacity"
+    covers.admin_order_field = 'capacity'
+
+    def occupancy(self, obj):
+        if not obj.capacity:
+            return "-"
+        return f"{obj.guests / obj.capacity:.0%}"
+
+    # Rows only change with the reservations; see dishes/summary.py.
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(SlotCapacity)
+class SlotCapacityAdmin(admin.ModelAdmin):
+    list_display = ('weekday', 'time', 'tables', 'covers')
+    list_editable = ('tables', 'covers')
+    list_filter = ('weekday',)
+
+
+@admin.register(OutboxEmail)
+class OutboxEmailAdmin(admin.ModelAdmin):
+    list_display = ('to_email', 'kind', 'status', 'attempts', 'created_on', 'sent_on')
+    list_filter = ('status', 'kind')
+    search_fields = ('to_email',)
+    paginator = EstimatedCountPaginator # The outbox keeps every e-mail ever sent.
+    show_full_result_count = False
+    readonly_fields = ('reservation', 'kind', 'to_email', 'subject', 'body', 'attempts', 'last_error', 'claimed_on', 'created_on', 'sent_on')
+
+    def retry(self, request, queryset):
+        queryset.update(status=0, attempts=0, claimed_on=None)
+        self.message_user(request, "Selected e-mails queued again.")
+    retry.short_description = "Queue selected e-mails again"
+
+    actions = ['retry']
@@ -4,3 +4,8 @@ from django.apps import AppConfig
 class DishesConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'dishes'
+
+    def ready(self):
+        from . import signals  # noqa: F401  Connects the menu cache invalidation receivers.
+        from . import profiling  # noqa: F401  Installs the SQL timer on new database connections.
+        from . import ratelimit  # noqa: F401  Registers the shared-cache deployment check.
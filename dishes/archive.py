@@ -0,0 +1,92 @@
+# dishes/archive.py
+
+# Hot/cold storage for reservations. Once a reservation's date is
+# RESERVATION_ARCHIVE_DAYS in the past it moves to ReservationArchive, so
+# availability checks and the admin's reservation list only ever work
+# through recent and upcoming bookings, however long the restaurant has
+# been open. Each batch is copied and deleted in its own short transaction,
+# so a run never holds locks for longer than one batch. The day summary
+# keeps counting archived reservations: moving them is not a cancellation.
+
+import datetime
+import time
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import BooleanField, Value
+from django.utils import timezone
+
+from .models import Reservation, ReservationArchive
+from .summary import suspended
+
+# Reservation columns copied to the archive, id included.
+ARCHIVE_FIELDS = ('id', 'name', 'email', 'phone', 'guests', 'date', 'time', 'status', 'created_on', 'updated_on')
+
+
+def archive_cutoff(days=None):
+    """Returns the first date that stays live: reservations before it get archived."""
+    if days is None:
+        days = getattr(settings, 'RESERVATION_ARCHIVE_DAYS', 365)
+    return timezone.localdate() - datetime.timedelta(days=days)
+
+
+def archive_batch(cutoff, batch_size=1000):
+    """Moves up to ``batch_size`` of the oldest reservations before ``cutoff`` to the archive; returns how many."""
+    with transaction.atomic(), suspended():
+        # Rows another transaction holds (e.g. an admin edit) wait for the next batch.
+        rows = list(
+            Reservation.objects.filter(date__lt=cutoff).order_by('date', 'pk')
+            .select_for_update(skip_locked=True).values(*ARCHIVE_FIELDS)[:batch_size]
+        )
+        if not rows:
+            return 0
+        # A rerun after a crash between the two statements finds the copies already there.
+        ReservationArchive.objects.bulk_create(
+            [ReservationArchive(**row) for row in rows], ignore_conflicts=True,
+        )
+        # Deleting through the ORM keeps the outbox's SET_NULL links right.
+        Reservation.objects.filter(pk__in=[row['id'] for row in rows]).delete()
+    return len(rows)
+
+
+def archive_reservations(cutoff, batch_size=1000, pause=0):
+    """
+    Archives every reservation before ``cutoff``, one batch per transaction,
+    sleeping ``pause`` seconds between batches to leave room for other
+    writers. Yields the size of each batch.
+    """
+    while True:
+        moved = archive_batch(cutoff, batch_size)
+        if not moved:
+            return
+        yield moved
+        if pause:
+            time.sleep(pause)
+
+
+def history_rows(query='', limit=100):
+    """
+    Returns the ``limit`` most recent reservations, live and archived, as
+    dicts with an ``archived`` flag: one UNION ALL query. ``query`` keeps
+    those of that e-mail address (when it has an @) or with it in the name.
+
+    Each table gives only its own ``limit`` most recent rows, read in date
+    index order, so the union sorts at most twice ``limit`` rows however
+    large the archive grows.
+    """
+    columns = [*ARCHIVE_FIELDS, 'archived']
+
+    def part(queryset, archived):
+        if '@' in query:
+            queryset = queryset.filter(email__iexact=query)
+        elif query:
+            queryset = queryset.filter(name__icontains=query)
+        # SQLite allows no LIMIT in the parts of a UNION, only in their subqueries.
+        newest = queryset.order_by('-date', '-time', '-id').values('pk')[:limit]
+        return (
+            queryset.model.objects.filter(pk__in=newest).order_by()
+            .annotate(archived=Value(archived, BooleanField())).values(*columns)
+        )
+
+    rows = part(Reservation.objects, False).union(part(ReservationArchive.objects, True), all=True)
+    return list(rows.order_by('-date', '-time', '-id')[:limit])
@@ -0,0 +1,81 @@
+# dishes/async_views.py
+
+# Async versions of the public views, served by my_project/urls_async.py
+# under ASGI (see my_project/asgi.py). They share their responses with
+# dishes/views.py; only the waiting on the database and the cache differs.
+# An event loop waiting on queries holds no worker thread, so a few ASGI
+# workers can keep many slow clients open at once.
+
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib import messages
+from django.http import JsonResponse
+from django.views.decorators.http import condition, require_GET, require_POST
+from .availability import SlotUnavailable, aavailable_slots, abook
+from .forms import ReservationForm
+from .menu import aget_menu_freshness, aget_menu_html
+from .search import search_menu
+from . import views
+
+def has_messages(request):
+    # Messages may live in the session, which is read synchronously.
+    return bool(len(messages.get_messages(request)))
+
+def prefetch_menu_validators(view):
+    # condition() calls its validator functions synchronously. Working them
+    # out here first, the same way views.menu_validators() does, leaves
+    # those calls nothing to query.
+    @wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        request._menu_validators = None
+        csrf_cookie = request.COOKIES.get(settings.CSRF_COOKIE_NAME)
+        if (
+            request.method in ('GET', 'HEAD')
+            and csrf_cookie
+            and not views.search_query(request)
+            and not views.dietary_query(request)
+            and not (await request.auser()).is_authenticated
+            and not await sync_to_async(has_messages)(request)
+        ):
+            last_modified, menu_etag = await aget_menu_freshness()
+            request._menu_validators = (last_modified, views.validator_etag(menu_etag, csrf_cookie))
+        return await view(request, *args, **kwargs)
+    return wrapper
+
+@require_POST
+@views.rate_limited
+async def reserve(request):
+    form = ReservationForm(request.POST)
+    # Form validation checks the slot with the synchronous ORM.
+    if await sync_to_async(form.is_valid)():
+        try:
+            await abook(form.save(commit=False))
+        except SlotUnavailable as error: # Another booking took the last seats meanwhile.
+            form.add_error(None, str(error))
+    return await sync_to_async(views.reserve_response)(request, form)
+
+@require_GET
+async def availability(request):
+    query = views.availability_query(request)
+    if query is None:
+        return JsonResponse({'error': views.AVAILABILITY_ERROR}, status=400)
+    day, guests = query
+    return views.availability_response(day, guests, await aavailable_slots(day, guests))
+
+@prefetch_menu_validators
+@condition(etag_func=views.index_etag, last_modified_func=views.index_last_modified)
+async def index(request):
+    if request.method == 'POST':
+        return await reserve(request)
+
+    query = views.search_query(request)
+    if query:
+        results = await sync_to_async(search_menu)(query)
+        menu_html = views.search_results_html(query, results)
+        return await sync_to_async(views.index_response)(request, menu_html, query=query)
+
+    menu_html, cache_hit = await aget_menu_html(views.dietary_query(request))
+    # Rendering reads the user and messages, which may query the database.
+    return await sync_to_async(views.index_response)(request, menu_html, cache_hit)
@@ -0,0 +1,141 @@
+# dishes/availability.py
+
+from asgiref.sync import sync_to_async
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, IntegerField, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+from .models import Reservation, ReservationSlot, SlotCapacity
+
+# Pending and confirmed reservations hold their seats; cancelled ones free them.
+ACTIVE_STATUSES = (0, 1)
+
+
+def _booked(day, field, aggregate):
+    # Correlated per-slot total, answered from the (date, time, status) index.
+    return Coalesce(
+        Subquery(
+            Reservation.objects.filter(date=day, time=OuterRef('time'), status__in=ACTIVE_STATUSES)
+            .order_by()
+            .values('time')
+            .annotate(total=aggregate(field))
+            .values('total'),
+            output_field=IntegerField(),
+        ),
+        Value(0),
+    )
+
+
+def slots_for(day):
+    """
+    Returns the configured slots of ``day`` with what is already booked.
+
+    Each SlotCapacity row is annotated with ``booked_covers`` and
+    ``booked_tables`` in one query, however many reservations exist.
+    """
+    return SlotCapacity.objects.filter(weekday=day.weekday()).annotate(
+        booked_covers=_booked(day, 'guests', Sum),
+        booked_tables=_booked(day, 'id', Count),
+    )
+
+
+def _fits(slot, guests):
+    return slot.booked_tables < slot.tables and slot.booked_covers + guests <= slot.covers
+
+
+def available_slots(day, guests):
+    """
+    Returns the slots on ``day`` that can still seat ``guests``.
+
+    Returns None when no capacity is configured for that weekday, meaning
+    bookings are not limited.
+    """
+    return _open_slots(list(slots_for(day)), guests)
+
+
+async def aavailable_slots(day, guests):
+    """Async available_slots()."""
+    return _open_slots([slot async for slot in slots_for(day)], guests)
+
+
+def _open_slots(slots, guests):
+    if not slots:
+        return None
+    return [
+        {
+            'time': slot.time,
+            'tables_left': slot.tables - slot.booked_tables,
+            'covers_left': slot.covers - slot.booked_covers,
+        }
+        for slot in slots if _fits(slot, guests)
+    ]
+
+
+def slot_error(day, slot_time, guests):
+    """Returns why ``guests`` cannot be booked at ``slot_time`` on ``day``, or None."""
+    slots = list(slots_for(day))
+    if not slots:
+        return None # No capacity configured for this weekday.
+    slot = next((s for s in slots if s.time == slot_time), None)
+    if slot is None:
+        times = ', '.join(f"{s.time:%H:%M}" for s in slots)
+        return f"We do not take reservations at that time. Available times: {times}."
+    if not _fits(slot, guests):
+        return "Sorry, this time slot is fully booked. Please choose another time."
+    return None
+
+
+class SlotUnavailable(Exception):
+    """Raised when a slot fills up between validating a booking and saving it."""
+
+
+def lock_slot(day, slot_time):
+    """
+    Locks the slot's ReservationSlot row until the transaction ends.
+
+    The UPDATE takes a row lock on PostgreSQL. SQLite has no row locks, but
+    a transaction that starts by writing takes the database write lock. Either
+    way, other bookings of the slot wait here until this one commits. Call it
+    first in the transaction: on SQLite, a transaction that has read before
+    it writes fails with "database is locked" instead of waiting.
+    """
+    while True:
+        if ReservationSlot.objects.filter(date=day, time=slot_time).update(lock_version=F('lock_version') + 1):
+            return
+        try:
+            with transaction.atomic():
+                ReservationSlot.objects.create(date=day, time=slot_time, lock_version=1)
+            return
+        except IntegrityError: # Another booking created the row first; lock that one.
+            continue
+
+
+def book(reservation):
+    """
+    Saves ``reservation`` if its slot still has room, atomically.
+
+    The capacity check and the INSERT run while holding the slot lock, so
+    parallel workers booking the same slot cannot overbook it. Raises
+    SlotUnavailable otherwise.
+    """
+    with transaction.atomic():
+        lock_slot(reservation.date, reservation.time) # Before any read, see lock_slot().
+        error = slot_error(reservation.date, reservation.time, reservation.guests)
+        if error:
+            raise SlotUnavailable(error)
+        reservation.save()
+    return reservation
+
+
+async def abook(reservation):
+    """
+    Async book().
+
+    Days without configured capacity have nothing to lock, so the
+    reservation is saved straight from the event loop. Otherwise book()
+    runs in a worker thread: Django's transactions are synchronous only.
+    """
+    if not await SlotCapacity.objects.filter(weekday=reservation.date.weekday()).aexists():
+        await reservation.asave()
+        return reservation
+    return await sync_to_async(book)(reservation)
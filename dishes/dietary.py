@@ -0,0 +1,64 @@
+# dishes/dietary.py
+
+# Dietary and allergen attributes of dishes and drinks, stored together as
+# the bits of their ``dietary`` column: 5 (0b101) is a vegetarian,
+# gluten-free item. Filtering for attributes means dietary & mask = mask;
+# with only 2 ** len(FLAGS) possible values, that is the same as
+# dietary IN (every value containing mask), which the (status, dietary)
+# indexes answer with a few range seeks instead of testing every row.
+
+from django.db.models import Count, IntegerField, Q, Value
+
+# (bit, name used in URLs and imports, label)
+FLAGS = (
+    (1, 'vegetarian', 'Vegetarian'),
+    (2, 'vegan', 'Vegan'),
+    (4, 'gluten_free', 'Gluten-free'),
+    (8, 'nut_free', 'Nut-free'),
+    (16, 'dairy_free', 'Dairy-free'),
+    (32, 'spicy', 'Spicy'),
+)
+BITS = {name: bit for bit, name, _ in FLAGS}
+ALL = sum(BITS.values())
+
+
+def parse(names):
+    """Returns the mask of attribute ``names`` ("gluten-free" works too); raises ValueError on unknown ones."""
+    mask = 0
+    for name in names:
+        name = name.strip().lower().replace('-', '_')
+        if not name:
+            continue
+        if name not in BITS:
+            raise ValueError(f"Unknown dietary attribute {name!r}; use any of: {', '.join(BITS)}.")
+        mask |= BITS[name]
+    return mask
+
+
+def labels(mask):
+    return [label for bit, _, label in FLAGS if mask & bit]
+
+
+def supersets(mask):
+    """Returns every dietary value with all the bits of ``mask`` set."""
+    return [value for value in range(ALL + 1) if value & mask == mask]
+
+
+def matching(mask):
+    """Returns a filter for the items with every attribute in ``mask``."""
+    return Q(dietary__in=supersets(mask)) if mask else Q()
+
+
+def count_row(queryset, mask=0):
+    """
+    Returns, as a single .values() row, how many items of ``queryset`` have
+    each attribute on top of ``mask``: one aggregate, ready for UNION ALL.
+    """
+    counts = {name: Count('pk', filter=matching(mask | bit)) for bit, name, _ in FLAGS}
+    return (
+        queryset.order_by()
+        .annotate(group=Value(1, IntegerField()))
+        .values('group')
+        .annotate(**counts)
+        .values(*BITS)
+    )
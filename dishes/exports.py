@@ -0,0 +1,53 @@
+# dishes/exports.py
+
+import csv
+import json
+
+from django.http import StreamingHttpResponse
+
+from .models import Reservation
+
+EXPORT_FIELDS = ('id', 'name', 'email', 'phone', 'guests', 'date', 'time', 'status', 'created_on')
+EXPORT_FORMATS = {
+    'csv': 'text/csv',
+    'ndjson': 'application/x-ndjson',
+}
+STATUS_LABELS = dict(Reservation.STATUS)
+
+
+class _Echo:
+    # csv.writer only needs write(); hand each formatted line straight back.
+    def write(self, value):
+        return value
+
+
+def export_lines(queryset, fmt, chunk_size=2000):
+    """
+    Yields ``queryset``'s reservations as CSV or NDJSON lines.
+
+    Rows are read as tuples with ``.iterator(chunk_size=...)`` (a server-side
+    cursor on PostgreSQL), so memory stays flat however many rows are exported.
+    """
+    rows = queryset.values_list(*EXPORT_FIELDS).iterator(chunk_size=chunk_size)
+    status_index = EXPORT_FIELDS.index('status')
+    if fmt == 'csv':
+        writer = csv.writer(_Echo())
+        yield writer.writerow(EXPORT_FIELDS)
+        for row in rows:
+            row = list(row)
+            row[status_index] = STATUS_LABELS.get(row[status_index], row[status_index])
+            yield writer.writerow(row)
+    elif fmt == 'ndjson':
+        for row in rows:
+            record = dict(zip(EXPORT_FIELDS, row))
+            record['status'] = STATUS_LABELS.get(record['status'], record['status'])
+            yield json.dumps(record, default=str) + '\n'
+    else:
+        raise ValueError(f"Unknown export format {fmt!r}; use one of {', '.join(EXPORT_FORMATS)}.")
+
+
+def export_response(queryset, fmt, filename='reservations'):
+    """Streams ``queryset`` as a file download in ``fmt``."""
+    response = StreamingHttpResponse(export_lines(queryset, fmt), content_type=EXPORT_FORMATS[fmt])
+    response['Content-Disposition'] = f'attachment; filename="{filename}.{fmt}"'
+    return response
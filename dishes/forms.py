@@ -2,6 +2,8 @@
 
 from django import forms
 from django.utils import timezone
+from .availability import slot_error
+from .dietary import FLAGS
 from .models import Reservation
 
 class ReservationForm(forms.ModelForm):
@@ -53,3 +55,46 @@ class ReservationForm(forms.ModelForm):
         if guests is not None and guests > 20:
             raise forms.ValidationError("Maximum 20 guests per reservation.")
         return guests
+
+    def clean(self):
+        """Validate that the chosen time slot still has room for the party"""
+        cleaned_data = super().clean()
+        date = cleaned_data.get('date')
+        time = cleaned_data.get('time')
+        guests = cleaned_data.get('guests')
+        if date and time and guests:
+            error = slot_error(date, time, guests)
+            if error:
+                raise forms.ValidationError(error)
+        return cleaned_data
+
+
+class DietaryField(forms.TypedMultipleChoiceField):
+    """Checkboxes for the dietary attributes, cleaned to their bitmask"""
+
+    widget = forms.CheckboxSelectMultiple
+
+    def __init__(self, **kwargs):
+        kwargs.setdefault('required', False)
+        super().__init__(choices=[(bit, label) for bit, _, label in FLAGS], coerce=int, **kwargs)
+
+    def prepare_value(self, value):
+        # The model stores the bitmask; the checkboxes want its bits.
+        if isinstance(value, int):
+            return [bit for bit, _, _ in FLAGS if value & bit]
+        return value
+
+    def clean(self, value):
+        return sum(super().clean(value))
+
+    def has_changed(self, initial, data):
+        try:
+            return self.clean(data) != (initial or 0)
+        except forms.ValidationError:
+            return True
+
+
+class MenuItemAdminForm(forms.ModelForm):
+    """Admin form for dishes and drinks, with the dietary bitmask as checkboxes"""
+
+    dietary = DietaryField(label="Dietary and allergens")
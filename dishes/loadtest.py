@@ -0,0 +1,438 @@
+# dishes/loadtest.py
+
+# Load generation for sizing and comparing deployments. run() sends GETs
+# at a fixed concurrency; run_mix() replays a dinner-rush traffic mix
+# (menu views, reservations, logins, admin pages) at each of a series of
+# concurrency levels, with virtual users that keep their own cookies and
+# CSRF tokens like browsers. serve() starts the app through
+# my_project/wsgi.py (gunicorn) or asgi.py (uvicorn) for a local run, and
+# scratch_database() gives it a copy of the database to book into.
+
+import json
+import os
+import random
+import socket
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import closing, contextmanager
+from datetime import date, timedelta
+from http.cookiejar import CookieJar
+from urllib.error import HTTPError
+from urllib.parse import urlencode, urljoin, urlsplit
+from urllib.request import HTTPCookieProcessor, HTTPRedirectHandler, Request, build_opener, urlopen
+
+from allauth.account.forms import LoginForm
+from django.conf import settings
+
+from .models import Reservation
+
+
+def fetch(url, timeout):
+    """Requests ``url`` and returns (ok, seconds taken)."""
+    started = time.perf_counter()
+    try:
+        with urlopen(url, timeout=timeout) as response:
+            response.read()
+        ok = True
+    except HTTPError as error: # 4xx and 5xx answers.
+        error.close()
+        ok = False
+    except OSError: # Refused, reset or timed out.
+        ok = False
+    return ok, time.perf_counter() - started
+
+
+def _percentile(ordered, share):
+    return ordered[min(len(ordered) - 1, int(share * len(ordered)))]
+
+
+def run(base_url, paths=('/',), requests=500, concurrency=20, timeout=30):
+    """
+    Sends ``requests`` GETs to ``base_url``, ``concurrency`` at a time.
+
+    ``paths`` are requested in turn. Each client thread waits for its answer
+    before sending the next request, so ``concurrency`` is the number of
+    connections the server holds open at once. Returns the throughput and
+    latency percentiles, in milliseconds, of the run.
+    """
+    urls = [urljoin(base_url, paths[i % len(paths)]) for i in range(requests)]
+    started = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as pool:
+        results = list(pool.map(lambda url: fetch(url, timeout), urls))
+    elapsed = time.perf_counter() - started
+
+    latencies = sorted(seconds * 1000 for _, seconds in results)
+    return {
+        'url': base_url,
+        'requests': requests,
+        'errors': sum(1 for ok, _ in results if not ok),
+        'seconds': elapsed,
+        'throughput': requests / elapsed,
+        'p50_ms': _percentile(latencies, 0.50),
+        'p95_ms': _percentile(latencies, 0.95),
+        'max_ms': latencies[-1],
+    }
+
+
+# Traffic mix of a busy evening: scenario -> share of iterations.
+DEFAULT_MIX = {'menu': 70, 'reserve': 15, 'login': 10, 'admin': 5}
+# Hosts whose bookings land in a database of this machine.
+LOCAL_HOSTS = ('localhost', '127.0.0.1', '::1')
+# Slots tried when a date has no configured capacity (see dishes/availability.py).
+DINNER_TIMES = ('18:00', '18:30', '19:00', '19:30', '20:00', '20:30', '21:00')
+ADMIN_PAGES = ('/admin/dishes/reservation/', '/admin/dishes/dishes/', '/admin/dishes/reservationdaysummary/')
+PERCENTILES = (0.50, 0.90, 0.95, 0.99)
+
+
+def password_login():
+    """Whether allauth's login form asks for a password; the shipped ACCOUNT_SIGNUP_FIELDS leave it out."""
+    return 'password' in LoginForm().fields
+
+
+def default_mix():
+    """Returns DEFAULT_MIX, without the login scenario when allauth logins take no password."""
+    if password_login():
+        return dict(DEFAULT_MIX)
+    return {name: weight for name, weight in DEFAULT_MIX.items() if name != 'login'}
+
+
+def is_local(url):
+    """Whether ``url`` points at this machine."""
+    return urlsplit(url).hostname in LOCAL_HOSTS
+
+
+def parse_mix(text):
+    """Parses a "menu=70,reserve=15" mix into {scenario: weight}; raises ValueError on bad input."""
+    mix = {}
+    for part in text.split(','):
+        name, _, weight = part.strip().partition('=')
+        if name not in SCENARIOS:
+            raise ValueError(f"Unknown scenario {name!r}; use any of: {', '.join(SCENARIOS)}.")
+        if not weight.isdigit():
+            raise ValueError(f"Give {name} a whole-number weight, e.g. {name}=10.")
+        mix[name] = int(weight)
+    if not any(mix.values()):
+        raise ValueError("The mix needs at least one scenario with a weight above 0.")
+    return mix
+
+
+class _NoRedirect(HTTPRedirectHandler):
+    # Redirects are answers too: a login's 302 is its success.
+    def redirect_request(self, *args, **kwargs):
+        return None
+
+
+class VirtualUser:
+    """
+    One simulated visitor: a cookie jar, a random generator and a list that
+    every response is recorded in as (scenario, started, seconds, status, ok).
+    """
+
+    def __init__(self, base_url, samples, rng, credentials=None, timeout=30):
+        self.base_url = base_url
+        self.samples = samples
+        self.random = rng
+        self.credentials = credentials
+        self.timeout = timeout
+        self.cookies = CookieJar()
+        self.opener = build_opener(HTTPCookieProcessor(self.cookies), _NoRedirect)
+        self.staff = False # Logged in to the admin.
+        self.visits = 0
+
+    def fresh(self):
+        """Returns a new visitor recording into the same samples, e.g. for a first login."""
+        return VirtualUser(self.base_url, self.samples, self.random, self.credentials, self.timeout)
+
+    def cookie(self, name):
+        return next((cookie.value for cookie in self.cookies if cookie.name == name), None)
+
+    def request(self, scenario, path, data=None, headers=None, expect=None):
+        """
+        Sends a GET, or a POST of form ``data`` with the CSRF token; returns
+        (status, body). The response counts as an error when its status is
+        not ``expect`` or, without one, is 400 or more.
+        """
+        headers = dict(headers or {})
+        body = None
+        if data is not None:
+            headers['X-CSRFToken'] = self.cookie('csrftoken') or ''
+            headers['Referer'] = urljoin(self.base_url, path) # Checked by Django's CSRF protection over HTTPS.
+            body = urlencode(data).encode()
+        started = time.perf_counter()
+        try:
+            with self.opener.open(Request(urljoin(self.base_url, path), body, headers), timeout=self.timeout) as response:
+                status, content = response.status, response.read()
+        except HTTPError as error: # 3xx (not followed), 4xx and 5xx answers.
+            status, content = error.code, error.read()
+            error.close()
+        except OSError: # Refused, reset or timed out.
+            status, content = None, b''
+        ok = status is not None and (status < 400 if expect is None else status == expect)
+        self.samples.append((scenario, started, time.perf_counter() - started, status, ok))
+        return status, content
+
+
+# Name of every reservation the reserve scenario makes; see delete_bookings().
+BOOKING_NAME = 'Load Test'
+
+
+def browse_menu(user):
+    # Anonymous visitors: mostly the home page, sometimes the JSON menu.
+    user.request('menu', '/api/menu/' if user.random.random() < 0.2 else '/')
+
+
+def reservation_data(user, day, slot_time, guests):
+    """Returns the ReservationForm fields of a booking by ``user``."""
+    user.visits += 1
+    return {
+        'name': BOOKING_NAME,
+        'email': f'loadtest+{id(user)}-{user.visits}@example.com', # Spreads the per-e-mail rate limit.
+        'phone': '',
+        'guests': guests,
+        'date': day.isoformat(),
+        'time': slot_time,
+    }
+
+
+def make_reservation(user):
+    # Checks availability, as the booking page does, then books a free slot.
+    if user.cookie('csrftoken') is None:
+        user.request('reserve', '/')
+    day = date.today() + timedelta(days=user.random.randint(1, 60))
+    guests = user.random.randint(2, 6)
+    status, content = user.request('reserve', f'/reservations/availability/?date={day}&guests={guests}')
+    if status != 200:
+        return
+    availability = json.loads(content)
+    if availability['limited']:
+        if not availability['slots']:
+            return
+        slot_time = user.random.choice(availability['slots'])['time']
+    else:
+        slot_time = user.random.choice(DINNER_TIMES)
+    user.request(
+        'reserve', '/reservations/', reservation_data(user, day, slot_time, guests),
+        {'Accept': 'application/json'}, expect=201,
+    )
+
+
+def log_in(user):
+    # A visitor signing in through allauth, with a session of their own.
+    # Needs password logins; see password_login().
+    visitor = user.fresh()
+    visitor.request('login', '/accounts/login/')
+    username, password = user.credentials
+    visitor.request('login', '/accounts/login/', {'login': username, 'password': password}, expect=302)
+
+
+def browse_admin(user):
+    # Staff working through the admin lists; logs in on the first visit.
+    if not user.staff:
+        user.request('admin', '/admin/login/')
+        username, password = user.credentials
+        status, _ = user.request(
+            'admin', '/admin/login/', {'username': username, 'password': password, 'next': '/admin/'}, expect=302,
+        )
+        user.staff = status == 302
+    user.request('admin', user.random.choice(ADMIN_PAGES))
+
+
+SCENARIOS = {'menu': browse_menu, 'reserve': make_reservation, 'login': log_in, 'admin': browse_admin}
+NEEDS_CREDENTIALS = ('login', 'admin')
+
+
+def delete_bookings():
+    """Deletes the reservations the reserve scenario made in the configured database; returns how many."""
+    _, deleted = Reservation.objects.filter(
+        name=BOOKING_NAME, email__startswith='loadtest+', email__endswith='@example.com',
+    ).delete()
+    return deleted.get(Reservation._meta.label, 0)
+
+
+def summarize(samples, seconds):
+    """Returns the request count, error and throttling rates, throughput and latency percentiles of ``samples``."""
+    latencies = sorted(seconds * 1000 for _, _, seconds, _, _ in samples)
+    throttled = sum(1 for *_, status, _ in samples if status == 429)
+    errors = sum(1 for *_, status, ok in samples if not ok and status != 429)
+    stats = {
+        'requests': len(samples),
+        'errors': errors,
+        'throttled': throttled, # 429s: rate limits doing their job, not failures.
+        'error_rate': errors / len(samples) if samples else 0,
+        'throughput': len(samples) / seconds if seconds else 0,
+    }
+    for share in PERCENTILES:
+        stats[f'p{int(share * 100)}_ms'] = _percentile(latencies, share) if latencies else None
+    stats['max_ms'] = latencies[-1] if latencies else None
+    return stats
+
+
+def run_stage(base_url, mix, concurrency, duration, ramp=0, credentials=None, timeout=30, seed=0):
+    """
+    Runs ``concurrency`` virtual users against ``base_url`` for ``ramp`` +
+    ``duration`` seconds. Users start evenly over the first ``ramp`` seconds
+    and then each loops through scenarios drawn from ``mix``, waiting for
+    every answer before its next request. Only the requests sent after the
+    ramp count; returns their summary, overall and per scenario.
+    """
+    if credentials is None and any(mix.get(name) for name in NEEDS_CREDENTIALS):
+        raise ValueError("The login and admin scenarios need the credentials of a staff user.")
+    samples = []
+    started = time.perf_counter()
+    measure_from = started + ramp
+    stop_at = measure_from + duration
+    names, weights = list(mix), list(mix.values())
+
+    def user_loop(index):
+        rng = random.Random(seed * 100003 + index) # Repeatable runs for the same seed.
+        user = VirtualUser(base_url, samples, rng, credentials, timeout)
+        time.sleep(max(0, started + ramp * index / concurrency - time.perf_counter()))
+        while time.perf_counter() < stop_at:
+            SCENARIOS[rng.choices(names, weights)[0]](user)
+
+    threads = [threading.Thread(target=user_loop, args=(i,), daemon=True) for i in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    measured = [sample for sample in samples if sample[1] >= measure_from]
+    return {
+        'concurrency': concurrency,
+        'seconds': duration,
+        'total': summarize(measured, duration),
+        'scenarios': {
+            name: summarize([sample for sample in measured if sample[0] == name], duration)
+            for name in names if mix[name]
+        },
+    }
+
+
+def run_mix(base_url, mix=DEFAULT_MIX, stages=(10,), duration=30, ramp=5, credentials=None, timeout=30, seed=0):
+    """
+    Runs the traffic ``mix`` against ``base_url`` at each concurrency in
+    ``stages`` in turn (see run_stage()). Returns a report that
+    markdown_report() formats and that can be saved as JSON to compare later
+    runs against.
+    """
+    return {
+        'url': base_url,
+        'mix': mix,
+        'duration': duration,
+        'ramp': ramp,
+        'stages': [
+            run_stage(base_url, mix, concurrency, duration, ramp, credentials, timeout, seed)
+            for concurrency in stages
+        ],
+    }
+
+
+def _change(value, before):
+    if value is None or not before:
+        return ''
+    return f' ({(value - before) / before:+.0%})'
+
+
+def markdown_report(reports, baseline=None):
+    """
+    Formats ``reports`` (one per deployment, keyed by a label) as Markdown
+    tables. With a ``baseline`` of the same shape, e.g. a previous run's
+    JSON, throughput and p95 show their change against it.
+    """
+    lines = []
+    for label, report in reports.items():
+        mix = ', '.join(f'{name} {weight}' for name, weight in report['mix'].items())
+        lines += [
+            f"## {label}", "",
+            f"{report['url']}: {report['duration']:g}s per stage after a {report['ramp']:g}s ramp; mix {mix}.", "",
+            "| users | scenario | requests | req/s | p50 ms | p90 ms | p95 ms | p99 ms | max ms | errors | 429s |",
+            "|---:|---|---:|---:|---:|---:|---:|---:|---:|---:|---:|",
+        ]
+        before_stages = {stage['concurrency']: stage for stage in (baseline or {}).get(label, {}).get('stages', [])}
+        for stage in report['stages']:
+            before_stage = before_stages.get(stage['concurrency'], {})
+            for name, stats in [('all', stage['total']), *stage['scenarios'].items()]:
+                before = before_stage.get('total') if name == 'all' else before_stage.get('scenarios', {}).get(name)
+                before = before or {}
+                cells = [
+                    stage['concurrency'], name, stats['requests'],
+                    f"{stats['throughput']:.1f}{_change(stats['throughput'], before.get('throughput'))}",
+                    *(f"{stats[key]:.1f}" if stats[key] is not None else '-' for key in ('p50_ms', 'p90_ms')),
+                    (f"{stats['p95_ms']:.1f}{_change(stats['p95_ms'], before.get('p95_ms'))}"
+                     if stats['p95_ms'] is not None else '-'),
+                    *(f"{stats[key]:.1f}" if stats[key] is not None else '-' for key in ('p99_ms', 'max_ms')),
+                    f"{stats['errors']} ({stats['error_rate']:.1%})", stats['throttled'],
+                ]
+                lines.append('| ' + ' | '.join(str(cell) for cell in cells) + ' |')
+        lines.append('')
+    return '\n'.join(lines)
+
+
+@contextmanager
+def scratch_database():
+    """
+    Copies the configured SQLite database to a temporary file for the
+    duration of the block, and yields the environment that points serve()
+    at the copy, so a run's bookings never reach the real database. Yields
+    an empty environment for other databases, which cannot be copied here.
+    """
+    database = settings.DATABASES['default']
+    if database['ENGINE'] != 'django.db.backends.sqlite3':
+        yield {}
+        return
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'loadtest.sqlite3')
+        with closing(sqlite3.connect(database['NAME'])) as source, closing(sqlite3.connect(path)) as copy:
+            source.backup(copy) # A consistent copy, even while another process writes.
+        yield {'DATABASE_URL': f'sqlite:///{path}'}
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+@contextmanager
+def serve(interface, workers=1, env=None, startup_timeout=30):
+    """
+    Serves the app on a free local port for the duration of the block, through
+    my_project/wsgi.py under gunicorn (``interface="wsgi"``) or
+    my_project/asgi.py under uvicorn (``"asgi"``), and yields its base URL.
+    The server gets this process's environment, updated with ``env``.
+    """
+    port = _free_port()
+    if interface == 'wsgi':
+        command = ['gunicorn', 'my_project.wsgi:application', '--bind', f'127.0.0.1:{port}', '--workers', str(workers)]
+    else:
+        command = ['uvicorn', 'my_project.asgi:application', '--host', '127.0.0.1', '--port', str(port), '--workers', str(workers)]
+    process = subprocess.Popen(
+        [sys.executable, '-m', *command], cwd=settings.BASE_DIR, env={**os.environ, **(env or {})},
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    base_url = f'http://127.0.0.1:{port}/'
+    try:
+        deadline = time.monotonic() + startup_timeout
+        while True:
+            if process.poll() is not None:
+                raise RuntimeError(f"The {interface} server exited with status {process.returncode} on startup.")
+            try:
+                with socket.create_connection(('127.0.0.1', port), timeout=1):
+                    break
+            except OSError:
+                if time.monotonic() > deadline:
+                    raise RuntimeError(f"The {interface} server did not start within {startup_timeout}s.")
+                time.sleep(0.2)
+        yield base_url
+    finally:
+        process.terminate()
+        try:
+            process.wait(10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+            process.wait()
@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+
+from dishes.archive import archive_cutoff, archive_reservations
+from dishes.models import Reservation
+
+
+class Command(BaseCommand):
+    help = (
+        "Moves reservations whose date is more than RESERVATION_ARCHIVE_DAYS days past "
+        "to the archive table, in batches of one short transaction each. Safe to run "
+        "while the site is live, e.g. nightly. export_reservations still includes them."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, help="Archive reservations older than this many days (default: RESERVATION_ARCHIVE_DAYS).")
+        parser.add_argument('--batch-size', type=int, default=1000, help="Reservations moved per transaction.")
+        parser.add_argument('--pause', type=float, default=0, help="Seconds to sleep between batches.")
+        parser.add_argument('--dry-run', action='store_true', help="Only count the reservations that would be archived.")
+
+    def handle(self, *args, **options):
+        cutoff = archive_cutoff(options['days'])
+        if options['dry_run']:
+            count = Reservation.objects.filter(date__lt=cutoff).count()
+            self.stdout.write(f"{count} reservation(s) before {cutoff} would be archived.")
+            return
+        total = 0
+        for moved in archive_reservations(cutoff, options['batch_size'], options['pause']):
+            total += moved
+            self.stdout.write(f"Archived {total} reservation(s)...")
+        self.stdout.write(f"Archived {total} reservation(s) dated before {cutoff}.")
@@ -0,0 +1,71 @@
+import copy
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.backends.signals import connection_created
+from django.db.utils import load_backend
+
+# Connection reuse before this was configurable, and with no reuse at all.
+BASELINES = [
+    ('no reuse', {'CONN_MAX_AGE': 0, 'CONN_HEALTH_CHECKS': False}),
+    ('persistent, unchecked', {'CONN_MAX_AGE': 600, 'CONN_HEALTH_CHECKS': False}),
+]
+
+
+class Command(BaseCommand):
+    help = (
+        "Measures the database connection overhead per request: connections opened and "
+        "time per request when connections are never reused, kept open unchecked, and "
+        "as configured in DATABASES (health checks, pooling, SQLite pragmas)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=500, help="Simulated requests per mode.")
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS)
+
+    def handle(self, *args, **options):
+        if options['requests'] < 1:
+            raise CommandError("--requests must be at least 1.")
+        configured = connections.settings[options['database']]
+        modes = [(name, self.variant(configured, overrides)) for name, overrides in BASELINES]
+        modes.append(('configured', copy.deepcopy(configured)))
+
+        self.stdout.write(f"{'mode':<24} {'connections':>11} {'ms/request':>10}")
+        for name, settings_dict in modes:
+            opened, seconds = self.run(settings_dict, options['requests'])
+            self.stdout.write(f"{name:<24} {opened:>11} {seconds * 1000 / options['requests']:>10.3f}")
+
+    def variant(self, configured, overrides):
+        settings_dict = copy.deepcopy(configured)
+        settings_dict.update(overrides)
+        settings_dict.get('OPTIONS', {}).pop('pool', None) # The baselines predate pooling.
+        return settings_dict
+
+    def run(self, settings_dict, requests):
+        # A private connection, so the benchmark neither reuses nor closes the
+        # command's own, and a pool gets its own alias.
+        db = load_backend(settings_dict['ENGINE']).DatabaseWrapper(settings_dict, 'benchmark')
+        opened = 0
+
+        def count(sender, connection, **kwargs):
+            nonlocal opened
+            opened += connection is db
+
+        connection_created.connect(count)
+        started = time.perf_counter()
+        try:
+            for _ in range(requests):
+                # What Django does around each request (see close_old_connections()).
+                db.close_if_unusable_or_obsolete()
+                with db.cursor() as cursor:
+                    cursor.execute('SELECT 1')
+                    cursor.fetchone()
+                db.close_if_unusable_or_obsolete()
+            seconds = time.perf_counter() - started
+        finally:
+            connection_created.disconnect(count)
+            db.close()
+            if getattr(db, 'pool', None) is not None:
+                db.close_pool()
+        return opened, seconds
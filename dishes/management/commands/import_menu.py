@@ -0,0 +1,195 @@
+import csv
+import json
+import re
+from decimal import Decimal, InvalidOperation
+from pathlib import Path
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+from django.utils.text import slugify
+
+from dishes import dietary
+from dishes.menu import bump_menu_version
+from dishes.models import Category, Dishes, Drink
+from dishes.search import index_items
+
+MODELS = {'dish': Dishes, 'drink': Drink}
+STATUSES = {'draft': 0, 'published': 1, '0': 0, '1': 1}
+# Columns an import may change on an existing item, matched by title.
+UPDATE_FIELDS = ['slug', 'category', 'description', 'price', 'status', 'dietary', 'updated_on']
+
+
+class Command(BaseCommand):
+    help = (
+        "Creates or updates dishes and drinks from a CSV or JSON menu file. "
+        "Columns/keys: kind (dish|drink), title, category, description, price, "
+        "status (draft|published) and optionally slug and dietary (attributes such as "
+        "vegetarian, vegan, gluten_free, nut_free, dairy_free, spicy, separated by , ; or | "
+        "or as a JSON list). "
+        "Items are matched by title."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="CSV file with a header row, or a JSON list of objects.")
+        parser.add_argument('--author', help="Username credited for new items; defaults to the first superuser.")
+        parser.add_argument('--batch-size', type=int, default=500, help="Rows per INSERT statement.")
+        parser.add_argument('--dry-run', action='store_true', help="Report the changes without saving them.")
+
+    def handle(self, *args, **options):
+        rows = self.read_rows(Path(options['path']))
+        author = self.get_author(options['author'])
+
+        with transaction.atomic():
+            categories, new_categories = self.resolve_categories(rows)
+            report = [f"Categories: {new_categories} created."]
+            for kind, model in MODELS.items():
+                items = [row for row in rows if row['kind'] == kind]
+                if items:
+                    created, updated, unchanged = self.upsert(model, items, categories, author, options['batch_size'])
+                    report.append(
+                        f"{model._meta.verbose_name_plural}: {created} created, {updated} updated, {unchanged} unchanged."
+                    )
+            if options['dry_run']:
+                transaction.set_rollback(True)
+                report.append("Dry run: nothing was saved.")
+            else:
+                # Bulk writes send no signals, so retire the cached menu here.
+                transaction.on_commit(bump_menu_version)
+
+        self.stdout.write("\n".join(report))
+
+    def read_rows(self, path):
+        if not path.exists():
+            raise CommandError(f"{path} does not exist.")
+        with path.open(newline='', encoding='utf-8') as f:
+            if path.suffix.lower() == '.json':
+                raw = json.load(f)
+            else:
+                raw = list(csv.DictReader(f))
+
+        rows, titles = [], set()
+        for number, item in enumerate(raw, start=1):
+            kind = str(item.get('kind', '')).strip().lower()
+            title = str(item.get('title', '')).strip()
+            status = str(item.get('status', 'draft')).strip().lower()
+            if kind not in MODELS:
+                raise CommandError(f"Row {number}: kind must be 'dish' or 'drink'.")
+            if not title:
+                raise CommandError(f"Row {number}: title is required.")
+            if (kind, title) in titles:
+                raise CommandError(f"Row {number}: duplicate {kind} {title!r}.")
+            if status not in STATUSES:
+                raise CommandError(f"Row {number}: status must be 'draft' or 'published'.")
+            try:
+                price = Decimal(str(item.get('price') or 0)).quantize(Decimal('0.01'))
+            except InvalidOperation:
+                raise CommandError(f"Row {number}: price {item.get('price')!r} is not a number.")
+            diet = item.get('dietary') # A missing column keeps the attributes of existing items.
+            try:
+                if diet is not None:
+                    diet = dietary.parse(diet if isinstance(diet, list) else re.split(r'[,;|]', str(diet)))
+            except ValueError as error:
+                raise CommandError(f"Row {number}: {error}")
+            titles.add((kind, title))
+            rows.append({
+                'number': number,
+                'kind': kind,
+                'title': title,
+                'slug': str(item.get('slug') or '').strip(),
+                'category': str(item.get('category') or '').strip(),
+                'description': str(item.get('description') or '').strip(),
+                'price': price,
+                'status': STATUSES[status],
+                'dietary': diet,
+            })
+        return rows
+
+    def get_author(self, username):
+        if username:
+            try:
+                return User.objects.get(username=username)
+            except User.DoesNotExist:
+                raise CommandError(f"No user called {username!r}.")
+        author = User.objects.filter(is_superuser=True).order_by('pk').first()
+        if author is None:
+            raise CommandError("Pass --author; there is no superuser to credit new items to.")
+        return author
+
+    def resolve_categories(self, rows):
+        # Maps category names to ids, creating the missing ones in one INSERT,
+        # after the existing categories on the menu.
+        names = {row['category'] for row in rows if row['category']}
+        ids = dict(Category.objects.filter(name__in=names).values_list('name', 'id'))
+        missing = names - ids.keys()
+        if missing:
+            last = Category.objects.aggregate(last=Max('display_order'))['last']
+            first = 0 if last is None else last + 1
+            Category.objects.bulk_create(
+                Category(name=name, display_order=first + i) for i, name in enumerate(sorted(missing))
+            )
+            ids.update(Category.objects.filter(name__in=missing).values_list('name', 'id'))
+        return ids, len(missing)
+
+    def upsert(self, model, items, categories, author, batch_size):
+        existing = {
+            row['title']: row
+            for row in model.objects.filter(title__in=[item['title'] for item in items])
+            .values('title', 'slug', 'category_id', 'description', 'price', 'status', 'dietary')
+        }
+        # Slugs are unique per model: explicit ones must be free, and generated
+        # ones avoid every slug taken, explicit ones included.
+        owners = dict(model.objects.values_list('slug', 'title'))
+        taken = set(owners)
+        claimed = {}
+        for item in items:
+            slug = item['slug']
+            if not slug:
+                continue
+            if slug in claimed:
+                raise CommandError(f"Row {item['number']}: slug {slug!r} is also given to row {claimed[slug]}.")
+            if owners.get(slug, item['title']) != item['title']:
+                raise CommandError(f"Row {item['number']}: slug {slug!r} is already used by {owners[slug]!r}.")
+            claimed[slug] = item['number']
+            taken.add(slug)
+        now = timezone.now()
+        objects, created, unchanged = [], 0, 0
+        for item in items:
+            current = existing.get(item['title'])
+            values = {
+                'slug': item['slug'] or (current and current['slug']) or self.unique_slug(item['title'], taken),
+                'category_id': categories.get(item['category']),
+                'description': item['description'],
+                'price': item['price'],
+                'status': item['status'],
+                'dietary': item['dietary'] if item['dietary'] is not None else (current['dietary'] if current else 0),
+            }
+            if current is None:
+                created += 1
+            elif all(current[field] == value for field, value in values.items()):
+                unchanged += 1
+                continue
+            objects.append(model(title=item['title'], author=author, updated_on=now, **values))
+
+        # One INSERT ... ON CONFLICT (title) DO UPDATE per batch covers both new and changed items.
+        model.objects.bulk_create(
+            objects, batch_size=batch_size,
+            update_conflicts=True, unique_fields=['title'], update_fields=UPDATE_FIELDS,
+        )
+        # Bulk writes send no signals either, so index the written items here.
+        index_items(
+            model.objects.filter(title__in=[obj.title for obj in objects]).select_related('category').iterator(),
+            batch_size=batch_size,
+        )
+        return created, len(objects) - created, unchanged
+
+    def unique_slug(self, title, taken):
+        base = slugify(title)[:190] or 'item'
+        slug, suffix = base, 2
+        while slug in taken:
+            slug, suffix = f'{base}-{suffix}', suffix + 1
+        taken.add(slug)
+        return slug
+
@@ -0,0 +1,147 @@
+import json
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.management.base import BaseCommand, CommandError
+
+from dishes.loadtest import (
+    NEEDS_CREDENTIALS, default_mix, delete_bookings, is_local, markdown_report, parse_mix, password_login, run,
+    run_mix, scratch_database, serve,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Compares the throughput of running deployments, e.g. the sync (WSGI) and "
+        "async (ASGI) servers started side by side on different ports. With --mix, "
+        "replays a traffic mix of menu views, reservations, logins and admin pages "
+        "at increasing concurrency and reports throughput, latency percentiles and "
+        "error rates as Markdown and JSON."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('urls', nargs='*', help="Base URL of each deployment, e.g. http://127.0.0.1:8000.")
+        parser.add_argument(
+            '--serve', action='append', choices=['wsgi', 'asgi'], default=[],
+            help="Also start the app locally through my_project/wsgi.py (gunicorn) or asgi.py (uvicorn) and test it; repeat for both.",
+        )
+        parser.add_argument('--workers', type=int, default=1, help="Worker processes of each --serve server.")
+        parser.add_argument(
+            '--path', action='append', dest='paths',
+            help="Path to request, in turn with the others; repeat for several. Defaults to the home page.",
+        )
+        parser.add_argument('--requests', type=int, default=500, help="Requests sent to each deployment.")
+        parser.add_argument('--concurrency', type=int, default=20, help="Clients with a request open at once.")
+        parser.add_argument('--timeout', type=float, default=30, help="Seconds before a request counts as failed.")
+        parser.add_argument(
+            '--mix', nargs='?', const='',
+            help=(
+                "Replay a traffic mix instead of GETting --path, e.g. menu=70,reserve=15,login=10,admin=5 "
+                "(the default, without login unless allauth logins take a password)."
+            ),
+        )
+        parser.add_argument('--stages', default='10', help="Comma-separated concurrency levels the mix runs at, in turn.")
+        parser.add_argument('--duration', type=float, default=30, help="Seconds measured at each concurrency level.")
+        parser.add_argument('--ramp', type=float, default=5, help="Seconds over which each level's users start; not measured.")
+        parser.add_argument('--username', help="Staff user the login and admin scenarios sign in as.")
+        parser.add_argument('--password')
+        parser.add_argument(
+            '--allow-bookings', action='store_true',
+            help="Let the reserve scenario book tables on a deployment that is not on this machine.",
+        )
+        parser.add_argument('--seed', type=int, default=0, help="Seed of the virtual users' choices, for repeatable runs.")
+        parser.add_argument('--json', help="Save the report as JSON to this file.")
+        parser.add_argument('--markdown', help="Save the report as Markdown to this file.")
+        parser.add_argument('--baseline', help="JSON report of an earlier run to compare throughput and p95 with.")
+
+    def handle(self, *args, **options):
+        if not options['urls'] and not options['serve']:
+            raise CommandError("Give the URL of a deployment or --serve wsgi/asgi.")
+        if options['requests'] < 1 or options['concurrency'] < 1:
+            raise CommandError("--requests and --concurrency must be at least 1.")
+        if options['serve'] and not settings.DEBUG and not getattr(staticfiles_storage, 'hashed_files', True):
+            raise CommandError("Served deployments need hashed static files, as in production: run collectstatic first.")
+        if options['mix'] is not None:
+            self.check_mix_options(options) # Before starting any server.
+        with ExitStack() as stack:
+            # Every virtual user shares this machine's IP; the per-e-mail limit still applies.
+            env = {'RESERVATION_RATE_LIMIT_IP': ''}
+            if options['serve']:
+                env.update(stack.enter_context(scratch_database())) # Served runs book into a copy.
+            try:
+                # Served deployments are labelled by their interface, so runs compare across ports.
+                targets = {url: url for url in options['urls']}
+                for interface in options['serve']:
+                    targets[interface] = stack.enter_context(serve(interface, options['workers'], env))
+            except RuntimeError as error:
+                raise CommandError(error)
+            if options['mix'] is None:
+                self.compare(targets, options)
+                return
+            try:
+                self.replay(targets, options)
+            finally:
+                # Bookings made in this machine's database, rather than a copy of it.
+                local = any(is_local(url) for url in options['urls']) or (options['serve'] and 'DATABASE_URL' not in env)
+                if options['mix'].get('reserve') and local:
+                    self.stdout.write(f"Deleted {delete_bookings()} load test reservation(s).")
+
+    def check_mix_options(self, options):
+        try:
+            options['mix'] = parse_mix(options['mix']) if options['mix'] else default_mix()
+        except ValueError as error:
+            raise CommandError(error)
+        if options['mix'].get('login') and not password_login():
+            raise CommandError(
+                "The login scenario signs in with a password, which allauth's login form does not ask for: "
+                "add 'password1*' to ACCOUNT_SIGNUP_FIELDS or leave login out of --mix."
+            )
+        remote = [url for url in options['urls'] if not is_local(url)]
+        if options['mix'].get('reserve') and remote and not options['allow_bookings']:
+            raise CommandError(
+                f"The reserve scenario books real tables at {', '.join(remote)}: "
+                "pass --allow-bookings, or leave reserve out of --mix."
+            )
+        try:
+            options['stages'] = [int(level) for level in options['stages'].split(',')]
+        except ValueError:
+            raise CommandError("--stages takes comma-separated user counts, e.g. 10,25,50.")
+        if min(options['stages']) < 1 or options['duration'] <= 0:
+            raise CommandError("--stages must be at least 1 and --duration above 0.")
+        if not options['username'] and any(options['mix'].get(name) for name in NEEDS_CREDENTIALS):
+            raise CommandError("The login and admin scenarios sign in: pass --username and --password of a staff user.")
+        if options['baseline']:
+            try:
+                with open(options['baseline']) as f:
+                    options['baseline'] = json.load(f)
+            except (OSError, ValueError) as error:
+                raise CommandError(f"Cannot read the baseline report: {error}")
+
+    def compare(self, targets, options):
+        paths = options['paths'] or ['/']
+        self.stdout.write(f"{'deployment':<32} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'max ms':>8} {'errors':>7}")
+        for label, url in targets.items():
+            result = run(url, paths, options['requests'], options['concurrency'], options['timeout'])
+            self.stdout.write(
+                f"{label:<32} {result['throughput']:>8.1f} {result['p50_ms']:>8.1f} "
+                f"{result['p95_ms']:>8.1f} {result['max_ms']:>8.1f} {result['errors']:>7}"
+            )
+
+    def replay(self, targets, options):
+        credentials = (options['username'], options['password'] or '') if options['username'] else None
+        reports = {
+            label: run_mix(
+                url, options['mix'], options['stages'], options['duration'], options['ramp'],
+                credentials, options['timeout'], options['seed'],
+            )
+            for label, url in targets.items()
+        }
+        markdown = markdown_report(reports, options['baseline'])
+        self.stdout.write(markdown)
+        if options['json']:
+            with open(options['json'], 'w') as f:
+                json.dump(reports, f, indent=2)
+        if options['markdown']:
+            with open(options['markdown'], 'w') as f:
+                f.write(markdown)
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from dishes.summary import rebuild
+
+
+class Command(BaseCommand):
+    help = (
+        "Recomputes the reservation day summary behind the admin dashboard from the "
+        "live and archived reservations, e.g. after bulk changes made outside the admin."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help="Summary rows per INSERT statement.")
+
+    def handle(self, *args, **options):
+        slots = rebuild(options['batch_size'])
+        self.stdout.write(f"Rebuilt the reservation summary: {slots} slot(s).")
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from dishes.search import reindex
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuilds the menu search index from the dishes and drinks tables. Saves keep "
+        "it current; run this after changing menu rows with raw SQL."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500, help="Documents per INSERT statement.")
+
+    def handle(self, *args, **options):
+        documents = reindex(batch_size=options['batch_size'])
+        self.stdout.write(f"Indexed {documents} dishes and drinks.")
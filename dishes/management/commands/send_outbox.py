@@ -0,0 +1,26 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from dishes.outbox import send_pending
+
+
+class Command(BaseCommand):
+    help = "Sends queued reservation e-mails in batches, one SMTP connection per batch."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=100)
+        parser.add_argument('--loop', action='store_true', help="Keep polling the outbox instead of exiting when it is empty.")
+        parser.add_argument('--interval', type=float, default=10, help="Seconds between polls with --loop.")
+
+    def handle(self, *args, **options):
+        total = 0
+        while True:
+            sent = send_pending(options['batch_size'])
+            total += sent
+            if sent:
+                continue  # Drain the queue before waiting.
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
+        self.stdout.write(f"Sent {total} e-mail(s).")
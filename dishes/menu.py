@@ -0,0 +1,304 @@
+# dishes/menu.py
+
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import CharField, Count, F, IntegerField, Max, Value
+from django.template.loader import render_to_string
+
+from . import dietary
+from .models import Category, Dishes, Drink
+
+MENU_VERSION_KEY = 'menu:version'
+MENU_HITS_KEY = 'menu:hits'
+MENU_MISSES_KEY = 'menu:misses'
+
+# Item fields the JSON menu can project; see published_menu_rows().
+MENU_ITEM_FIELDS = ('id', 'kind', 'title', 'slug', 'description', 'price')
+# Every item column the menu can read; the page also shows dietary labels.
+MENU_ITEM_COLUMNS = MENU_ITEM_FIELDS + ('dietary',)
+
+
+class MenuItem:
+    """
+    A published dish or drink as the menu shows it, whichever model it is
+    stored in: ``kind`` is "dish" or "drink", and the other attributes are
+    the columns menu_items() read, along with ``category_id`` and
+    ``category_name``.
+    """
+
+    def __init__(self, row):
+        self.__dict__.update(row)
+
+    def __repr__(self):
+        return f'<MenuItem: {self.kind} {self.id} {self.title!r}>'
+
+
+def menu_items(fields=MENU_ITEM_COLUMNS, categories=None, diet=0):
+    """
+    Returns the published menu as MenuItems, in menu order, read by the one
+    query of published_menu_rows().
+    """
+    return (MenuItem(row) for row in published_menu_rows(fields, categories, diet).iterator())
+
+
+async def amenu_items(fields=MENU_ITEM_COLUMNS, categories=None, diet=0):
+    """Async menu_items()."""
+    return [MenuItem(row) async for row in published_menu_rows(fields, categories, diet)]
+
+
+def build_menu(categories, diet=0):
+    """
+    Groups the published dishes and drinks under the given categories,
+    keeping only the items with every dietary attribute in ``diet``.
+
+    Returns a list of sections in the order of ``categories``, each a dict
+    with the ``category`` and its ``items``, in menu order. Dishes and
+    drinks are read together by one query and bucketed by ``category_id``
+    in a single pass, so the cost grows with neither the number of items
+    nor the number of categories.
+    """
+    return group_menu(categories, menu_items(diet=diet))
+
+
+async def abuild_menu(diet=0):
+    """Async build_menu() of every category, read with async iteration."""
+    categories = [category async for category in Category.objects.all()]
+    return group_menu(categories, await amenu_items(diet=diet))
+
+
+def _dietary_count_rows(diet):
+    return dietary.count_row(Dishes.objects.filter(dietary.matching(diet), status=1), diet).union(
+        dietary.count_row(Drink.objects.filter(dietary.matching(diet), status=1), diet), all=True,
+    )
+
+
+def _dietary_options(diet, rows):
+    # The filter's checkboxes: each attribute, whether it is ticked and how
+    # many published items the menu would show with it ticked too.
+    return [
+        {'name': name, 'label': label, 'checked': bool(diet & bit), 'count': sum(row[name] for row in rows)}
+        for bit, name, label in dietary.FLAGS
+    ]
+
+
+def dietary_options(diet=0):
+    """
+    Returns the menu's dietary filter options for the ``diet`` selection.
+    The counts of every attribute, over dishes and drinks, come from one
+    UNION ALL of two aggregates.
+    """
+    return _dietary_options(diet, list(_dietary_count_rows(diet)))
+
+
+async def adietary_options(diet=0):
+    """Async dietary_options()."""
+    return _dietary_options(diet, [row async for row in _dietary_count_rows(diet)])
+
+
+def group_menu(categories, items):
+    sections = []
+    sections_by_category = {}
+    for category in categories:
+        section = {'category': category, 'items': []}
+        sections.append(section)
+        sections_by_category[category.pk] = section
+
+    for item in items:
+        section = sections_by_category.get(item.category_id)
+        if section is not None: # Skips items of categories not displayed.
+            section['items'].append(item)
+
+    return sections
+
+
+def get_menu_version():
+    """Returns the current menu version, starting a new one if none is cached."""
+    version = cache.get(MENU_VERSION_KEY)
+    if version is None:
+        # A timestamp rather than 1, so an evicted version never reuses the
+        # key of a fragment rendered before the eviction.
+        cache.add(MENU_VERSION_KEY, int(time.time() * 1000), None)
+        version = cache.get(MENU_VERSION_KEY)
+    return version
+
+
+async def aget_menu_version():
+    """Async get_menu_version()."""
+    version = await cache.aget(MENU_VERSION_KEY)
+    if version is None:
+        await cache.aadd(MENU_VERSION_KEY, int(time.time() * 1000), None)
+        version = await cache.aget(MENU_VERSION_KEY)
+    return version
+
+
+def bump_menu_version():
+    """Invalidates every cached menu by moving on to a new version."""
+    try:
+        cache.incr(MENU_VERSION_KEY)
+    except ValueError: # No version cached yet; the next read starts one.
+        get_menu_version()
+
+
+def _count(key):
+    if not cache.add(key, 1, None):
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, 1, None)
+
+
+async def _acount(key):
+    if not await cache.aadd(key, 1, None):
+        try:
+            await cache.aincr(key)
+        except ValueError:
+            await cache.aset(key, 1, None)
+
+
+def menu_cache_stats():
+    """Returns the hit/miss counters of the menu cache."""
+    stats = cache.get_many([MENU_HITS_KEY, MENU_MISSES_KEY])
+    return {
+        'version': get_menu_version(),
+        'hits': stats.get(MENU_HITS_KEY, 0),
+        'misses': stats.get(MENU_MISSES_KEY, 0),
+    }
+
+
+def _menu_html_key(version, diet):
+    return f'menu:html:{version}:{diet}' if diet else f'menu:html:{version}'
+
+
+def get_menu_html(diet=0):
+    """
+    Returns the rendered menu section and whether it came from the cache.
+
+    ``diet`` limits the menu to items with those dietary attributes; each
+    selection is cached separately. Fragments are keyed by the menu version,
+    so saving or deleting a dish,
+    drink or category (see dishes/signals.py) makes the next request render
+    a fresh one. MENU_CACHE_TIMEOUT bounds how stale a per-process cache can
+    get when several workers do not share a cache backend.
+    """
+    key = _menu_html_key(get_menu_version(), diet)
+    html = cache.get(key)
+    if html is not None:
+        _count(MENU_HITS_KEY)
+        return html, True
+
+    _count(MENU_MISSES_KEY)
+    html = render_to_string('dishes/menu_section.html', {
+        'menu': build_menu(Category.objects.all(), diet),
+        'dietary': dietary_options(diet),
+        'filtered': bool(diet), # Hides the categories the filter empties.
+    })
+    cache.set(key, html, getattr(settings, 'MENU_CACHE_TIMEOUT', 300))
+    return html, False
+
+
+async def aget_menu_html(diet=0):
+    """Async get_menu_html(), sharing its cache entries and counters."""
+    key = _menu_html_key(await aget_menu_version(), diet)
+    html = await cache.aget(key)
+    if html is not None:
+        await _acount(MENU_HITS_KEY)
+        return html, True
+
+    await _acount(MENU_MISSES_KEY)
+    # Everything the template shows is loaded up front, so rendering runs no queries.
+    html = render_to_string('dishes/menu_section.html', {
+        'menu': await abuild_menu(diet),
+        'dietary': await adietary_options(diet),
+        'filtered': bool(diet), # Hides the categories the filter empties.
+    })
+    await cache.aset(key, html, getattr(settings, 'MENU_CACHE_TIMEOUT', 300))
+    return html, False
+
+
+def _freshness_row(queryset):
+    # MAX(updated_on) and COUNT(*) over the whole queryset, as a single row.
+    return (
+        queryset.order_by()
+        .annotate(group=Value(1, IntegerField()))
+        .values('group')
+        .annotate(last=Max('updated_on'), total=Count('pk'))
+        .values('last', 'total')
+    )
+
+
+def _freshness_rows():
+    return _freshness_row(Dishes.objects.filter(status=1)).union(
+        _freshness_row(Drink.objects.filter(status=1)),
+        _freshness_row(Category.objects.all()),
+        all=True,
+    )
+
+
+def _validators(rows):
+    stamps = [row['last'] for row in rows if row['last'] is not None]
+    fingerprint = ';'.join(f"{row['last'] and row['last'].isoformat()}/{row['total']}" for row in rows)
+    return (max(stamps) if stamps else None), hashlib.md5(fingerprint.encode()).hexdigest()
+
+
+def menu_freshness():
+    """
+    Returns the (last_modified, etag) validators of the published menu.
+
+    Both come from one UNION ALL query over published dishes, published
+    drinks and categories. The row counts catch deletions and items being
+    unpublished, which MAX(updated_on) alone would miss.
+    """
+    return _validators(list(_freshness_rows()))
+
+
+def get_menu_freshness():
+    """Returns menu_freshness(), cached alongside the rendered menu."""
+    key = f'menu:freshness:{get_menu_version()}'
+    freshness = cache.get(key)
+    if freshness is None:
+        freshness = menu_freshness()
+        cache.set(key, freshness, getattr(settings, 'MENU_CACHE_TIMEOUT', 300))
+    return freshness
+
+
+async def aget_menu_freshness():
+    """Async get_menu_freshness()."""
+    key = f'menu:freshness:{await aget_menu_version()}'
+    freshness = await cache.aget(key)
+    if freshness is None:
+        freshness = _validators([row async for row in _freshness_rows()])
+        await cache.aset(key, freshness, getattr(settings, 'MENU_CACHE_TIMEOUT', 300))
+    return freshness
+
+
+def published_menu_rows(fields=MENU_ITEM_FIELDS, categories=None, diet=0):
+    """
+    Returns published dishes and drinks as plain dicts, in menu order.
+
+    Dishes and drinks come from one UNION ALL query of ``.values()`` rows,
+    joined to their category and ordered by category display order, dishes
+    before drinks, then title. No model instances are built. ``fields`` picks
+    the item columns to read from MENU_ITEM_COLUMNS; ``categories`` optionally
+    limits the rows to those category ids, and ``diet`` to the items with
+    those dietary attributes.
+    """
+    # id and title are always read: they identify and order the rows.
+    columns = [f for f in MENU_ITEM_COLUMNS if (f in fields and f != 'kind') or f in ('id', 'title')]
+    columns += ['category_id', 'category_name', 'category_order', 'kind', 'kind_order']
+
+    def part(queryset, kind, kind_order):
+        queryset = queryset.filter(dietary.matching(diet), status=1, category__isnull=False)
+        if categories is not None:
+            queryset = queryset.filter(category_id__in=categories)
+        return queryset.order_by().annotate(
+            category_name=F('category__name'),
+            category_order=F('category__display_order'),
+            kind=Value(kind, CharField()),
+            kind_order=Value(kind_order, IntegerField()),
+        ).values(*columns)
+
+    rows = part(Dishes.objects, 'dish', 0).union(part(Drink.objects, 'drink', 1), all=True)
+    return rows.order_by('category_order', 'category_name', 'kind_order', 'title')
@@ -0,0 +1,44 @@
+# Generated by Django 5.2.4 on 2026-10-18 10:22
+
+from django.db import migrations, models
+
+# The order previously hard-coded in dishes.views.index.
+MENU_ORDER = [
+    "Main Course",
+    "Soup",
+    "Street Food",
+    "Side Dish",
+    "Snack",
+    "Dessert",
+    "Beers",
+    "Juices",
+    "Soft Drinks",
+]
+
+
+def set_display_order(apps, schema_editor):
+    Category = apps.get_model('dishes', 'Category')
+    # Categories missing from the old list were hidden; they now follow the listed ones.
+    Category.objects.exclude(name__in=MENU_ORDER).update(display_order=len(MENU_ORDER) + 1)
+    for position, name in enumerate(MENU_ORDER, start=1):
+        Category.objects.filter(name=name).update(display_order=position)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dishes', '0003_reservation'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='category',
+            options={'ordering': ['display_order', 'name'], 'verbose_name_plural': 'Categories'},
+        ),
+        migrations.AddField(
+            model_name='category',
+            name='display_order',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(set_display_order, migrations.RunPython.noop),
+    ]
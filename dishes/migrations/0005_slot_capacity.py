@@ -0,0 +1,35 @@
+# Generated by Django 5.2.4 on 2026-10-18 10:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dishes', '0004_category_display_order'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SlotCapacity',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('weekday', models.IntegerField(choices=[(0, 'Monday'), (1, 'Tuesday'), (2, 'Wednesday'), (3, 'Thursday'), (4, 'Friday'), (5, 'Saturday'), (6, 'Sunday')])),
+                ('time', models.TimeField()),
+                ('tables', models.PositiveIntegerField()),
+                ('covers', models.PositiveIntegerField()),
+            ],
+            options={
+                'verbose_name_plural': 'Slot capacities',
+                'ordering': ['weekday', 'time'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='reservation',
+            index=models.Index(fields=['date', 'time', 'status'], name='reservation_slot_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='slotcapacity',
+            constraint=models.UniqueConstraint(fields=('weekday', 'time'), name='unique_slot_capacity'),
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.2.4 on 2026-10-18 10:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dishes', '0005_slot_capacity'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReservationSlot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('time', models.TimeField()),
+                ('bookings', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('date', 'time'), name='unique_reservation_slot')],
+            },
+        ),
+    ]
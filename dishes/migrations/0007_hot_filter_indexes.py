@@ -0,0 +1,39 @@
+# Generated by Django 5.2.4 on 2026-10-18 10:28
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dishes', '0006_reservation_slot'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='dishes',
+            index=models.Index(fields=['status', '-created_on'], name='dish_status_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='dishes',
+            index=models.Index(fields=['-created_on'], name='dish_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='drink',
+            index=models.Index(fields=['status', 'title'], name='drink_status_title_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='drink',
+            index=models.Index(fields=['-created_on'], name='drink_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='reservation',
+            index=models.Index(fields=['-created_on'], name='reservation_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='reservation',
+            index=models.Index(fields=['status', '-created_on'], name='reservation_status_created_idx'),
+        ),
+    ]
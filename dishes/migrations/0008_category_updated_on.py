@@ -0,0 +1,18 @@
+# Generated by Django 5.2.4 on 2026-10-18 10:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dishes', '0007_hot_filter_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='category',
+            name='updated_on',
+            field=models.DateTimeField(auto_now=True),
+        ),
+    ]
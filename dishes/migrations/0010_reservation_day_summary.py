@@ -0,0 +1,52 @@
+# Generated by Django 5.2.4 on 2026-10-18 10:48
+
+from django.db import migrations, models
+from django.db.models import Count, Q, Sum
+
+
+def summarize_reservations(apps, schema_editor):
+    # Counts the existing reservations once; signals keep the table current from here on.
+    Reservation = apps.get_model('dishes', 'Reservation')
+    ReservationDaySummary = apps.get_model('dishes', 'ReservationDaySummary')
+    rows = (
+        Reservation.objects.order_by('date', 'time')
+        .values('date', 'time')
+        .annotate(
+            pending=Count('pk', filter=Q(status=0)),
+            confirmed=Count('pk', filter=Q(status=1)),
+            cancelled=Count('pk', filter=Q(status=2)),
+            guests=Sum('guests', filter=Q(status__in=(0, 1)), default=0),
+        )
+    )
+    ReservationDaySummary.objects.bulk_create(
+        (ReservationDaySummary(**row) for row in rows.iterator()), batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dishes', '0009_outbox_email'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReservationDaySummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('time', models.TimeField()),
+                ('pending', models.IntegerField(default=0)),
+                ('confirmed', models.IntegerField(default=0)),
+                ('cancelled', models.IntegerField(default=0)),
+                ('guests', models.IntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'Reservation day summary',
+                'verbose_name_plural': 'Reservation dashboard',
+                'ordering': ['date', 'time'],
+                'constraints': [models.UniqueConstraint(fields=('date', 'time'), name='unique_reservation_day_summary')],
+            },
+        ),
+        migrations.RunPython(summarize_reservations, migrations.RunPython.noop),
+    ]
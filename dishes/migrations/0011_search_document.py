@@ -0,0 +1,116 @@
+# Generated by Django 5.2.4 on 2026-10-18 11:02
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+# SQLite: an external-content FTS5 table over the documents, with triggers
+# that keep it in step with every INSERT, UPDATE and DELETE.
+SQLITE_INDEX = [
+    """
+    CREATE VIRTUAL TABLE dishes_searchdocument_fts USING fts5(
+        title, category_name, description,
+        content='dishes_searchdocument', content_rowid='id',
+        tokenize='porter unicode61 remove_diacritics 2'
+    )
+    """,
+    """
+    CREATE TRIGGER dishes_searchdocument_ai AFTER INSERT ON dishes_searchdocument BEGIN
+        INSERT INTO dishes_searchdocument_fts(rowid, title, category_name, description)
+        VALUES (new.id, new.title, new.category_name, new.description);
+    END
+    """,
+    """
+    CREATE TRIGGER dishes_searchdocument_ad AFTER DELETE ON dishes_searchdocument BEGIN
+        INSERT INTO dishes_searchdocument_fts(dishes_searchdocument_fts, rowid, title, category_name, description)
+        VALUES ('delete', old.id, old.title, old.category_name, old.description);
+    END
+    """,
+    """
+    CREATE TRIGGER dishes_searchdocument_au AFTER UPDATE ON dishes_searchdocument BEGIN
+        INSERT INTO dishes_searchdocument_fts(dishes_searchdocument_fts, rowid, title, category_name, description)
+        VALUES ('delete', old.id, old.title, old.category_name, old.description);
+        INSERT INTO dishes_searchdocument_fts(rowid, title, category_name, description)
+        VALUES (new.id, new.title, new.category_name, new.description);
+    END
+    """,
+]
+SQLITE_DROP = ["DROP TABLE IF EXISTS dishes_searchdocument_fts"]
+
+# PostgreSQL: a generated tsvector weighting titles over category names over
+# descriptions, behind a GIN index.
+POSTGRESQL_INDEX = [
+    """
+    ALTER TABLE dishes_searchdocument ADD COLUMN search_vector tsvector GENERATED ALWAYS AS (
+        setweight(to_tsvector('english', coalesce(title, '')), 'A')
+        || setweight(to_tsvector('english', coalesce(category_name, '')), 'B')
+        || setweight(to_tsvector('english', coalesce(description, '')), 'C')
+    ) STORED
+    """,
+    "CREATE INDEX dishes_searchdocument_vector_idx ON dishes_searchdocument USING GIN (search_vector)",
+]
+POSTGRESQL_DROP = [
+    "DROP INDEX IF EXISTS dishes_searchdocument_vector_idx",
+    "ALTER TABLE dishes_searchdocument DROP COLUMN IF EXISTS search_vector",
+]
+
+
+def create_search_index(apps, schema_editor):
+    # Other databases fall back to icontains lookups, see dishes/search.py.
+    statements = {'sqlite': SQLITE_INDEX, 'postgresql': POSTGRESQL_INDEX}
+    for sql in statements.get(schema_editor.connection.vendor, []):
+        schema_editor.execute(sql)
+
+
+def drop_search_index(apps, schema_editor):
+    statements = {'sqlite': SQLITE_DROP, 'postgresql': POSTGRESQL_DROP}
+    for sql in statements.get(schema_editor.connection.vendor, []):
+        schema_editor.execute(sql)
+
+
+def index_menu(apps, schema_editor):
+    # Indexes the existing menu once; signals keep the documents current from here on.
+    SearchDocument = apps.get_model('dishes', 'SearchDocument')
+    for kind, model_name in (('dish', 'Dishes'), ('drink', 'Drink')):
+        model = apps.get_model('dishes', model_name)
+        SearchDocument.objects.bulk_create(
+            (
+                SearchDocument(
+                    kind=kind, object_id=item.pk, title=item.title, slug=item.slug,
+                    description=item.description, price=item.price, category_id=item.category_id,
+                    category_name=item.category.name if item.category else '',
+                    published=item.status == 1,
+                )
+                for item in model.objects.select_related('category').iterator()
+            ),
+            batch_size=500,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dishes', '0010_reservation_day_summary'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchDocument',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('dish', 'Dish'), ('drink', 'Drink')], max_length=10)),
+                ('object_id', models.PositiveIntegerField()),
+                ('title', models.CharField(max_length=200)),
+                ('slug', models.SlugField(max_length=200)),
+                ('description', models.TextField(blank=True)),
+                ('price', models.DecimalField(decimal_places=2, default=0.0, max_digits=6)),
+                ('category_name', models.CharField(blank=True, max_length=100)),
+                ('published', models.BooleanField(default=False)),
+                ('category', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='search_documents', to='dishes.category')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('kind', 'object_id'), name='unique_search_document')],
+            },
+        ),
+        migrations.RunPython(create_search_index, drop_search_index),
+        migrations.RunPython(index_menu, migrations.RunPython.noop),
+    ]
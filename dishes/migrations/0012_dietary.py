@@ -0,0 +1,33 @@
+# Generated by Django 5.2.4 on 2026-10-18 11:19
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dishes', '0011_search_document'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='dishes',
+            name='dietary',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='drink',
+            name='dietary',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='dishes',
+            index=models.Index(fields=['status', 'dietary'], name='dish_status_dietary_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='drink',
+            index=models.Index(fields=['status', 'dietary'], name='drink_status_dietary_idx'),
+        ),
+    ]
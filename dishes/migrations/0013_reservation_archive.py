@@ -0,0 +1,35 @@
+# Generated by Django 5.2.4 on 2026-10-18 11:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dishes', '0012_dietary'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReservationArchive',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('name', models.CharField(max_length=100)),
+                ('email', models.EmailField(max_length=254)),
+                ('phone', models.CharField(blank=True, max_length=20)),
+                ('guests', models.PositiveIntegerField()),
+                ('date', models.DateField()),
+                ('time', models.TimeField()),
+                ('status', models.IntegerField(choices=[(0, 'Pending'), (1, 'Confirmed'), (2, 'Cancelled')])),
+                ('created_on', models.DateTimeField()),
+                ('updated_on', models.DateTimeField()),
+                ('archived_on', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'verbose_name': 'Archived reservation',
+                'verbose_name_plural': 'Archived reservations',
+                'ordering': ['-date', '-time'],
+                'indexes': [models.Index(fields=['-date', '-time'], name='reservation_archive_date_idx')],
+            },
+        ),
+    ]
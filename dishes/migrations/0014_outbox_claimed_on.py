@@ -0,0 +1,18 @@
+# Generated by Django 5.2.4 on 2026-10-18 11:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dishes', '0013_reservation_archive'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='outboxemail',
+            name='claimed_on',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
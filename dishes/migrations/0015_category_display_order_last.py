@@ -0,0 +1,18 @@
+# Generated by Django 5.2.4 on 2026-10-18 12:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dishes', '0014_outbox_claimed_on'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='category',
+            name='display_order',
+            field=models.PositiveIntegerField(blank=True),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.4 on 2026-10-18 12:16
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dishes', '0015_category_display_order_last'),
+    ]
+
+    operations = [
+        migrations.RenameField(
+            model_name='reservationslot',
+            old_name='bookings',
+            new_name='lock_version',
+        ),
+    ]
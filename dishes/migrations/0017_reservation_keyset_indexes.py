@@ -0,0 +1,29 @@
+# Generated by Django 5.2.4 on 2026-10-18 12:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dishes', '0016_reservation_slot_lock_version'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='reservation',
+            name='reservation_created_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='reservation',
+            name='reservation_status_created_idx',
+        ),
+        migrations.AddIndex(
+            model_name='reservation',
+            index=models.Index(fields=['-created_on', '-id'], name='reservation_keyset_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='reservation',
+            index=models.Index(fields=['status', '-created_on', '-id'], name='reservation_status_keyset_idx'),
+        ),
+    ]
@@ -7,14 +7,22 @@ from django.contrib.auth.models import User # Imports Django's built-in User mod
 # Using a separate model for categories promotes data normalization and easier management.
 class Category(models.Model):
     name = models.CharField(max_length=100, unique=True) # Unique name for the category.
+    display_order = models.PositiveIntegerField(blank=True) # Position of the category on the menu; lower comes first. Left blank, after the others.
+    updated_on = models.DateTimeField(auto_now=True) # Automatically updated on every save; part of the menu's Last-Modified.
 
     class Meta:
         verbose_name_plural = "Categories" # Correct plural form for the admin interface.
-        ordering = ['name'] # Orders the categories alphabetically by name.
+        ordering = ['display_order', 'name'] # Orders the categories by menu position, then alphabetically.
 
     def __str__(self):
         return self.name # Returns the category name for display.
 
+    def save(self, *args, **kwargs):
+        if self.display_order is None: # New categories go last, as import_menu places them.
+            last = Category.objects.aggregate(last=models.Max('display_order'))['last']
+            self.display_order = 0 if last is None else last + 1
+        super().save(*args, **kwargs)
+
 # Represents a single dish on the restaurant menu.
 class Dishes(models.Model): # The model name is Dishes as requested.
     title = models.CharField(max_length=200, unique=True) # Unique title for the dish.
@@ -31,6 +39,7 @@ class Dishes(models.Model): # The model name is Dishes as requested.
     # ingredients = models.TextField(blank=True) # Detailed list of ingredients. REMOVED AS REQUESTED.
     # instructions = models.TextField(blank=True) # Preparation instructions for the dish. REMOVED AS REQUESTED.
     price = models.DecimalField(max_digits=6, decimal_places=2, default=0.00) # NEW: Price field for dishes.
+    dietary = models.PositiveIntegerField(default=0) # Dietary/allergen attributes as a bitmask, see dishes/dietary.py.
     
     # Defines the publication status of the dish (Draft or Published).
     STATUS = ((0, "Draft"), (1, "Published"))
@@ -44,6 +53,11 @@ class Dishes(models.Model): # The model name is Dishes as requested.
     class Meta:
         ordering = ["-created_on"] # Orders the dishes by creation date, newest first.
         verbose_name_plural = "Dishes" # Correct plural form for the admin interface.
+        indexes = [
+            models.Index(fields=['status', '-created_on'], name='dish_status_created_idx'), # Published menu.
+            models.Index(fields=['-created_on'], name='dish_created_idx'), # Admin list, newest first.
+            models.Index(fields=['status', 'dietary'], name='dish_status_dietary_idx'), # Dietary menu filter.
+        ]
 
     def __str__(self):
         return self.title # Returns the dish title for object representation.
@@ -62,6 +76,7 @@ class Drink(models.Model):
 
     description = models.TextField(blank=True) # Optional brief description of the drink.
     price = models.DecimalField(max_digits=6, decimal_places=2, default=0.00) # NEW: Price field for drinks.
+    dietary = models.PositiveIntegerField(default=0) # Dietary/allergen attributes as a bitmask, see dishes/dietary.py.
     # Ingredients/instructions are not required for drinks on the public menu.
     
     # Defines the publication status of the drink (Draft or Published).
@@ -74,6 +89,11 @@ class Drink(models.Model):
     class Meta:
         ordering = ["title"] # Orders the drinks alphabetically by title.
         verbose_name_plural = "Drinks" # Correct plural form for the admin interface.
+        indexes = [
+            models.Index(fields=['status', 'title'], name='drink_status_title_idx'), # Published menu.
+            models.Index(fields=['-created_on'], name='drink_created_idx'), # Admin date hierarchy.
+            models.Index(fields=['status', 'dietary'], name='drink_status_dietary_idx'), # Dietary menu filter.
+        ]
 
     def __str__(self):
         return self.title # Returns the drink title for object representation.
@@ -96,6 +116,160 @@ class Reservation(models.Model):
     class Meta:
         ordering = ["-created_on"] # Newest reservations first
         verbose_name_plural = "Reservations"
+        indexes = [
+            # Serves the per-slot availability lookups (see dishes/availability.py).
+            models.Index(fields=['date', 'time', 'status'], name='reservation_slot_idx'),
+            # Admin list, newest first, with and without the status filter. The id
+            # breaks ties in the keyset order, so each page is a plain index walk.
+            models.Index(fields=['-created_on', '-id'], name='reservation_keyset_idx'),
+            models.Index(fields=['status', '-created_on', '-id'], name='reservation_status_keyset_idx'),
+        ]
     
     def __str__(self):
-        return f"{self.name} - {self.date} at {self.time}"
\ No newline at end of file
+        return f"{self.name} - {self.date} at {self.time}"
+
+# NEW MODEL: Reservations moved out of the live table once their date is
+# RESERVATION_ARCHIVE_DAYS in the past (see dishes/archive.py), so the live
+# table only holds recent and upcoming bookings. Rows keep their id.
+class ReservationArchive(models.Model):
+    id = models.BigIntegerField(primary_key=True) # The reservation's id.
+    name = models.CharField(max_length=100)
+    email = models.EmailField()
+    phone = models.CharField(max_length=20, blank=True)
+    guests = models.PositiveIntegerField()
+    date = models.DateField()
+    time = models.TimeField()
+    status = models.IntegerField(choices=Reservation.STATUS)
+    created_on = models.DateTimeField() # Copied from the reservation.
+    updated_on = models.DateTimeField()
+    archived_on = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ["-date", "-time"] # Most recent bookings first
+        verbose_name = "Archived reservation"
+        verbose_name_plural = "Archived reservations"
+        indexes = [
+            # Admin and history lists, most recent first.
+            models.Index(fields=['-date', '-time'], name='reservation_archive_date_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.name} - {self.date} at {self.time}"
+
+# NEW MODEL: Reservation counts per day and time slot, kept up to date as
+# reservations change (see dishes/summary.py). Read by the admin dashboard
+# instead of counting the reservations table.
+class ReservationDaySummary(models.Model):
+    date = models.DateField()
+    time = models.TimeField()
+    pending = models.IntegerField(default=0)
+    confirmed = models.IntegerField(default=0)
+    cancelled = models.IntegerField(default=0)
+    guests = models.IntegerField(default=0) # Guests of pending and confirmed reservations.
+
+    class Meta:
+        ordering = ["date", "time"]
+        verbose_name = "Reservation day summary"
+        verbose_name_plural = "Reservation dashboard"
+        constraints = [
+            models.UniqueConstraint(fields=['date', 'time'], name='unique_reservation_day_summary'),
+        ]
+
+    def __str__(self):
+        return f"{self.date} at {self.time}"
+
+# NEW MODEL: How many tables and covers (seats) can be booked into a time slot on a given weekday.
+class SlotCapacity(models.Model):
+    WEEKDAYS = (
+        (0, "Monday"), (1, "Tuesday"), (2, "Wednesday"), (3, "Thursday"),
+        (4, "Friday"), (5, "Saturday"), (6, "Sunday"),
+    )
+    weekday = models.IntegerField(choices=WEEKDAYS) # Same numbering as date.weekday().
+    time = models.TimeField() # Start time of the slot; reservations must match it exactly.
+    tables = models.PositiveIntegerField() # Maximum number of reservations in the slot.
+    covers = models.PositiveIntegerField() # Maximum number of guests in the slot.
+
+    class Meta:
+        ordering = ['weekday', 'time']
+        verbose_name_plural = "Slot capacities"
+        constraints = [
+            models.UniqueConstraint(fields=['weekday', 'time'], name='unique_slot_capacity'),
+        ]
+
+    def __str__(self):
+        return f"{self.get_weekday_display()} {self.time:%H:%M} ({self.tables} tables, {self.covers} covers)"
+
+
+# NEW MODEL: One lock row per booked date and time slot. Bookings lock it so
+# that concurrent requests for the same slot are checked and saved one at a
+# time. It counts nothing: seats are counted from the reservations themselves.
+class ReservationSlot(models.Model):
+    date = models.DateField()
+    time = models.TimeField()
+    lock_version = models.PositiveIntegerField(default=0) # Bumped by every booking that locks the row; the UPDATE is what takes the lock.
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['date', 'time'], name='unique_reservation_slot'),
+        ]
+
+    def __str__(self):
+        return f"{self.date} at {self.time}"
+
+
+# NEW MODEL: E-mails waiting to be sent by the send_outbox worker, so requests never wait on SMTP.
+class OutboxEmail(models.Model):
+    KINDS = (("confirmed", "Reservation confirmed"), ("cancelled", "Reservation cancelled"))
+    STATUS = ((0, "Pending"), (1, "Sent"), (2, "Failed"))
+
+    reservation = models.ForeignKey(
+        Reservation, on_delete=models.SET_NULL, null=True, blank=True, related_name="emails"
+    ) # The message is self-contained, so it outlives its reservation.
+    kind = models.CharField(max_length=20, choices=KINDS)
+    to_email = models.EmailField()
+    subject = models.CharField(max_length=200)
+    body = models.TextField()
+    status = models.IntegerField(choices=STATUS, default=0)
+    attempts = models.PositiveIntegerField(default=0) # Failed sends so far; the worker gives up after a few.
+    last_error = models.TextField(blank=True)
+    claimed_on = models.DateTimeField(null=True, blank=True) # Set while a worker is sending it.
+    created_on = models.DateTimeField(auto_now_add=True)
+    sent_on = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ["created_on"] # Oldest first, the order they are sent in.
+        verbose_name_plural = "Outbox e-mails"
+        indexes = [
+            models.Index(fields=['status', 'created_on'], name='outbox_pending_idx'), # The worker's queue.
+        ]
+
+    def __str__(self):
+        return f"{self.get_kind_display()} to {self.to_email}"
+
+
+# NEW MODEL: One row per dish or drink, denormalized for full-text search. The
+# search index itself (FTS5 on SQLite, a weighted tsvector with a GIN index on
+# PostgreSQL) is created by migration 0011 and kept in step by the database;
+# dishes/search.py keeps these rows in step with the menu.
+class SearchDocument(models.Model):
+    KINDS = (("dish", "Dish"), ("drink", "Drink"))
+
+    kind = models.CharField(max_length=10, choices=KINDS)
+    object_id = models.PositiveIntegerField() # Primary key of the dish or drink.
+    title = models.CharField(max_length=200)
+    slug = models.SlugField(max_length=200)
+    description = models.TextField(blank=True)
+    price = models.DecimalField(max_digits=6, decimal_places=2, default=0.00)
+    category = models.ForeignKey(
+        Category, on_delete=models.SET_NULL, null=True, blank=True, related_name="search_documents"
+    )
+    category_name = models.CharField(max_length=100, blank=True) # Indexed alongside the title and description.
+    published = models.BooleanField(default=False)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['kind', 'object_id'], name='unique_search_document'),
+        ]
+
+    def __str__(self):
+        return f"{self.get_kind_display()}: {self.title}"
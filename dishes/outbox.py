@@ -0,0 +1,108 @@
+# dishes/outbox.py
+
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import connection, transaction
+from django.db.models import Q
+from django.template.loader import render_to_string
+from django.utils import timezone
+
+from .models import OutboxEmail
+
+logger = logging.getLogger(__name__)
+
+# Reservation status -> outbox e-mail kind.
+STATUS_EMAILS = {1: 'confirmed', 2: 'cancelled'}
+SUBJECTS = {
+    'confirmed': "Your table at The Cameroonian Table is confirmed",
+    'cancelled': "Your reservation at The Cameroonian Table was cancelled",
+}
+MAX_ATTEMPTS = 5
+CLAIM_TIMEOUT = timedelta(minutes=10) # Longer than any batch takes to send.
+
+
+def queue_status_emails(reservations, status):
+    """Queues the e-mail for ``status`` (confirmed/cancelled) to each reservation, in one INSERT."""
+    kind = STATUS_EMAILS.get(status)
+    if kind is None:
+        return []
+    return OutboxEmail.objects.bulk_create(
+        OutboxEmail(
+            reservation=reservation,
+            kind=kind,
+            to_email=reservation.email,
+            subject=SUBJECTS[kind],
+            body=render_to_string(f'dishes/email/{kind}.txt', {'reservation': reservation}),
+        )
+        for reservation in reservations
+    )
+
+
+def claim(batch_size):
+    """
+    Claims up to ``batch_size`` queued e-mails for this worker, in one short transaction.
+
+    Rows are picked with SELECT ... FOR UPDATE SKIP LOCKED where the database
+    supports it, so several workers never send the same e-mail. A claim runs
+    out after CLAIM_TIMEOUT, in case its worker died mid-batch.
+    """
+    now = timezone.now()
+    claimable = Q(claimed_on__isnull=True) | Q(claimed_on__lt=now - CLAIM_TIMEOUT)
+    with transaction.atomic():
+        pending = OutboxEmail.objects.filter(claimable, status=0).order_by('created_on')
+        if connection.features.has_select_for_update_skip_locked:
+            pending = pending.select_for_update(skip_locked=True)
+        ids = list(pending.values_list('pk', flat=True)[:batch_size])
+        # The UPDATE checks again, for databases without SKIP LOCKED where another worker got there first.
+        OutboxEmail.objects.filter(claimable, pk__in=ids, status=0).update(claimed_on=now)
+    return list(OutboxEmail.objects.filter(pk__in=ids, claimed_on=now).order_by('created_on'))
+
+
+def record_failure(email, error):
+    """Counts a failed attempt at ``email`` and releases it for a later batch, or gives up after MAX_ATTEMPTS."""
+    logger.warning("Sending outbox e-mail %s failed: %s", email.pk, error)
+    email.attempts += 1
+    email.last_error = str(error)
+    email.claimed_on = None
+    if email.attempts >= MAX_ATTEMPTS:
+        email.status = 2
+    email.save(update_fields=['attempts', 'last_error', 'claimed_on', 'status'])
+
+
+def send_pending(batch_size=100):
+    """
+    Sends up to ``batch_size`` queued e-mails over one SMTP connection.
+
+    The SMTP traffic happens outside any transaction: the batch is claimed
+    first and each result is saved as soon as it is known. An e-mail that
+    cannot be sent, or whose connection cannot be opened, is retried on
+    later batches, up to MAX_ATTEMPTS times. Returns the number of e-mails sent.
+    """
+    batch = claim(batch_size)
+    if not batch:
+        return 0
+
+    sent = 0
+    try:
+        mail = get_connection()
+        mail.open() # Once for the whole batch.
+    except Exception as error:
+        for email in batch:
+            record_failure(email, error)
+        return 0
+    try:
+        for email in batch:
+            message = EmailMessage(email.subject, email.body, settings.DEFAULT_FROM_EMAIL, [email.to_email])
+            try:
+                mail.send_messages([message])
+            except Exception as error:
+                record_failure(email, error)
+            else:
+                OutboxEmail.objects.filter(pk=email.pk).update(status=1, sent_on=timezone.now(), claimed_on=None)
+                sent += 1
+    finally:
+        mail.close()
+    return sent
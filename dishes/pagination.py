@@ -0,0 +1,128 @@
+# dishes/pagination.py
+
+# Admin changelists that stay fast on tables with millions of rows. Counts
+# are exact up to ADMIN_EXACT_COUNT_LIMIT rows and estimated above it, and
+# the reservation list pages by keyset, (created_on, pk) < the last row
+# shown, instead of by OFFSET, so the thousandth page costs an index range
+# scan like the first.
+
+import json
+
+from django.conf import settings
+from django.contrib.admin.options import IncorrectLookupParameters
+from django.contrib.admin.views.main import ChangeList
+from django.core.paginator import Paginator
+from django.db import connections
+from django.utils.dateparse import parse_datetime
+from django.utils.functional import cached_property
+
+CURSOR_VAR = 'after' # Query string parameter holding the keyset cursor.
+
+
+def estimate_count(queryset):
+    """
+    Returns the database's estimate of the rows in ``queryset``: the planner's
+    on PostgreSQL, the ANALYZE statistics of unfiltered tables on SQLite, or
+    None when there is none.
+    """
+    connection = connections[queryset.db]
+    if connection.vendor == 'postgresql':
+        sql, params = queryset.order_by().query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+            plan = cursor.fetchone()[0]
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        return int(plan[0]['Plan']['Plan Rows'])
+    if connection.vendor == 'sqlite' and not queryset.query.has_filters():
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'sqlite_stat1'")
+            if cursor.fetchone() is None: # ANALYZE has never run.
+                return None
+            # The first number of any of the table's rows is its row count.
+            cursor.execute("SELECT stat FROM sqlite_stat1 WHERE tbl = %s LIMIT 1", [queryset.model._meta.db_table])
+            row = cursor.fetchone()
+        return int(row[0].split()[0]) if row else None
+    return None
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    A paginator that counts at most ADMIN_EXACT_COUNT_LIMIT + 1 rows. Longer
+    lists get the database's estimate instead of a COUNT(*) over all of
+    them; ``estimated`` then says how to read the count ("about" or
+    "over").
+    """
+
+    estimated = None
+
+    @cached_property
+    def count(self):
+        limit = getattr(settings, 'ADMIN_EXACT_COUNT_LIMIT', 10000)
+        # COUNT(*) over a LIMIT subquery stops reading after limit + 1 rows.
+        exact = self.object_list.order_by()[:limit + 1].count()
+        if exact <= limit:
+            return exact
+        estimate = estimate_count(self.object_list)
+        if estimate is None or estimate <= limit:
+            self.estimated = 'over'
+            return limit
+        self.estimated = 'about'
+        return estimate
+
+
+class KeysetChangeList(ChangeList):
+    """
+    A changelist that pages its default newest-first order by keyset:
+    ?after=<cursor> lists the rows older than the cursor's. Lists sorted by
+    another column page by number as usual.
+    """
+
+    keyset_field = 'created_on'
+    keyset = False
+    next_url = first_url = None
+
+    def __init__(self, request, *args, **kwargs):
+        self.cursor = request.GET.get(CURSOR_VAR)
+        super().__init__(request, *args, **kwargs)
+
+    def get_filters_params(self, params=None):
+        lookup_params = super().get_filters_params(params)
+        lookup_params.pop(CURSOR_VAR, None)
+        return lookup_params
+
+    def get_query_string(self, new_params=None, remove=None):
+        # Filter, search and sort links start again from the newest rows.
+        return super().get_query_string(new_params, [CURSOR_VAR, *(remove or [])])
+
+    def get_results(self, request):
+        self.keyset = list(self.queryset.query.order_by) == [f'-{self.keyset_field}', '-pk']
+        if not self.keyset:
+            return super().get_results(request)
+
+        queryset = self.queryset
+        if self.cursor:
+            value, _, pk = self.cursor.rpartition(',')
+            value = parse_datetime(value)
+            if value is None or not pk.isdigit():
+                raise IncorrectLookupParameters(f"Invalid cursor {self.cursor!r}.")
+            # (field, pk) < (value, pk), written so the index on the field serves it.
+            queryset = queryset.filter(**{f'{self.keyset_field}__lte': value}).exclude(
+                **{self.keyset_field: value, 'pk__gte': int(pk)}
+            )
+        rows = list(queryset[:self.list_per_page + 1]) # One extra row tells whether there is a next page.
+
+        self.paginator = self.model_admin.get_paginator(request, self.queryset, self.list_per_page)
+        self.result_count = self.paginator.count
+        self.result_list = rows[:self.list_per_page]
+        self.show_full_result_count = False
+        self.full_result_count = None
+        self.show_admin_actions = True
+        self.can_show_all = False # Listing every row is what paging avoids.
+        self.multi_page = len(rows) > self.list_per_page or bool(self.cursor)
+        if len(rows) > self.list_per_page:
+            last = self.result_list[-1]
+            cursor = f'{getattr(last, self.keyset_field).isoformat()},{last.pk}'
+            self.next_url = self.get_query_string({CURSOR_VAR: cursor})
+        if self.cursor:
+            self.first_url = self.get_query_string()
@@ -0,0 +1,153 @@
+# dishes/profiling.py
+
+import logging
+import random
+import time
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+from django.template.backends.django import DjangoTemplates, Template
+
+logger = logging.getLogger(__name__)
+
+# Profile of the request being handled, or None when it is not sampled.
+_current = ContextVar('dishes_profile', default=None)
+
+
+class Profile:
+    """Time spent in a single request, in seconds."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.sql_count = 0
+        self.sql_time = 0.0
+        self.template_time = 0.0
+
+
+def record_sql(execute, sql, params, many, context):
+    # Execute wrapper of every connection; times queries of sampled requests.
+    profile = _current.get()
+    if profile is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        profile.sql_count += 1
+        profile.sql_time += time.perf_counter() - started
+
+
+@receiver(connection_created)
+def install_sql_wrapper(sender, connection, **kwargs):
+    # Installed on each connection rather than around each request: under
+    # ASGI, queries run in sync_to_async() threads with their own
+    # connections, which the request's profile is still visible from.
+    if record_sql not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_sql)
+
+
+class ProfiledTemplate(Template):
+    def render(self, context=None, request=None):
+        profile = _current.get()
+        if profile is None:
+            return super().render(context, request)
+        started = time.perf_counter()
+        try:
+            return super().render(context, request)
+        finally:
+            profile.template_time += time.perf_counter() - started
+
+
+class ProfiledDjangoTemplates(DjangoTemplates):
+    """
+    The Django template backend, timing renders for ProfilingMiddleware.
+
+    Only top-level renders are timed ({% include %} and {% extends %} happen
+    inside them), so nothing is counted twice. Outside a sampled request it
+    behaves exactly like DjangoTemplates.
+    """
+
+    def from_string(self, template_code):
+        return ProfiledTemplate(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        # Keeps DjangoTemplates' TemplateDoesNotExist translation.
+        return ProfiledTemplate(super().get_template(template_name).template, self)
+
+
+class ProfilingMiddleware:
+    """
+    Records wall time, SQL query count and time, and template render time.
+
+    Opt-in with PROFILING_ENABLED; PROFILING_SAMPLE_RATE (0.0 to 1.0) sets the
+    share of requests profiled, so it can stay on in production. Sampled
+    responses get a Server-Timing header, read by browser dev tools, and a
+    log line on the "dishes.profiling" logger.
+    """
+
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def sampled(self):
+        return (
+            getattr(settings, 'PROFILING_ENABLED', False)
+            and random.random() < getattr(settings, 'PROFILING_SAMPLE_RATE', 1.0)
+        )
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not self.sampled():
+            return self.get_response(request)
+
+        profile = Profile()
+        token = _current.set(profile)
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.report(request, response, profile)
+
+    async def __acall__(self, request):
+        if not self.sampled():
+            return await self.get_response(request)
+
+        profile = Profile()
+        token = _current.set(profile)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.report(request, response, profile)
+
+    def report(self, request, response, profile):
+        total_ms = (time.perf_counter() - profile.started) * 1000
+        sql_ms = profile.sql_time * 1000
+        template_ms = profile.template_time * 1000
+        response['Server-Timing'] = (
+            f'app;dur={total_ms:.1f}, '
+            f'db;dur={sql_ms:.1f};desc="{profile.sql_count} queries", '
+            f'tpl;dur={template_ms:.1f}'
+        )
+        logger.info(
+            'profile method=%s path=%s status=%s total_ms=%.1f sql_count=%d sql_ms=%.1f template_ms=%.1f',
+            request.method, request.path, response.status_code,
+            total_ms, profile.sql_count, sql_ms, template_ms,
+            extra={
+                'method': request.method,
+                'path': request.path,
+                'status': response.status_code,
+                'total_ms': round(total_ms, 1),
+                'sql_count': profile.sql_count,
+                'sql_ms': round(sql_ms, 1),
+                'template_ms': round(template_ms, 1),
+            },
+        )
+        return response
@@ -0,0 +1,132 @@
+# dishes/ratelimit.py
+
+# Token buckets limiting reservation submissions per client IP and per
+# e-mail address. A bucket holds up to N tokens and refills at N per period,
+# so a client may send a burst of N and then one every period/N. A
+# submission goes ahead only if every one of its buckets has a token, and
+# then spends one from each; a rejected one spends none. The buckets live in
+# Django's cache, shared by every worker when the cache is (file, database,
+# redis); with the default local-memory cache each worker process keeps its
+# own buckets, multiplying the limits (manage.py check --deploy warns).
+# Cache backends offer no compare-and-set, so concurrent requests
+# may both spend the same token: a bucket can overshoot by the number of
+# requests in flight at once, never by a flood.
+
+import hashlib
+import math
+import re
+import time
+
+from django.conf import settings
+from django.core import checks
+from django.core.cache import caches
+from django.core.exceptions import ImproperlyConfigured
+
+# Rates look like allauth's ACCOUNT_RATE_LIMITS: "10/h", "3/15m".
+RATE_RE = re.compile(r'^(?P<tokens>\d+)/(?P<count>\d*)(?P<unit>[smhd])$')
+UNITS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+
+def parse_rate(rate):
+    """Parses a "tokens/period" rate into (tokens, period in seconds)."""
+    match = RATE_RE.match(rate.strip())
+    if match is None or int(match['tokens']) < 1:
+        raise ImproperlyConfigured(f"Invalid rate {rate!r}; use e.g. '10/h' or '3/15m'.")
+    return int(match['tokens']), int(match['count'] or 1) * UNITS[match['unit']]
+
+
+def get_cache():
+    return caches[getattr(settings, 'RESERVATION_RATE_LIMIT_CACHE', 'default')]
+
+
+def client_ip(request):
+    """
+    Returns the address of the client that sent ``request``.
+
+    Each of the RESERVATION_RATE_LIMIT_TRUSTED_PROXIES proxies in front of
+    the app (1 behind the Heroku router) appends the address it was reached
+    from to X-Forwarded-For, so the client is that many entries from the
+    end. Entries further left come from the client and may be forged.
+    """
+    proxies = getattr(settings, 'RESERVATION_RATE_LIMIT_TRUSTED_PROXIES', 0)
+    forwarded = [ip.strip() for ip in request.META.get('HTTP_X_FORWARDED_FOR', '').split(',') if ip.strip()]
+    if proxies and forwarded:
+        return forwarded[-min(proxies, len(forwarded))]
+    return request.META.get('REMOTE_ADDR')
+
+
+def buckets(request):
+    """Returns the (cache key, rate) of every bucket a reservation ``request`` spends from."""
+    limits = getattr(settings, 'RESERVATION_RATE_LIMITS', {})
+    keys = []
+    ip = client_ip(request)
+    if limits.get('ip') and ip:
+        keys.append((f'ratelimit:reserve:ip:{ip}', limits['ip']))
+    # The raw field, normalized: validating the form would already cost queries.
+    email = request.POST.get('email', '').strip().lower()
+    if limits.get('email') and email:
+        digest = hashlib.md5(email.encode()).hexdigest() # Keeps keys short and memcached-safe.
+        keys.append((f'ratelimit:reserve:email:{digest}', limits['email']))
+    return keys
+
+
+def spend(state, rate, now):
+    # Refills the bucket ``state`` (tokens, updated) up to ``now`` and takes a
+    # token. Returns the new state and the seconds until a token is available
+    # (0 when one was taken).
+    capacity, period = parse_rate(rate)
+    tokens, updated = state or (capacity, now)
+    tokens = min(capacity, tokens + (now - updated) * capacity / period)
+    if tokens >= 1:
+        return (tokens - 1, now), 0
+    return (tokens, now), (1 - tokens) * period / capacity
+
+
+def spend_all(limits, states, now):
+    # Takes a token from every bucket of ``limits`` or, when any is empty,
+    # from none, so a request one bucket turns away costs the others nothing.
+    # Returns the {key: (state, rate)} to save and the seconds to wait (0
+    # when the request may go ahead).
+    spent, wait = {}, 0
+    for key, rate in limits:
+        state, bucket_wait = spend(states.get(key), rate, now)
+        spent[key] = (state, rate)
+        wait = max(wait, bucket_wait)
+    return ({} if wait else spent), wait
+
+
+def check(request):
+    """
+    Spends a token from each of the request's buckets. Returns 0 when the
+    request may go ahead, else the seconds to wait before retrying.
+    """
+    cache, limits = get_cache(), buckets(request)
+    spent, wait = spend_all(limits, cache.get_many([key for key, _ in limits]), time.time())
+    for key, (state, rate) in spent.items():
+        # A bucket left alone for a whole period is full again, same as no bucket.
+        cache.set(key, state, math.ceil(parse_rate(rate)[1]))
+    return wait
+
+
+async def acheck(request):
+    """Async check()."""
+    cache, limits = get_cache(), buckets(request)
+    spent, wait = spend_all(limits, await cache.aget_many([key for key, _ in limits]), time.time())
+    for key, (state, rate) in spent.items():
+        await cache.aset(key, state, math.ceil(parse_rate(rate)[1]))
+    return wait
+
+
+@checks.register(checks.Tags.caches, deploy=True)
+def shared_cache_check(app_configs, **kwargs):
+    """Warns when the buckets live in a per-process cache, so each worker counts on its own."""
+    cache_alias = getattr(settings, 'RESERVATION_RATE_LIMIT_CACHE', 'default')
+    limits = getattr(settings, 'RESERVATION_RATE_LIMITS', {})
+    if any(limits.values()) and settings.CACHES[cache_alias]['BACKEND'].endswith('.LocMemCache'):
+        return [checks.Warning(
+            f"The reservation rate limits are kept in the local-memory cache {cache_alias!r}, "
+            "so every worker process allows the full rate.",
+            hint="Set CACHE_BACKEND and CACHE_LOCATION to a shared cache, e.g. redis or the database.",
+            id='dishes.W001',
+        )]
+    return []
@@ -0,0 +1,141 @@
+# dishes/search.py
+
+# Full-text search over the menu. Every dish and drink has a SearchDocument
+# row holding what is searched (title, category name, description) and what
+# a result shows; the database indexes those rows itself (see migration
+# 0011). A search is one query: the full-text match, ranked, joined to the
+# documents.
+
+import re
+
+from django.db import connection, transaction
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+
+from .models import Dishes, Drink, SearchDocument
+
+MODELS = {'dish': Dishes, 'drink': Drink}
+KINDS = {model: kind for kind, model in MODELS.items()}
+# Columns an indexed item may change.
+DOCUMENT_FIELDS = ['title', 'slug', 'description', 'price', 'category', 'category_name', 'published']
+MAX_TERMS = 8 # Longer queries only make the match slower, not better.
+
+
+def document(item):
+    """Returns the unsaved SearchDocument of dish or drink ``item``."""
+    return SearchDocument(
+        kind=KINDS[type(item)],
+        object_id=item.pk,
+        title=item.title,
+        slug=item.slug,
+        description=item.description,
+        price=item.price,
+        category_id=item.category_id,
+        category_name=item.category.name if item.category_id else '',
+        published=item.status == 1,
+    )
+
+
+def index_items(items, batch_size=500):
+    """Creates or refreshes the documents of ``items``, one upsert per batch."""
+    SearchDocument.objects.bulk_create(
+        [document(item) for item in items], batch_size=batch_size,
+        update_conflicts=True, unique_fields=['kind', 'object_id'], update_fields=DOCUMENT_FIELDS,
+    )
+
+
+def remove_item(item):
+    SearchDocument.objects.filter(kind=KINDS[type(item)], object_id=item.pk).delete()
+
+
+def set_published(queryset, published):
+    """Publishes or unpublishes the documents of a dish or drink ``queryset``, as a bulk status update does."""
+    SearchDocument.objects.filter(
+        kind=KINDS[queryset.model], object_id__in=queryset.values('pk'),
+    ).update(published=published)
+
+
+def rename_category(category, name):
+    """Sets the category name searched in the documents of ``category`` (blank once it is deleted)."""
+    SearchDocument.objects.filter(category=category).exclude(category_name=name).update(category_name=name)
+
+
+def reindex(batch_size=500):
+    """Rebuilds every document and the full-text index from the menu; returns the number of documents."""
+    with transaction.atomic():
+        SearchDocument.objects.all().delete()
+        for model in MODELS.values():
+            index_items(model.objects.select_related('category').iterator(), batch_size=batch_size)
+        if connection.vendor == 'sqlite':
+            with connection.cursor() as cursor: # Also repairs an index that drifted from its table.
+                cursor.execute("INSERT INTO dishes_searchdocument_fts(dishes_searchdocument_fts) VALUES ('rebuild')")
+    return SearchDocument.objects.count()
+
+
+def terms(query):
+    """Splits ``query`` into the lower-cased words a search looks for."""
+    return re.findall(r'[^\W_]+', query.lower())[:MAX_TERMS]
+
+
+def match_sql(words):
+    """
+    Returns (sql, params) selecting the id and rank (lower is better) of the
+    documents that contain every one of ``words``, each as a word prefix, or
+    None when the database has no full-text index.
+    """
+    if connection.vendor == 'sqlite':
+        # bm25() weighs title, category name and description matches 10:5:1.
+        return (
+            "SELECT rowid AS id, bm25(dishes_searchdocument_fts, 10.0, 5.0, 1.0) AS rank "
+            "FROM dishes_searchdocument_fts WHERE dishes_searchdocument_fts MATCH %s",
+            [' '.join(f'"{word}"*' for word in words)],
+        )
+    if connection.vendor == 'postgresql':
+        return (
+            "SELECT id, -ts_rank(search_vector, query) AS rank "
+            "FROM dishes_searchdocument, to_tsquery('english', %s) AS query "
+            "WHERE search_vector @@ query",
+            [' & '.join(f'{word}:*' for word in words)],
+        )
+    return None
+
+
+def fallback_filter(words):
+    # Without a full-text index every word has to appear somewhere, unranked.
+    condition = Q()
+    for word in words:
+        condition &= Q(title__icontains=word) | Q(category_name__icontains=word) | Q(description__icontains=word)
+    return condition
+
+
+def matching_ids(kind, query):
+    """
+    Returns a subquery of the ids of the ``kind`` items matching ``query``,
+    for filtering that model's queryset with pk__in.
+    """
+    words = terms(query)
+    documents = SearchDocument.objects.filter(kind=kind)
+    if not words:
+        return documents.none().values('object_id')
+    match = match_sql(words)
+    if match is None:
+        return documents.filter(fallback_filter(words)).values('object_id')
+    sql, params = match
+    return documents.filter(pk__in=RawSQL(f"SELECT id FROM ({sql}) AS m", params)).values('object_id')
+
+
+def search_menu(query, limit=50):
+    """Returns the published dishes and drinks matching ``query``, best match first, as SearchDocuments."""
+    words = terms(query)
+    if not words:
+        return []
+    match = match_sql(words)
+    if match is None:
+        return list(SearchDocument.objects.filter(fallback_filter(words), published=True).order_by('title')[:limit])
+    sql, params = match
+    columns = ', '.join(f'd.{field.column}' for field in SearchDocument._meta.concrete_fields)
+    return list(SearchDocument.objects.raw(
+        f"SELECT {columns} FROM {SearchDocument._meta.db_table} AS d INNER JOIN ({sql}) AS m ON m.id = d.id "
+        "WHERE d.published = %s ORDER BY m.rank, d.title LIMIT %s",
+        [*params, True, limit],
+    ))
@@ -0,0 +1,72 @@
+# dishes/signals.py
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from .menu import bump_menu_version
+from .models import Category, Dishes, Drink, Reservation
+from . import search
+from .summary import SUMMARY_FIELDS, is_suspended, record_change, snapshot
+
+
+@receiver(post_save, sender=Dishes)
+@receiver(post_save, sender=Drink)
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Dishes)
+@receiver(post_delete, sender=Drink)
+@receiver(post_delete, sender=Category)
+def invalidate_menu(sender, **kwargs):
+    # Any change to what the public menu shows retires the cached copy. Bumping
+    # again on commit stops a request that rendered the old rows mid-transaction
+    # from caching them under the new version.
+    bump_menu_version()
+    transaction.on_commit(bump_menu_version)
+
+
+@receiver(post_save, sender=Dishes)
+@receiver(post_save, sender=Drink)
+def index_menu_item(sender, instance, **kwargs):
+    search.index_items([instance])
+
+
+@receiver(post_delete, sender=Dishes)
+@receiver(post_delete, sender=Drink)
+def unindex_menu_item(sender, instance, **kwargs):
+    search.remove_item(instance)
+
+
+@receiver(post_save, sender=Category)
+def reindex_category_name(sender, instance, **kwargs):
+    search.rename_category(instance, instance.name)
+
+
+@receiver(pre_delete, sender=Category)
+def unindex_category_name(sender, instance, **kwargs):
+    # Deleting the category only nulls the documents' link to it.
+    search.rename_category(instance, '')
+
+
+@receiver(pre_save, sender=Reservation)
+def remember_summary_fields(sender, instance, **kwargs):
+    # What the summary counted this reservation as before the save.
+    instance._summary_before = None
+    if not instance._state.adding and not is_suspended():
+        instance._summary_before = (
+            Reservation.objects.filter(pk=instance.pk).values(*SUMMARY_FIELDS).first()
+        )
+
+
+@receiver(post_save, sender=Reservation)
+def update_summary_on_save(sender, instance, **kwargs):
+    if is_suspended():
+        return
+    record_change(getattr(instance, '_summary_before', None), snapshot(instance))
+
+
+@receiver(post_delete, sender=Reservation)
+def update_summary_on_delete(sender, instance, **kwargs):
+    if is_suspended():
+        return
+    record_change(snapshot(instance), None)
+
@@ -0,0 +1,155 @@
+# dishes/staticfiles.py
+
+import os
+import re
+from collections import defaultdict
+from io import BytesIO
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.files.base import ContentFile
+from whitenoise import middleware
+from whitenoise.storage import CompressedManifestStaticFilesStorage
+
+try:
+    from PIL import Image
+except ImportError: # Pillow is optional; without it images are collected as they are.
+    Image = None
+
+# Raster images that get responsive variants, and the formats of those variants.
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg')
+VARIANT_FORMATS = {'avif': 'AVIF', 'webp': 'WEBP', 'png': 'PNG', 'jpg': 'JPEG', 'jpeg': 'JPEG'}
+# Variant names, e.g. "img/hero-480w.webp" for "img/hero.png".
+VARIANT_RE = re.compile(r'^(?P<root>.+)-(?P<width>\d+)w\.(?P<ext>[a-z]+)$')
+
+
+async def _read_chunks(file, block_size):
+    # Reads the file in a worker thread, one block at a time.
+    read = sync_to_async(file.read, thread_sensitive=False)
+    while chunk := await read(block_size):
+        yield chunk
+
+
+class WhiteNoiseMiddleware(middleware.WhiteNoiseMiddleware):
+    """
+    WhiteNoise's middleware, usable in an async middleware chain.
+
+    WhiteNoise only ships a synchronous middleware, which Django runs in a
+    thread under ASGI, tying every request to that thread. Looking up a
+    static file is a dictionary read, so this one does it on the event loop
+    and streams matching files without blocking it. Under WSGI it behaves
+    exactly like WhiteNoise's.
+    """
+
+    async_capable = True
+
+    def __init__(self, get_response=None, settings=settings):
+        super().__init__(get_response, settings)
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return super().__call__(request)
+
+    async def __acall__(self, request):
+        if self.autorefresh: # Development only: searches the disk.
+            static_file = await sync_to_async(self.find_file)(request.path_info)
+        else:
+            static_file = self.files.get(request.path_info)
+        if static_file is None:
+            return await self.get_response(request)
+        response = self.serve(static_file, request)
+        if response.file_to_stream is not None:
+            response.streaming_content = _read_chunks(response.file_to_stream, response.block_size)
+        return response
+
+
+def variant_name(name, width, ext):
+    """Returns the name of the ``width`` pixels wide ``ext`` variant of image ``name``."""
+    return f'{os.path.splitext(name)[0]}-{width}w.{ext}'
+
+
+class ResponsiveStaticFilesStorage(CompressedManifestStaticFilesStorage):
+    """
+    WhiteNoise's compressed, hashed static files, plus responsive images.
+
+    collectstatic saves each PNG/JPEG image at every RESPONSIVE_IMAGE_WIDTHS
+    width below its own, in its own format and in the modern
+    RESPONSIVE_IMAGE_FORMATS (AVIF where Pillow supports it, WebP). The
+    variants are then hashed like any other file, so WhiteNoise serves them
+    with immutable, year-long cache headers. Text files get gzip and, with
+    the brotli package installed, brotli copies. Images narrower than the
+    smallest width, such as icons, are left alone, as is everything when
+    Pillow is not installed.
+    """
+
+    _image_variants = None
+
+    def stored_name(self, name):
+        # Until collectstatic has written a manifest, point at the unhashed
+        # files in development. Without DEBUG a missing manifest is a failed
+        # deployment, so it raises ValueError as Django's storage does.
+        if settings.DEBUG and not self.hashed_files:
+            return name
+        return super().stored_name(name)
+
+    def post_process(self, paths, dry_run=False, **options):
+        if not dry_run and Image is not None:
+            paths = {**paths, **self.create_image_variants(paths)}
+        self._image_variants = None
+        yield from super().post_process(paths, dry_run=dry_run, **options)
+
+    def create_image_variants(self, paths):
+        widths = sorted(getattr(settings, 'RESPONSIVE_IMAGE_WIDTHS', [480, 960, 1600]))
+        Image.init()
+        formats = [
+            ext for ext in getattr(settings, 'RESPONSIVE_IMAGE_FORMATS', ['avif', 'webp'])
+            if VARIANT_FORMATS[ext] in Image.SAVE
+        ]
+        variants = {}
+        for name, (storage, path) in paths.items():
+            ext = os.path.splitext(name)[1].lower()
+            if ext not in IMAGE_EXTENSIONS or VARIANT_RE.match(name):
+                continue
+            with storage.open(path) as f:
+                image = Image.open(f)
+                image.load()
+            if image.width < widths[0]:
+                continue
+            if image.mode not in ('RGB', 'RGBA'): # Palette and greyscale PNGs.
+                image = image.convert('RGBA')
+            for width in [w for w in widths if w < image.width] + [image.width]:
+                resized = image if width == image.width else image.resize(
+                    (width, round(image.height * width / image.width)), Image.LANCZOS
+                )
+                # The original already covers its own format at full width.
+                for variant_ext in formats + ([ext[1:]] if width < image.width else []):
+                    variant = variant_name(name, width, variant_ext)
+                    buffer = BytesIO()
+                    fmt = VARIANT_FORMATS[variant_ext]
+                    (resized.convert('RGB') if fmt == 'JPEG' else resized).save(buffer, fmt, quality=80)
+                    if self.exists(variant):
+                        self.delete(variant)
+                    self._save(variant, ContentFile(buffer.getvalue()))
+                    variants[variant] = (self, variant)
+        return variants
+
+    def image_variants(self, name):
+        """
+        Returns the collected variants of image ``name`` as
+        {extension: [(width, name), ...]}, narrowest first.
+        """
+        if self._image_variants is None:
+            index = defaultdict(lambda: defaultdict(list))
+            for variant in self.hashed_files:
+                match = VARIANT_RE.match(variant)
+                if match:
+                    index[match['root']][match['ext']].append((int(match['width']), variant))
+            for formats in index.values():
+                for entries in formats.values():
+                    entries.sort()
+            self._image_variants = index
+        return self._image_variants.get(os.path.splitext(name)[0], {})
+
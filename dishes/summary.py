@@ -0,0 +1,137 @@
+# dishes/summary.py
+
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Q, Sum
+
+from .availability import ACTIVE_STATUSES
+from .models import Reservation, ReservationArchive, ReservationDaySummary
+
+# Reservation status -> ReservationDaySummary counter.
+STATUS_FIELDS = {0: 'pending', 1: 'confirmed', 2: 'cancelled'}
+# Reservation columns the summary depends on.
+SUMMARY_FIELDS = ('date', 'time', 'status', 'guests')
+# Set while reservation changes must leave the summary alone; see suspended().
+_suspended = ContextVar('summary_suspended', default=False)
+
+
+@contextmanager
+def suspended():
+    """
+    Keeps reservation saves and deletes inside the block out of the summary,
+    e.g. while archiving moves reservations without changing what was booked.
+    Only affects the current thread or task.
+    """
+    token = _suspended.set(True)
+    try:
+        yield
+    finally:
+        _suspended.reset(token)
+
+
+def is_suspended():
+    return _suspended.get()
+
+
+def snapshot(reservation):
+    """Returns the columns of ``reservation`` the summary counts."""
+    return {field: getattr(reservation, field) for field in SUMMARY_FIELDS}
+
+
+def add_delta(deltas, row, sign):
+    # Counts (sign=1) or uncounts (sign=-1) one reservation in ``deltas``.
+    counters = deltas[(row['date'], row['time'])]
+    counters[STATUS_FIELDS[row['status']]] += sign
+    if row['status'] in ACTIVE_STATUSES:
+        counters['guests'] += sign * row['guests']
+
+
+def apply_deltas(deltas):
+    """
+    Adds ``deltas``, a {(date, time): Counter} mapping, to the summary rows.
+
+    Each slot costs one UPDATE ... SET field = field + n, which stays right
+    under concurrent writers; the row is created the first time its slot
+    is booked.
+    """
+    for (day, slot_time), counters in deltas.items():
+        counters = {field: n for field, n in counters.items() if n}
+        if not counters:
+            continue
+        while True:
+            changes = {field: F(field) + n for field, n in counters.items()}
+            if ReservationDaySummary.objects.filter(date=day, time=slot_time).update(**changes):
+                break
+            try:
+                with transaction.atomic():
+                    ReservationDaySummary.objects.create(date=day, time=slot_time, **counters)
+                break
+            except IntegrityError: # Another writer created the row first; update that one.
+                continue
+
+
+def record_change(before, after):
+    """Moves a reservation in the summary from the ``before`` to the ``after`` snapshot (either may be None)."""
+    if before == after:
+        return
+    deltas = defaultdict(Counter)
+    if before is not None:
+        add_delta(deltas, before, -1)
+    if after is not None:
+        add_delta(deltas, after, 1)
+    apply_deltas(deltas)
+
+
+def record_status_change(reservations, status):
+    """
+    Moves ``reservations`` to ``status`` in the summary, as a bulk update does.
+
+    Pass the reservations with their old status; updates touch one summary
+    row per slot, however many reservations share it.
+    """
+    deltas = defaultdict(Counter)
+    for reservation in reservations:
+        before = snapshot(reservation)
+        add_delta(deltas, before, -1)
+        add_delta(deltas, {**before, 'status': status}, 1)
+    apply_deltas(deltas)
+
+
+def summary_rows(reservations=None):
+    """Aggregates ``reservations`` (all by default) into one summary dict per slot."""
+    if reservations is None:
+        reservations = Reservation.objects.all()
+    counts = {
+        field: Count('pk', filter=Q(status=status)) for status, field in STATUS_FIELDS.items()
+    }
+    return (
+        reservations.order_by('date', 'time')
+        .values('date', 'time')
+        .annotate(**counts, guests=Sum('guests', filter=Q(status__in=ACTIVE_STATUSES), default=0))
+    )
+
+
+def rebuild(batch_size=1000):
+    """
+    Recomputes the whole summary from the live and archived reservations;
+    returns the number of slot rows.
+    """
+    slots = {}
+    with transaction.atomic():
+        for rows in (summary_rows(), summary_rows(ReservationArchive.objects.all())):
+            for row in rows.iterator():
+                key = (row['date'], row['time'])
+                if key in slots: # A slot the archiver is part way through.
+                    for field in (*STATUS_FIELDS.values(), 'guests'):
+                        slots[key][field] += row[field]
+                else:
+                    slots[key] = row
+        ReservationDaySummary.objects.all().delete()
+        rows = ReservationDaySummary.objects.bulk_create(
+            (ReservationDaySummary(**row) for _, row in sorted(slots.items())),
+            batch_size=batch_size,
+        )
+    return len(rows)
@@ -0,0 +1,13 @@
+# dishes/templatetags/dietary_tags.py
+
+from django import template
+
+from ..dietary import labels
+
+register = template.Library()
+
+
+@register.filter
+def dietary_labels(mask):
+    """Renders a dietary bitmask as its labels, e.g. "Vegetarian, Gluten-free"."""
+    return ', '.join(labels(mask or 0))
@@ -0,0 +1,47 @@
+# dishes/templatetags/responsive_images.py
+
+from django import template
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.templatetags.static import static
+from django.utils.html import format_html, format_html_join
+
+register = template.Library()
+
+MIME_TYPES = {'avif': 'image/avif', 'webp': 'image/webp', 'png': 'image/png', 'jpg': 'image/jpeg', 'jpeg': 'image/jpeg'}
+MODERN_FORMATS = ('avif', 'webp') # Most compact first; browsers take the first <source> they support.
+
+
+def _srcset(entries):
+    return ', '.join(f'{static(name)} {width}w' for width, name in entries)
+
+
+@register.simple_tag
+def responsive_image(name, alt='', sizes='100vw', **attrs):
+    """
+    Renders static image ``name`` as a <picture> of its collected variants.
+
+    {% responsive_image "dishes/img/hero.png" alt="Our dining room" sizes="(max-width: 600px) 100vw, 50vw" %}
+
+    The browser picks the narrowest AVIF/WebP/original variant that fills
+    ``sizes``; see dishes.staticfiles.ResponsiveStaticFilesStorage. Extra
+    keyword arguments become <img> attributes. Before collectstatic has
+    created variants, this is a plain <img>.
+    """
+    attrs = {'loading': 'lazy', 'decoding': 'async', **attrs}
+    img_attrs = format_html_join('', ' {}="{}"', ((key.replace('_', '-'), value) for key, value in attrs.items()))
+    variants = getattr(staticfiles_storage, 'image_variants', lambda name: {})(name)
+    if not variants:
+        return format_html('<img src="{}" alt="{}"{}>', static(name), alt, img_attrs)
+
+    ext = name.rsplit('.', 1)[-1].lower()
+    widest = max(width for entries in variants.values() for width, _ in entries)
+    # The original is the widest variant of its own format.
+    fallback = variants.get(ext, []) + [(widest, name)]
+    sources = format_html_join(
+        '', '<source type="{}" srcset="{}" sizes="{}">',
+        ((MIME_TYPES[fmt], _srcset(variants[fmt]), sizes) for fmt in MODERN_FORMATS if fmt in variants),
+    )
+    return format_html(
+        '<picture>{}<img src="{}" srcset="{}" sizes="{}" alt="{}"{}></picture>',
+        sources, static(name), _srcset(fallback), sizes, alt, img_attrs,
+    )
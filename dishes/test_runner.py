@@ -0,0 +1,27 @@
+# dishes/test_runner.py
+
+from django.conf import settings
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+
+class TestRunner(DiscoverRunner):
+    """
+    Django's test runner, with plain static files storage.
+
+    Tests run without DEBUG, where the manifest storage raises for any
+    static file collectstatic has not hashed, so pages could not render.
+    Tests of the manifest storage itself set it back with override_settings.
+    """
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self.static_storage = override_settings(STORAGES={
+            **settings.STORAGES,
+            'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+        })
+        self.static_storage.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        self.static_storage.disable()
+        super().teardown_test_environment(**kwargs)
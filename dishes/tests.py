@@ -1,12 +1,51 @@
 # dishes/tests.py
 
-from django.test import TestCase, Client
+import csv
+import io
+import json
+import os
+import re
+import sqlite3
+import statistics
+import threading
+import tempfile
+import time as clock
+import unittest
+from asgiref.sync import sync_to_async
+from contextlib import closing
+from unittest import mock
+
+from django.core import mail
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.core.handlers.asgi import ASGIHandler
+from django.http import HttpResponse
+from django.test import LiveServerTestCase, RequestFactory, TestCase, TransactionTestCase, Client, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.contrib.auth.models import User
-from django.urls import reverse
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.template import Context, Template
+from django.urls import resolve, reverse
 from django.utils import timezone
-from datetime import date, time
-from .models import Category, Dishes, Drink, Reservation
+from datetime import date, time, timedelta
+from decimal import Decimal
+from .models import (
+    Category, Dishes, Drink, OutboxEmail, Reservation, ReservationArchive, ReservationDaySummary, ReservationSlot,
+    SearchDocument, SlotCapacity,
+)
+from .archive import archive_batch, history_rows
+from . import async_views
+from .availability import SlotUnavailable, available_slots, book
 from .forms import ReservationForm
+from .menu import build_menu, bump_menu_version, dietary_options, menu_cache_stats, menu_items
+from .outbox import send_pending
+from . import ratelimit
+from .search import match_sql, search_menu
+from .loadtest import default_mix, run as run_loadtest, run_mix, scratch_database
+from .staticfiles import Image, ResponsiveStaticFilesStorage, WhiteNoiseMiddleware
+from .summary import summary_rows
 
 class ModelTests(TestCase):
     """Test cases for models"""
@@ -83,6 +122,7 @@ class FormTests(TestCase):
         self.assertFalse(form.is_valid())
         self.assertIn('guests', form.errors)
 
+@override_settings(RESERVATION_RATE_LIMITS={})  # Rate limiting has its own tests
 class ViewTests(TestCase):
     """Test cases for views"""
     
@@ -123,4 +163,1662 @@ class ViewTests(TestCase):
         }
         response = self.client.post(reverse('home'), data=form_data)
         self.assertEqual(response.status_code, 302)  # Redirect after success
-        self.assertTrue(Reservation.objects.filter(name='John Doe').exists())
\ No newline at end of file
+        self.assertTrue(Reservation.objects.filter(name='John Doe').exists())
+
+class MenuTests(TestCase):
+    """Test cases for the grouped menu structure"""
+
+    def setUp(self):
+        """Set up test data"""
+        self.user = User.objects.create_user(username='chef', password='testpass123')
+        self.mains = Category.objects.create(name='Main Course')
+        self.juices = Category.objects.create(name='Juices')
+        for i in range(5):
+            Dishes.objects.create(
+                title=f'Dish {i}', slug=f'dish-{i}', author=self.user,
+                category=self.mains, price=10, status=1
+            )
+            Drink.objects.create(
+                title=f'Drink {i}', slug=f'drink-{i}', author=self.user,
+                category=self.juices, price=3, status=1
+            )
+        Dishes.objects.create(
+            title='Draft Dish', slug='draft-dish', author=self.user,
+            category=self.mains, price=10, status=0
+        )
+
+    def test_items_grouped_under_their_category(self):
+        """Test published items land in their own category section"""
+        menu = build_menu([self.mains, self.juices])
+        self.assertEqual([s['category'] for s in menu], [self.mains, self.juices])
+        self.assertEqual([(item.kind, item.title) for item in menu[0]['items']], [('dish', f'Dish {i}') for i in range(5)])
+        self.assertEqual([item.kind for item in menu[1]['items']], ['drink'] * 5)
+
+    def test_query_count_independent_of_item_count(self):
+        """Test building the menu reads dishes and drinks in one query"""
+        with self.assertNumQueries(1):
+            menu = build_menu([self.mains, self.juices])
+            for section in menu:
+                for item in section['items']:
+                    item.title
+
+    def test_menu_items_merge_dishes_and_drinks(self):
+        """Test menu_items() returns dishes and drinks in one query, in menu order"""
+        self.mains.display_order = 2
+        self.mains.save()
+        self.juices.display_order = 1
+        self.juices.save()
+        Drink.objects.create(title='Aaa Wine', slug='aaa-wine', author=self.user, category=self.mains, price=5, status=1)
+        with self.assertNumQueries(1):
+            items = list(menu_items())
+        self.assertEqual([item.category_id for item in items[:5]], [self.juices.pk] * 5)
+        # Within a category dishes come before drinks, then titles sort.
+        self.assertEqual([(item.kind, item.title) for item in items[5:]], [
+            *[('dish', f'Dish {i}') for i in range(5)], ('drink', 'Aaa Wine'),
+        ])
+        self.assertEqual(items[-1].category_name, 'Main Course')
+
+    def test_categories_follow_display_order(self):
+        """Test the home page lists categories by display_order, not by name"""
+        self.mains.display_order = 2
+        self.mains.save()
+        self.juices.display_order = 1
+        self.juices.save()
+        content = self.client.get(reverse('home')).content.decode()
+        self.assertLess(content.index('<h3>Juices</h3>'), content.index('<h3>Main Course</h3>'))
+
+    def test_new_categories_go_last(self):
+        """Test categories created without a position, in code or the admin, follow the existing ones"""
+        self.juices.display_order = 7
+        self.juices.save()
+        self.assertEqual(Category.objects.create(name='Snacks').display_order, 8)
+        self.client.force_login(User.objects.create_superuser(username='boss', password='testpass123'))
+        response = self.client.post(reverse('admin:dishes_category_add'), {'name': 'Desserts', 'display_order': ''})
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(list(Category.objects.values_list('name', flat=True))[-2:], ['Snacks', 'Desserts'])
+        self.assertEqual(Category.objects.create(name='Specials', display_order=0).display_order, 0)
+
+    def test_homepage_query_count(self):
+        """Test the home page orders categories in one query, not one per category"""
+        with self.assertNumQueries(3):  # Categories, menu items and the dietary filter counts
+            response = self.client.get(reverse('home'))
+        self.assertEqual(response['X-Menu-Cache'], 'miss')
+
+    def test_cached_menu_skips_menu_queries(self):
+        """Test a repeat visit is served from the menu cache"""
+        self.client.get(reverse('home'))
+        with self.assertNumQueries(1):  # The menu's ETag validators
+            response = self.client.get(reverse('home'))
+        self.assertEqual(response['X-Menu-Cache'], 'hit')
+        self.assertContains(response, 'Dish 4')
+
+    def test_saving_a_dish_invalidates_cached_menu(self):
+        """Test editing a dish shows up on the next request"""
+        self.client.get(reverse('home'))
+        Dishes.objects.filter(title='Dish 0').get().delete()
+        Dishes.objects.create(
+            title='Ndole', slug='ndole', author=self.user,
+            category=self.mains, price=12, status=1
+        )
+        response = self.client.get(reverse('home'))
+        self.assertEqual(response['X-Menu-Cache'], 'miss')
+        self.assertContains(response, 'Ndole')
+        self.assertNotContains(response, 'Dish 0')
+
+    def test_bulk_publish_action_invalidates_cached_menu(self):
+        """Test the admin publish action, which skips signals, still refreshes the menu"""
+        admin_user = User.objects.create_superuser(username='boss', password='testpass123')
+        self.client.get(reverse('home'))
+        draft = Dishes.objects.get(title='Draft Dish')
+        self.client.force_login(admin_user)
+        self.client.post(reverse('admin:dishes_dishes_changelist'), {
+            'action': 'change_status_to_published',
+            '_selected_action': [draft.pk],
+        })
+        self.client.logout()
+        self.assertContains(self.client.get(reverse('home')), 'Draft Dish')
+        stats = menu_cache_stats()
+        self.assertGreaterEqual(stats['misses'], 2)
+
+
+@override_settings(RESERVATION_RATE_LIMITS={})  # Rate limiting has its own tests
+class ReservationEndpointTests(TestCase):
+    """Test cases for the dedicated reservation endpoint"""
+
+    def setUp(self):
+        """Set up test data"""
+        self.form_data = {
+            'name': 'John Doe',
+            'email': 'john@example.com',
+            'guests': 4,
+            'date': date.today(),
+            'time': time(19, 30)
+        }
+
+    def test_booking_skips_menu_queries(self):
+        """Test a booking only touches the reservation tables"""
+        self.client.post(reverse('reserve'), data=self.form_data)  # Creates the slot row
+        Reservation.objects.all().delete()
+        with self.assertNumQueries(7):
+            # Slot check, then a savepoint around locking the slot, re-checking,
+            # the INSERT and counting it in the day summary
+            response = self.client.post(reverse('reserve'), data=self.form_data)
+        self.assertRedirects(response, reverse('home'), fetch_redirect_response=False)
+        self.assertTrue(Reservation.objects.filter(name='John Doe').exists())
+
+    def test_json_booking(self):
+        """Test AJAX clients get a JSON confirmation"""
+        response = self.client.post(
+            reverse('reserve'), data=self.form_data, HTTP_ACCEPT='application/json'
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertTrue(response.json()['ok'])
+
+    def test_json_booking_errors(self):
+        """Test AJAX clients get field errors as JSON"""
+        self.form_data['guests'] = 0
+        response = self.client.post(
+            reverse('reserve'), data=self.form_data, HTTP_X_REQUESTED_WITH='XMLHttpRequest'
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('guests', response.json()['errors'])
+        self.assertFalse(Reservation.objects.exists())
+
+    def test_invalid_booking_rerenders_form_only(self):
+        """Test an invalid submission re-renders the form without the menu"""
+        self.form_data['guests'] = 0
+        response = self.client.post(reverse('reserve'), data=self.form_data)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Number of guests must be at least 1.')
+        self.assertNotContains(response, 'Our Menu')
+
+    def test_get_not_allowed(self):
+        """Test the endpoint only accepts POST"""
+        self.assertEqual(self.client.get(reverse('reserve')).status_code, 405)
+
+
+class AvailabilityTests(TestCase):
+    """Test cases for slot capacity and availability"""
+
+    def setUp(self):
+        """Set up test data"""
+        self.day = date.today() + timedelta(days=7)
+        SlotCapacity.objects.create(weekday=self.day.weekday(), time=time(19, 0), tables=2, covers=6)
+        SlotCapacity.objects.create(weekday=self.day.weekday(), time=time(21, 0), tables=5, covers=20)
+
+    def book(self, guests, slot_time=time(19, 0), status=0):
+        return Reservation.objects.create(
+            name='Guest', email='guest@example.com', guests=guests,
+            date=self.day, time=slot_time, status=status
+        )
+
+    def test_available_slots_in_one_query(self):
+        """Test availability is answered by a single aggregated query"""
+        self.book(4)
+        self.book(2, status=2)  # Cancelled bookings free their seats
+        with self.assertNumQueries(1):
+            slots = available_slots(self.day, 2)
+        self.assertEqual(slots[0], {'time': time(19, 0), 'tables_left': 1, 'covers_left': 2})
+        self.assertEqual([s['time'] for s in available_slots(self.day, 3)], [time(21, 0)])
+
+    def test_unconfigured_weekday_is_unlimited(self):
+        """Test days without capacity rules are not limited"""
+        self.assertIsNone(available_slots(self.day + timedelta(days=1), 50))
+
+    def test_form_rejects_overbooked_slot(self):
+        """Test the reservation form refuses a slot without room"""
+        self.book(3)
+        self.book(1)
+        form = ReservationForm(data={
+            'name': 'Late', 'email': 'late@example.com', 'guests': 1,
+            'date': self.day, 'time': time(19, 0)
+        })
+        self.assertFalse(form.is_valid())
+        self.assertIn('fully booked', form.non_field_errors()[0])
+
+    def test_form_rejects_unknown_slot(self):
+        """Test the reservation form only accepts configured times"""
+        form = ReservationForm(data={
+            'name': 'Early', 'email': 'early@example.com', 'guests': 2,
+            'date': self.day, 'time': time(17, 30)
+        })
+        self.assertFalse(form.is_valid())
+        self.assertIn('19:00, 21:00', form.non_field_errors()[0])
+
+    def test_availability_endpoint(self):
+        """Test the availability endpoint lists slots with room"""
+        self.book(5)
+        response = self.client.get(reverse('availability'), {'date': self.day.isoformat(), 'guests': 2})
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertTrue(data['limited'])
+        self.assertEqual([s['time'] for s in data['slots']], ['21:00'])
+        self.assertEqual(self.client.get(reverse('availability'), {'date': 'soon'}).status_code, 400)
+
+
+class ConcurrentBookingTests(TransactionTestCase):
+    """Stress test for parallel bookings of one slot"""
+
+    def test_parallel_bookings_never_exceed_capacity(self):
+        """Test many simultaneous bookings of one slot stop exactly at its capacity"""
+        day = date.today() + timedelta(days=3)
+        SlotCapacity.objects.create(weekday=day.weekday(), time=time(20, 0), tables=10, covers=12)
+        attempts = 30
+        start = threading.Barrier(attempts)
+        outcomes = []
+
+        def attempt(i):
+            start.wait()
+            try:
+                book(Reservation(
+                    name=f'Guest {i}', email=f'guest{i}@example.com',
+                    guests=2, date=day, time=time(20, 0)
+                ))
+                outcomes.append('booked')
+            except SlotUnavailable:
+                outcomes.append('full')
+            finally:
+                connection.close()  # Persistent connections would outlive the thread
+
+        threads = [threading.Thread(target=attempt, args=(i,)) for i in range(attempts)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        booked = Reservation.objects.filter(date=day, time=time(20, 0))
+        self.assertEqual(outcomes.count('booked'), 6)  # 12 covers / 2 guests
+        self.assertEqual(outcomes.count('full'), attempts - 6)
+        self.assertEqual(booked.count(), 6)
+        self.assertEqual(sum(r.guests for r in booked), 12)
+
+    def test_booking_writes_before_reading(self):
+        """Test a booking's transaction starts with the slot UPDATE, so SQLite takes the write lock first"""
+        day = date.today() + timedelta(days=3)
+        SlotCapacity.objects.create(weekday=day.weekday(), time=time(20, 0), tables=10, covers=12)
+        with CaptureQueriesContext(connection) as queries:
+            book(Reservation(name='Guest', email='guest@example.com', guests=2, date=day, time=time(20, 0)))
+        statements = [q['sql'] for q in queries.captured_queries if not q['sql'].startswith(('BEGIN', 'SAVEPOINT'))]
+        self.assertTrue(statements[0].startswith('UPDATE'), statements[0])
+
+
+class QueryPlanTests(TestCase):
+    """Regression tests for the query plans of the hot pages"""
+
+    # Tables that stay small however busy the restaurant gets: a few dozen
+    # categories and weekly slots, and one summary row per booked slot.
+    SMALL_TABLES = {'dishes_category', 'dishes_slotcapacity', 'dishes_reservationdaysummary'}
+
+    @classmethod
+    def setUpTestData(cls):
+        """Set up test data"""
+        cls.admin_user = User.objects.create_superuser(username='boss', password='testpass123')
+        category = Category.objects.create(name='Main Course')
+        for i in range(20):
+            Dishes.objects.create(
+                title=f'Dish {i}', slug=f'dish-{i}', author=cls.admin_user,
+                category=category, price=10, status=i % 2
+            )
+            Drink.objects.create(
+                title=f'Drink {i}', slug=f'drink-{i}', author=cls.admin_user,
+                category=category, price=3, status=i % 2
+            )
+            Reservation.objects.create(
+                name=f'Guest {i}', email='guest@example.com', guests=2,
+                date=date.today(), time=time(19, 0), status=i % 3
+            )
+
+    def full_scans(self, sql, small_tables=()):
+        """Returns the tables a query reads without an index, other than ``small_tables``"""
+        with connection.cursor() as cursor:
+            if connection.vendor == 'postgresql':
+                # Tiny test tables always favour sequential scans unless told otherwise.
+                cursor.execute('SET LOCAL enable_seqscan = off')
+                cursor.execute('EXPLAIN ' + sql)
+                plan = '\n'.join(row[0] for row in cursor.fetchall())
+                return set(re.findall(r'Seq Scan on (\w+)', plan)) - self.SMALL_TABLES - set(small_tables)
+            cursor.execute('EXPLAIN QUERY PLAN ' + sql)
+            plan = [row[-1] for row in cursor.fetchall()]
+        # Any SCAN walks a whole table or index, covering or not, unless a
+        # LIMIT stops it early, as on a paginated list. Indexed WHERE clauses
+        # show up as SEARCH instead. Scanning a subquery (bounded counts)
+        # reads rows its own plan already produced.
+        if ' LIMIT ' in sql:
+            return set()
+        subqueries = {m.group(1) for m in map(re.compile(r'^CO-ROUTINE (\w+)').match, plan) if m}
+        scans = {m.group(1) for m in map(re.compile(r'^SCAN (\w+)').match, plan) if m}
+        return scans - self.SMALL_TABLES - set(small_tables) - subqueries
+
+    def assertNoFullScans(self, url, params=None, small_tables=()):
+        """Loads a page and checks every query it ran on the dishes tables uses an index"""
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, params or {})
+        self.assertEqual(response.status_code, 200)
+        selects = [q['sql'] for q in queries if q['sql'].startswith('SELECT') and 'dishes_' in q['sql']]
+        self.assertTrue(selects)
+        for sql in selects:
+            self.assertEqual(self.full_scans(sql, small_tables), set(), sql)
+
+    def test_homepage_uses_indexes(self):
+        """Test the published menu queries use the status indexes"""
+        bump_menu_version()
+        self.assertNoFullScans(reverse('home'))
+
+    def test_availability_uses_indexes(self):
+        """Test the availability lookup uses the slot index"""
+        SlotCapacity.objects.create(weekday=date.today().weekday(), time=time(19, 0), tables=5, covers=10)
+        self.assertNoFullScans(reverse('availability'), {'date': date.today().isoformat(), 'guests': 2})
+
+    def test_admin_changelists_use_indexes(self):
+        """Test the admin lists and their filters use indexes"""
+        self.client.force_login(self.admin_user)
+        # The menu admin lists count and date the whole menu, a few hundred rows
+        # at most; only the public pages must read the menu through indexes.
+        for model in ('dishes', 'drink'):
+            url, table = reverse(f'admin:dishes_{model}_changelist'), f'dishes_{model}'
+            self.assertNoFullScans(url, small_tables={table})
+            self.assertNoFullScans(url, {'status__exact': 1}, small_tables={table})
+        self.assertNoFullScans(reverse('admin:dishes_reservation_changelist'))
+        self.assertNoFullScans(reverse('admin:dishes_reservation_changelist'), {'status__exact': 0})
+        self.assertNoFullScans(reverse('admin:dishes_reservation_changelist'), {'date': date.today().isoformat()})
+
+
+# Rate limiting has its own tests; admin lists estimate past 1,000 rows at any seed size.
+@override_settings(RESERVATION_RATE_LIMITS={}, ADMIN_EXACT_COUNT_LIMIT=1000)
+class PerformanceTests(TestCase):
+    """
+    Query-count and latency budgets for the public and admin pages.
+
+    Seeds PERF_RESERVATIONS reservations: 2,000 by default, so the budgets
+    run with every test; set it to e.g. 100000 for realistic timings. Set
+    PERF_REPORT to a file path to save the p50/p95 render times, over
+    PERF_SAMPLES requests per page, as JSON for comparing commits.
+    """
+
+    RESERVATIONS = int(os.environ.get('PERF_RESERVATIONS', 2_000))
+    SAMPLES = int(os.environ.get('PERF_SAMPLES', 10 if os.environ.get('PERF_REPORT') else 2))
+    timings = {}
+
+    @classmethod
+    def setUpTestData(cls):
+        """Set up test data"""
+        cls.admin_user = User.objects.create_superuser(username='boss', password='testpass123')
+        categories = Category.objects.bulk_create(
+            Category(name=f'Category {i}', display_order=i) for i in range(30)
+        )
+        Dishes.objects.bulk_create(
+            Dishes(
+                title=f'Dish {i}', slug=f'dish-{i}', author=cls.admin_user, category=categories[i % 20],
+                description='Slow-cooked with bitter leaves and groundnuts. ' * 3, price=12, status=int(i % 10 != 0)
+            )
+            for i in range(400)
+        )
+        Drink.objects.bulk_create(
+            Drink(
+                title=f'Drink {i}', slug=f'drink-{i}', author=cls.admin_user, category=categories[20 + i % 10],
+                description='Freshly pressed.', price=4, status=int(i % 10 != 0)
+            )
+            for i in range(200)
+        )
+        first_day = date.today() - timedelta(days=3 * 365)
+        Reservation.objects.bulk_create(
+            (
+                Reservation(
+                    name=f'Guest {i}', email=f'guest{i}@example.com', guests=1 + i % 6,
+                    date=first_day + timedelta(days=i % 1200), time=time(18 + i % 4, 0), status=i % 3
+                )
+                for i in range(cls.RESERVATIONS)
+            ),
+            batch_size=5000,
+        )
+        call_command('rebuild_reservation_summary', stdout=io.StringIO())
+
+    @classmethod
+    def tearDownClass(cls):
+        report = os.environ.get('PERF_REPORT')
+        if report and cls.timings:
+            with open(report, 'w') as f:
+                json.dump({'reservations': cls.RESERVATIONS, 'samples': cls.SAMPLES, 'pages': cls.timings}, f, indent=2)
+        super().tearDownClass()
+
+    def measure(self, name, request):
+        """Records p50/p95 wall times (ms) of ``request`` under ``name``"""
+        durations = []
+        for _ in range(self.SAMPLES):
+            started = clock.perf_counter()
+            response = request()
+            durations.append((clock.perf_counter() - started) * 1000)
+            self.assertLess(response.status_code, 400)
+        cuts = statistics.quantiles(durations, n=20)
+        self.timings[name] = {'p50_ms': round(statistics.median(durations), 2), 'p95_ms': round(cuts[18], 2)}
+
+    def test_homepage_budget(self):
+        """Test the home page query budget, cold and cached"""
+        bump_menu_version()
+        with self.assertNumQueries(3):  # Includes the dietary filter counts
+            self.client.get(reverse('home'))
+        with self.assertNumQueries(1):  # The menu's ETag validators, cached from then on
+            self.client.get(reverse('home'))
+        with self.assertNumQueries(0):
+            self.client.get(reverse('home'))
+        self.measure('home (cached)', lambda: self.client.get(reverse('home')))
+
+        def cold():
+            bump_menu_version()
+            return self.client.get(reverse('home'))
+        self.measure('home (cold)', cold)
+
+    def test_reservation_post_budget(self):
+        """Test a reservation POST does not grow with the reservation table"""
+        day = date.today() + timedelta(days=1)
+        SlotCapacity.objects.create(weekday=day.weekday(), time=time(19, 0), tables=1000, covers=5000)
+        form_data = {'name': 'Rush', 'email': 'rush@example.com', 'guests': 2, 'date': day, 'time': time(19, 0)}
+        self.client.post(reverse('reserve'), data=form_data)  # Creates the slot lock row
+        with self.assertNumQueries(7):  # Includes the day summary UPDATE
+            response = self.client.post(reverse('reserve'), data=form_data)
+        self.assertEqual(response.status_code, 302)
+        self.measure('reservation POST', lambda: self.client.post(reverse('reserve'), data=form_data))
+
+    def test_admin_changelist_budgets(self):
+        """Test every ModelAdmin changelist runs a fixed number of queries"""
+        self.client.force_login(self.admin_user)
+        budgets = {
+            'category': 5,
+            'dishes': 8,
+            'drink': 8,
+            'reservation': 5,
+            'reservationarchive': 4,
+            'reservationdaysummary': 7,
+            'slotcapacity': 5,
+        }
+        for model, queries in budgets.items():
+            url = reverse(f'admin:dishes_{model}_changelist')
+            with self.subTest(model=model), self.assertNumQueries(queries):
+                self.client.get(url)
+            self.measure(f'admin {model} changelist', lambda: self.client.get(url))
+
+    def test_reservation_changelist_deep_pages(self):
+        """Test deep reservation pages cost what the first does, with no full COUNT(*)"""
+        self.client.force_login(self.admin_user)
+        url = reverse('admin:dishes_reservation_changelist')
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertContains(response, f'over {settings.ADMIN_EXACT_COUNT_LIMIT} Reservations')
+        counts = [q['sql'] for q in queries if 'COUNT(' in q['sql']]
+        self.assertTrue(counts and all('LIMIT' in sql for sql in counts))
+        last = Reservation.objects.order_by('created_on', 'pk')[50]  # Near the end of the list
+        cursor = f'{last.created_on.isoformat()},{last.pk}'
+        with self.assertNumQueries(len(queries)):
+            response = self.client.get(url, {'after': cursor})
+        self.assertEqual(len(response.context['cl'].result_list), 50)
+        self.measure('admin reservation changelist (deep page)', lambda: self.client.get(url, {'after': cursor}))
+
+
+class ProfilingMiddlewareTests(TestCase):
+    """Test cases for the request profiling middleware"""
+
+    def setUp(self):
+        """Set up test data"""
+        Category.objects.create(name='Main Course')
+
+    @override_settings(PROFILING_ENABLED=True, PROFILING_SAMPLE_RATE=1.0)
+    def test_sampled_request_reports_timings(self):
+        """Test a sampled request gets Server-Timing and a log line"""
+        bump_menu_version()
+        with self.assertLogs('dishes.profiling', 'INFO') as logs:
+            response = self.client.get(reverse('home'))
+        self.assertRegex(response['Server-Timing'], r'^app;dur=[\d.]+, db;dur=[\d.]+;desc="3 queries", tpl;dur=[\d.]+$')
+        record = logs.records[0]
+        self.assertEqual((record.path, record.status, record.sql_count), ('/', 200, 3))
+        self.assertGreater(record.template_ms, 0)
+
+    @override_settings(PROFILING_ENABLED=True, PROFILING_SAMPLE_RATE=0.0)
+    def test_unsampled_request_untouched(self):
+        """Test requests outside the sample are not profiled"""
+        self.assertNotIn('Server-Timing', self.client.get(reverse('home')))
+
+    def test_disabled_by_default(self):
+        """Test profiling stays off unless enabled"""
+        self.assertNotIn('Server-Timing', self.client.get(reverse('home')))
+
+
+@override_settings(RESERVATION_RATE_LIMITS={})  # Rate limiting has its own tests
+class ConditionalGetTests(TestCase):
+    """Test cases for ETag/Last-Modified on the home page"""
+
+    def setUp(self):
+        """Set up test data"""
+        self.user = User.objects.create_user(username='chef', password='testpass123')
+        self.category = Category.objects.create(name='Main Course')
+        self.dish = Dishes.objects.create(
+            title='Ndole', slug='ndole', author=self.user,
+            category=self.category, price=12, status=1
+        )
+        self.first = self.client.get(reverse('home'))  # Sets the CSRF cookie
+
+    def revisit(self):
+        response = self.client.get(reverse('home'))
+        return self.client.get(reverse('home'), HTTP_IF_NONE_MATCH=response['ETag'])
+
+    def test_unchanged_menu_answers_304(self):
+        """Test a repeat anonymous visit gets 304 without rendering"""
+        self.assertNotIn('ETag', self.first)  # No CSRF cookie yet
+        response = self.client.get(reverse('home'))
+        self.assertIn('Last-Modified', response)
+        self.assertIn('no-cache', response['Cache-Control'])
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse('home'), HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_menu_edit_changes_validator(self):
+        """Test editing, unpublishing or deleting an item invalidates the ETag"""
+        etag = self.client.get(reverse('home'))['ETag']
+        Dishes.objects.filter(pk=self.dish.pk).update(status=0)
+        bump_menu_version()
+        self.assertNotEqual(self.client.get(reverse('home'))['ETag'], etag)
+
+    def test_rotated_csrf_cookie_changes_validator(self):
+        """Test a new CSRF token forces a fresh page"""
+        etag = self.client.get(reverse('home'))['ETag']
+        self.client.cookies['csrftoken'] = 'x' * 32
+        response = self.client.get(reverse('home'), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_pending_messages_skip_conditional_get(self):
+        """Test a page carrying a message is always rendered"""
+        etag = self.client.get(reverse('home'))['ETag']
+        self.client.post(reverse('reserve'), data={
+            'name': 'John Doe', 'email': 'john@example.com', 'guests': 2,
+            'date': date.today(), 'time': time(19, 30)
+        })
+        response = self.client.get(reverse('home'), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Reservation submitted successfully')
+
+    def test_authenticated_users_skip_conditional_get(self):
+        """Test logged-in pages, which show the username, are not validated"""
+        self.client.force_login(self.user)
+        self.assertNotIn('ETag', self.client.get(reverse('home')))
+
+
+class MenuApiTests(TestCase):
+    """Test cases for the read-only JSON menu"""
+
+    def setUp(self):
+        """Set up test data"""
+        self.user = User.objects.create_user(username='chef', password='testpass123')
+        self.mains = Category.objects.create(name='Main Course', display_order=1)
+        self.juices = Category.objects.create(name='Juices', display_order=2)
+        Dishes.objects.create(title='Ndole', slug='ndole', author=self.user, category=self.mains,
+                              description='Bitter leaves', price=12, status=1)
+        Dishes.objects.create(title='Eru', slug='eru', author=self.user, category=self.mains, price=11, status=1)
+        Dishes.objects.create(title='Secret', slug='secret', author=self.user, category=self.mains, price=9, status=0)
+        Drink.objects.create(title='Folere', slug='folere', author=self.user, category=self.juices, price=3, status=1)
+        Drink.objects.create(title='Palm Wine', slug='palm-wine', author=self.user, category=self.mains, price=4, status=1)
+
+    def test_menu_grouped_in_one_query(self):
+        """Test the whole menu is serialized from a single query"""
+        self.client.get(reverse('menu_api'))  # Caches the ETag validators
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse('menu_api'))
+        data = response.json()['categories']
+        self.assertEqual([c['name'] for c in data], ['Main Course', 'Juices'])
+        self.assertEqual([i['title'] for i in data[0]['items']], ['Eru', 'Ndole', 'Palm Wine'])
+        self.assertEqual(data[0]['items'][1], {
+            'id': data[0]['items'][1]['id'], 'kind': 'dish', 'title': 'Ndole',
+            'slug': 'ndole', 'description': 'Bitter leaves', 'price': '12.00'
+        })
+        self.assertEqual(data[0]['items'][2]['kind'], 'drink')
+
+    def test_field_projection_and_category_filter(self):
+        """Test ?fields= and ?category= shape the response"""
+        response = self.client.get(reverse('menu_api'), {'fields': 'title,price', 'category': self.juices.pk})
+        self.assertEqual(response.json(), {'categories': [
+            {'id': self.juices.pk, 'name': 'Juices', 'items': [{'title': 'Folere', 'price': '3.00'}]}
+        ]})
+        self.assertEqual(self.client.get(reverse('menu_api'), {'fields': 'secret'}).status_code, 400)
+        self.assertEqual(self.client.get(reverse('menu_api'), {'category': 'mains'}).status_code, 400)
+
+    def test_cache_headers(self):
+        """Test the menu is publicly cacheable and revalidates with 304"""
+        response = self.client.get(reverse('menu_api'))
+        self.assertIn('public', response['Cache-Control'])
+        self.assertIn('max-age=60', response['Cache-Control'])
+        again = self.client.get(reverse('menu_api'), HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(again.status_code, 304)
+        other = self.client.get(reverse('menu_api'), {'fields': 'title'}, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(other.status_code, 200)
+
+
+class ReservationExportTests(TestCase):
+    """Test cases for the streaming reservation exports"""
+
+    def setUp(self):
+        """Set up test data"""
+        for day, status in ((1, 0), (2, 1), (3, 2), (40, 1)):
+            Reservation.objects.create(
+                name=f'Guest {day}', email=f'guest{day}@example.com', guests=2,
+                date=date(2025, 1, day) if day < 32 else date(2025, 2, 9), time=time(19, 0), status=status
+            )
+
+    def export(self, *args):
+        out = io.StringIO()
+        call_command('export_reservations', *args, stdout=out)
+        return out.getvalue()
+
+    def test_command_filters_by_date_and_status(self):
+        """Test the command exports one month of confirmed bookings"""
+        lines = self.export('--from', '2025-01-01', '--to', '2025-01-31', '--status', 'confirmed').splitlines()
+        self.assertEqual(lines[0], 'id,name,email,phone,guests,date,time,status,created_on')
+        self.assertEqual(len(lines), 2)
+        self.assertIn('Guest 2,guest2@example.com,,2,2025-01-02,19:00:00,Confirmed', lines[1])
+
+    def test_command_ndjson(self):
+        """Test NDJSON exports one JSON object per line"""
+        records = [json.loads(line) for line in self.export('--format', 'ndjson').splitlines()]
+        self.assertEqual([r['name'] for r in records], ['Guest 1', 'Guest 2', 'Guest 3', 'Guest 40'])
+        self.assertEqual(records[2]['status'], 'Cancelled')
+
+    def test_admin_action_streams(self):
+        """Test the admin export action returns a streaming download"""
+        self.client.force_login(User.objects.create_superuser(username='boss', password='testpass123'))
+        response = self.client.post(reverse('admin:dishes_reservation_changelist'), {
+            'action': 'export_as_csv',
+            '_selected_action': list(Reservation.objects.values_list('pk', flat=True)),
+        })
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Disposition'], 'attachment; filename="reservations.csv"')
+        body = b''.join(response.streaming_content).decode()
+        self.assertEqual(len(body.splitlines()), 5)
+
+    def test_command_includes_archived_reservations(self):
+        """Test archived reservations stay in the command's exports, in date order"""
+        archive_batch(date(2025, 1, 3))
+        lines = self.export('--to', '2025-01-31').splitlines()
+        self.assertEqual([line.split(',')[1] for line in lines[1:]], ['Guest 1', 'Guest 2', 'Guest 3'])
+        lines = self.export('--from', '2025-01-02', '--status', 'confirmed').splitlines()
+        self.assertEqual([line.split(',')[1] for line in lines[1:]], ['Guest 2', 'Guest 40'])
+
+    def test_archive_admin_action_streams(self):
+        """Test archived reservations can be exported from their admin list"""
+        archive_batch(date(2025, 1, 3))
+        self.client.force_login(User.objects.create_superuser(username='boss', password='testpass123'))
+        response = self.client.post(reverse('admin:dishes_reservationarchive_changelist'), {
+            'action': 'export_as_ndjson',
+            '_selected_action': list(ReservationArchive.objects.values_list('pk', flat=True)),
+        })
+        self.assertTrue(response.streaming)
+        records = [json.loads(line) for line in b''.join(response.streaming_content).decode().splitlines()]
+        self.assertEqual([r['name'] for r in records], ['Guest 1', 'Guest 2'])
+
+
+class MenuImportTests(TestCase):
+    """Test cases for the bulk menu import command"""
+
+    def setUp(self):
+        """Set up test data"""
+        self.chef = User.objects.create_superuser(username='chef', password='testpass123')
+        self.mains = Category.objects.create(name='Main Course')
+        Dishes.objects.create(title='Ndole', slug='ndole', author=self.chef, category=self.mains, price=12, status=1)
+        Dishes.objects.create(title='Eru', slug='eru', author=self.chef, category=self.mains, price=11, status=1)
+        Drink.objects.create(title='Ndole', slug='ndole-juice', author=self.chef, price=3, status=0)
+
+    def run_import(self, rows, *args, suffix='.json'):
+        with tempfile.NamedTemporaryFile('w', suffix=suffix, delete=False) as f:
+            if suffix == '.json':
+                json.dump(rows, f)
+            else:
+                writer = csv.DictWriter(f, fieldnames=rows[0].keys())
+                writer.writeheader()
+                writer.writerows(rows)
+        self.addCleanup(os.remove, f.name)
+        out = io.StringIO()
+        call_command('import_menu', f.name, *args, stdout=out)
+        return out.getvalue()
+
+    def test_creates_updates_and_reports(self):
+        """Test new items are created, changed ones updated and the rest left alone"""
+        output = self.run_import([
+            {'kind': 'dish', 'title': 'Ndole', 'category': 'Main Course', 'price': '14.50', 'status': 'published'},
+            {'kind': 'dish', 'title': 'Eru', 'category': 'Main Course', 'price': '11', 'status': 'published'},
+            {'kind': 'dish', 'title': 'Achu Soup', 'category': 'Soup', 'price': '13', 'status': 'published'},
+            {'kind': 'drink', 'title': 'Ndole Juice', 'category': 'Juices', 'price': '3', 'status': 'draft'},
+        ], suffix='.csv')
+        self.assertIn('Categories: 2 created.', output)
+        self.assertIn('Dishes: 1 created, 1 updated, 1 unchanged.', output)
+        self.assertIn('Drinks: 1 created, 0 updated, 0 unchanged.', output)
+        self.assertEqual(Dishes.objects.get(title='Ndole').price, Decimal('14.50'))
+        self.assertEqual(Dishes.objects.get(title='Achu Soup').category.name, 'Soup')
+        # The slug "ndole-juice" is already taken by another drink
+        self.assertEqual(Drink.objects.get(title='Ndole Juice').slug, 'ndole-juice-2')
+
+    def test_explicit_slug_collisions_are_row_errors(self):
+        """Test explicit slugs taken by another item or row fail the import by row, saving nothing"""
+        with self.assertRaisesMessage(CommandError, "Row 2: slug 'eru' is already used by 'Eru'."):
+            self.run_import([
+                {'kind': 'dish', 'title': 'Koki', 'status': 'published'},
+                {'kind': 'dish', 'title': 'Achu', 'slug': 'eru', 'status': 'published'},
+            ])
+        with self.assertRaisesMessage(CommandError, "Row 2: slug 'soup' is also given to row 1."):
+            self.run_import([
+                {'kind': 'dish', 'title': 'Achu', 'slug': 'soup'},
+                {'kind': 'dish', 'title': 'Pepper Soup', 'slug': 'soup'},
+            ])
+        self.assertFalse(Dishes.objects.filter(title__in=['Koki', 'Achu']).exists())
+        # Explicit slugs are reserved before others are generated, and an item may keep its own.
+        self.run_import([
+            {'kind': 'dish', 'title': 'Koki'},
+            {'kind': 'dish', 'title': 'Achu', 'slug': 'koki'},
+            {'kind': 'dish', 'title': 'Eru', 'slug': 'eru'},
+        ])
+        self.assertEqual(Dishes.objects.get(title='Achu').slug, 'koki')
+        self.assertEqual(Dishes.objects.get(title='Koki').slug, 'koki-2')
+
+    def test_new_categories_go_last(self):
+        """Test created categories follow the existing ones on the menu"""
+        Category.objects.create(name='Desserts', display_order=7)
+        self.run_import([
+            {'kind': 'dish', 'title': 'Puff-puff', 'category': 'Snacks'},
+            {'kind': 'drink', 'title': 'Folere', 'category': 'Juices'},
+        ])
+        self.assertEqual(list(Category.objects.values_list('name', 'display_order'))[-3:], [
+            ('Desserts', 7), ('Juices', 8), ('Snacks', 9),
+        ])
+
+    def test_query_count_does_not_grow_with_rows(self):
+        """Test a large import runs a bounded number of queries, not one per row"""
+        def queries_for(count, offset):
+            rows = [
+                {'kind': 'dish' if i % 2 else 'drink', 'title': f'Item {i}', 'category': f'Category {i % 7}',
+                 'price': '5', 'status': 'published'}
+                for i in range(offset, offset + count)
+            ]
+            with CaptureQueriesContext(connection) as queries:
+                self.run_import(rows, '--batch-size', '5000')
+            return len(queries)
+        # Only the INSERT batches (items and their search documents) grow, capped
+        # by the backend's parameter limit (about a hundred rows per statement on SQLite).
+        self.assertLess(queries_for(50, 0), 20)
+        self.assertLess(queries_for(2000, 1000), 60)
+        self.assertEqual(Dishes.objects.filter(title__startswith='Item').count(), 1025)
+
+    def test_dry_run_saves_nothing(self):
+        """Test --dry-run reports without writing"""
+        output = self.run_import([{'kind': 'dish', 'title': 'Koki', 'category': 'Snack', 'price': 6}], '--dry-run')
+        self.assertIn('Dishes: 1 created', output)
+        self.assertFalse(Dishes.objects.filter(title='Koki').exists())
+        self.assertFalse(Category.objects.filter(name='Snack').exists())
+
+    def test_rejects_bad_rows(self):
+        """Test invalid rows abort the import with a clear error"""
+        with self.assertRaisesMessage(CommandError, "Row 1: kind must be 'dish' or 'drink'."):
+            self.run_import([{'kind': 'dessert', 'title': 'Puff-puff'}])
+
+
+@override_settings(EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend')
+class OutboxTests(TestCase):
+    """Test cases for the reservation e-mail outbox"""
+
+    def setUp(self):
+        """Set up test data"""
+        self.client.force_login(User.objects.create_superuser(username='boss', password='testpass123'))
+        for i, status in enumerate((0, 0, 1)):
+            Reservation.objects.create(
+                name=f'Guest {i}', email=f'guest{i}@example.com', guests=2,
+                date=date(2025, 1, 10), time=time(19, 0), status=status
+            )
+
+    def run_action(self, action):
+        return self.client.post(reverse('admin:dishes_reservation_changelist'), {
+            'action': action,
+            '_selected_action': list(Reservation.objects.values_list('pk', flat=True)),
+        })
+
+    def test_admin_action_queues_without_sending(self):
+        """Test confirming queues one e-mail per changed reservation and sends nothing yet"""
+        self.run_action('mark_as_confirmed')
+        self.assertEqual(Reservation.objects.filter(status=1).count(), 3)
+        # Guest 2 was already confirmed
+        emails = OutboxEmail.objects.all()
+        self.assertEqual(sorted(e.to_email for e in emails), ['guest0@example.com', 'guest1@example.com'])
+        self.assertTrue(all(e.kind == 'confirmed' and e.status == 0 for e in emails))
+        self.assertIn('Dear Guest 0,', emails.get(to_email='guest0@example.com').body)
+        self.assertEqual(mail.outbox, [])
+
+    def test_worker_sends_batches_over_one_connection(self):
+        """Test the worker opens one connection per batch and marks rows sent"""
+        self.run_action('mark_as_cancelled')
+        with mock.patch('dishes.outbox.get_connection', wraps=mail.get_connection) as get_connection:
+            out = io.StringIO()
+            call_command('send_outbox', '--batch-size', '2', stdout=out)
+        self.assertIn('Sent 3 e-mail(s).', out.getvalue())
+        # Two batches: two e-mails, then one; the third call finds the queue empty.
+        self.assertEqual(get_connection.call_count, 2)
+        self.assertEqual(len(mail.outbox), 3)
+        self.assertEqual(mail.outbox[0].subject, 'Your reservation at The Cameroonian Table was cancelled')
+        self.assertFalse(OutboxEmail.objects.filter(status=0).exists())
+        self.assertFalse(OutboxEmail.objects.filter(sent_on__isnull=True).exists())
+        self.assertEqual(send_pending(), 0)
+
+    def test_failed_sends_are_retried_then_given_up(self):
+        """Test a failing send stays queued and is marked failed after MAX_ATTEMPTS"""
+        self.run_action('mark_as_confirmed')
+        with mock.patch('django.core.mail.backends.locmem.EmailBackend.send_messages', side_effect=OSError('down')):
+            with self.assertLogs('dishes.outbox', 'WARNING') as logs:
+                for _ in range(5):
+                    self.assertEqual(send_pending(), 0)
+        self.assertEqual(len(logs.records), 10)  # Two e-mails, five attempts each
+        pk = OutboxEmail.objects.first().pk
+        self.assertIn(f'WARNING:dishes.outbox:Sending outbox e-mail {pk} failed: down', logs.output)
+        self.assertEqual(set(OutboxEmail.objects.values_list('status', 'attempts')), {(2, 5)})
+        self.assertEqual(OutboxEmail.objects.first().last_error, 'down')
+
+    def test_connection_errors_count_as_attempts(self):
+        """Test an SMTP connection that cannot be opened is a failed attempt, not a crash"""
+        self.run_action('mark_as_confirmed')
+        with mock.patch('dishes.outbox.get_connection', side_effect=ConnectionRefusedError('refused')):
+            out = io.StringIO()
+            with self.assertLogs('dishes.outbox', 'WARNING') as logs:
+                call_command('send_outbox', stdout=out)
+        self.assertIn('Sent 0 e-mail(s).', out.getvalue())
+        self.assertEqual(len(logs.records), 2)
+        self.assertTrue(all(message.endswith('failed: refused') for message in logs.output), logs.output)
+        self.assertEqual(set(OutboxEmail.objects.values_list('status', 'attempts', 'claimed_on')), {(0, 1, None)})
+        self.assertEqual(send_pending(), 2)
+
+    def test_claimed_rows_are_skipped(self):
+        """Test rows are claimed before sending, and a stale claim is taken over"""
+        self.run_action('mark_as_confirmed')
+        first, second = OutboxEmail.objects.all()
+        OutboxEmail.objects.filter(pk=first.pk).update(claimed_on=timezone.now())
+        OutboxEmail.objects.filter(pk=second.pk).update(claimed_on=timezone.now() - timedelta(hours=1))
+
+        def send_messages(messages):
+            # The claim is saved before any SMTP traffic.
+            self.assertIsNotNone(OutboxEmail.objects.get(to_email=messages[0].to[0]).claimed_on)
+            return 1
+        with mock.patch('django.core.mail.backends.locmem.EmailBackend.send_messages', side_effect=send_messages):
+            self.assertEqual(send_pending(), 1)
+        second.refresh_from_db()
+        self.assertEqual((second.status, second.claimed_on), (1, None))
+        self.assertEqual(OutboxEmail.objects.get(pk=first.pk).status, 0)
+
+
+@override_settings(ROOT_URLCONF='my_project.urls_async')
+@override_settings(RESERVATION_RATE_LIMITS={})  # Rate limiting has its own tests
+class AsyncViewTests(TestCase):
+    """Test cases for the async public views served under ASGI"""
+
+    def setUp(self):
+        """Set up test data"""
+        self.chef = User.objects.create_user(username='chef', password='testpass123')
+        self.mains = Category.objects.create(name='Main Course')
+        Dishes.objects.create(title='Ndole', slug='ndole', author=self.chef, category=self.mains, price=12, status=1)
+        self.day = date.today() + timedelta(days=7)
+        bump_menu_version()
+
+    def limit_slot(self, tables):
+        SlotCapacity.objects.create(weekday=self.day.weekday(), time=time(19, 0), tables=tables, covers=10)
+
+    def booking(self, name):
+        return {'name': name, 'email': 'guest@example.com', 'guests': 2, 'date': self.day.isoformat(), 'time': '19:00'}
+
+    async def test_home_page_uses_menu_cache(self):
+        """Test the async home page renders the menu and then serves it from the cache"""
+        response = await self.async_client.get('/')
+        self.assertContains(response, 'Ndole')
+        self.assertEqual(response['X-Menu-Cache'], 'miss')
+        response = await self.async_client.get('/')
+        self.assertEqual(response['X-Menu-Cache'], 'hit')
+
+    async def test_repeat_visit_not_modified(self):
+        """Test the async home page answers a repeat visit with 304"""
+        await self.async_client.get('/')  # Sets the CSRF cookie
+        response = await self.async_client.get('/')
+        self.assertIn('Last-Modified', response)
+        repeat = await self.async_client.get('/', headers={'if-none-match': response['ETag']})
+        self.assertEqual(repeat.status_code, 304)
+
+    async def test_home_page_search(self):
+        """Test the async home page answers ?q= with search results"""
+        response = await self.async_client.get('/', {'q': 'ndo'})
+        self.assertContains(response, '1 result for')
+        self.assertNotIn('X-Menu-Cache', response)
+
+    async def test_availability(self):
+        """Test the async availability endpoint lists the open slots"""
+        await sync_to_async(self.limit_slot)(2)
+        response = await self.async_client.get('/reservations/availability/', {'date': self.day.isoformat(), 'guests': 2})
+        self.assertEqual(response.json()['slots'], [{'time': '19:00', 'tables_left': 2, 'covers_left': 10}])
+        response = await self.async_client.get('/reservations/availability/', {'date': 'soon'})
+        self.assertEqual(response.status_code, 400)
+
+    async def test_reserve_respects_capacity(self):
+        """Test async bookings stop once the slot is full"""
+        await sync_to_async(self.limit_slot)(1)
+        headers = {'accept': 'application/json'}
+        first = await self.async_client.post('/reservations/', self.booking('First'), headers=headers)
+        second = await self.async_client.post('/reservations/', self.booking('Second'), headers=headers)
+        self.assertEqual((first.status_code, second.status_code), (201, 400))
+        self.assertEqual(await Reservation.objects.acount(), 1)
+
+    async def test_reserve_without_capacity_skips_slot_lock(self):
+        """Test days without configured capacity are booked straight from the event loop"""
+        response = await self.async_client.post('/reservations/', self.booking('Walk-in'))
+        self.assertRedirects(response, '/', fetch_redirect_response=False)
+        self.assertTrue(await Reservation.objects.filter(name='Walk-in').aexists())
+        self.assertFalse(await ReservationSlot.objects.aexists())
+
+    @override_settings(DEBUG=True)
+    def test_middleware_chain_runs_async(self):
+        """Test no middleware has to be adapted to a thread under ASGI"""
+        with self.assertNoLogs('django.request', 'DEBUG'):
+            ASGIHandler()
+
+    @override_settings(ROOT_URLCONF='my_project.urls')
+    async def test_asgi_application_routes_to_async_views(self):
+        """Test my_project.asgi gives its own requests the async URLconf, leaving ROOT_URLCONF alone"""
+        from my_project.asgi import application
+        request = RequestFactory().get('/')
+        with mock.patch.object(ASGIHandler, 'get_response_async') as get_response:
+            await application.get_response_async(request)
+        get_response.assert_awaited_once_with(request)
+        self.assertIs(resolve('/', urlconf=request.urlconf).func, async_views.index)
+        self.assertEqual(settings.ROOT_URLCONF, 'my_project.urls')
+        self.assertNotIn('DJANGO_ROOT_URLCONF', os.environ)
+
+
+class StaticFilesMiddlewareTests(TestCase):
+    """Test cases for the async-capable WhiteNoise middleware"""
+
+    async def test_serves_static_files_on_event_loop(self):
+        """Test static files are streamed asynchronously and other paths reach the app"""
+        with tempfile.TemporaryDirectory() as root:
+            with open(os.path.join(root, 'site.css'), 'w') as f:
+                f.write('body { color: green; }')
+
+            async def app(request):
+                return HttpResponse('app')
+
+            with override_settings(STATIC_ROOT=root, WHITENOISE_AUTOREFRESH=False, WHITENOISE_USE_FINDERS=False):
+                middleware = WhiteNoiseMiddleware(app)
+            response = await middleware(RequestFactory().get('/static/site.css'))
+            self.assertTrue(response.is_async)
+            self.assertEqual(b''.join([chunk async for chunk in response]), b'body { color: green; }')
+            response.close()
+            response = await middleware(RequestFactory().get('/menu/'))
+            self.assertEqual(response.content, b'app')
+
+
+class LoadTestTests(LiveServerTestCase):
+    """Test cases for the deployment load test"""
+
+    def test_run_reports_throughput(self):
+        """Test a short run against the live server counts every request"""
+        result = run_loadtest(self.live_server_url, ['/', '/reservations/availability/?date=2030-01-07'], requests=6, concurrency=3)
+        self.assertEqual((result['requests'], result['errors']), (6, 0))
+        self.assertGreater(result['throughput'], 0)
+        self.assertLessEqual(result['p50_ms'], result['p95_ms'])
+
+    def test_command_prints_one_row_per_deployment(self):
+        """Test the command compares each deployment given"""
+        out = io.StringIO()
+        call_command('loadtest', self.live_server_url, '--requests', '4', '--concurrency', '2', stdout=out)
+        lines = out.getvalue().splitlines()
+        self.assertEqual(len(lines), 2)
+        self.assertTrue(lines[1].startswith(self.live_server_url))
+        self.assertTrue(lines[1].endswith(' 0'))
+
+    # Passwords on: the shipped signup fields make allauth's login passwordless.
+    @override_settings(RESERVATION_RATE_LIMITS={}, ACCOUNT_SIGNUP_FIELDS=['username*', 'email*', 'password1*'])
+    def test_mix_replays_every_scenario(self):
+        """Test the traffic mix browses, books, signs in and uses the admin without errors"""
+        User.objects.create_superuser(username='boss', email='boss@example.com', password='testpass123')
+        mix = {'menu': 1, 'reserve': 1, 'login': 1, 'admin': 1}
+        report = run_mix(self.live_server_url, mix, stages=[2], duration=1.5, ramp=0.2, credentials=('boss', 'testpass123'))
+        stage = report['stages'][0]
+        self.assertEqual(stage['concurrency'], 2)
+        self.assertEqual(stage['total']['errors'], 0)
+        for name in mix:
+            self.assertGreater(stage['scenarios'][name]['requests'], 0, name)
+        self.assertTrue(Reservation.objects.filter(name='Load Test').exists())
+
+    def test_command_reports_and_compares_runs(self):
+        """Test the mix command saves JSON and Markdown reports and compares with a baseline"""
+        with tempfile.TemporaryDirectory() as tmp:
+            report, markdown = os.path.join(tmp, 'run.json'), os.path.join(tmp, 'run.md')
+            options = ['--mix', 'menu=1', '--stages', '1,2', '--duration', '0.5', '--ramp', '0']
+            call_command('loadtest', self.live_server_url, *options, '--json', report, stdout=io.StringIO())
+            with open(report) as f:
+                stages = json.load(f)[self.live_server_url]['stages']
+            self.assertEqual([stage['concurrency'] for stage in stages], [1, 2])
+            self.assertEqual(set(stages[0]['scenarios']), {'menu'})
+            call_command('loadtest', self.live_server_url, *options, '--baseline', report, '--markdown', markdown,
+                         stdout=io.StringIO())
+            with open(markdown) as f:
+                table = f.read()
+        self.assertIn('| users | scenario | requests | req/s |', table)
+        self.assertRegex(table, r'\| 2 \| menu \| \d+ \| [\d.]+ \([+-]\d+%\) \|')
+
+    def test_command_checks_mix_before_running(self):
+        """Test bad mixes, missing staff credentials, passwordless logins and remote bookings are refused up front"""
+        with self.assertRaisesMessage(CommandError, "Unknown scenario 'checkout'"):
+            call_command('loadtest', self.live_server_url, '--mix', 'menu=5,checkout=1')
+        with self.assertRaisesMessage(CommandError, 'pass --username and --password'):
+            call_command('loadtest', self.live_server_url, '--mix')
+        credentials = ['--username', 'boss', '--password', 'testpass123']
+        with self.assertRaisesMessage(CommandError, "add 'password1*' to ACCOUNT_SIGNUP_FIELDS"):
+            call_command('loadtest', self.live_server_url, '--mix', 'login=1', *credentials)
+        with self.assertRaisesMessage(CommandError, 'books real tables at https://example.com: pass --allow-bookings'):
+            call_command('loadtest', 'https://example.com', '--mix', 'menu=5,reserve=1')
+
+    def test_default_mix_follows_login_settings(self):
+        """Test the default mix only signs in through allauth when its login form takes a password"""
+        self.assertEqual(default_mix(), {'menu': 70, 'reserve': 15, 'admin': 5})
+        with override_settings(ACCOUNT_SIGNUP_FIELDS=['username*', 'email*', 'password1*']):
+            self.assertEqual(default_mix(), {'menu': 70, 'reserve': 15, 'login': 10, 'admin': 5})
+
+    @override_settings(RESERVATION_RATE_LIMITS={})
+    def test_command_deletes_local_bookings(self):
+        """Test bookings made on this machine are deleted after the run, and served runs book into a copy"""
+        out = io.StringIO()
+        call_command('loadtest', self.live_server_url, '--mix', 'reserve=1', '--stages', '1', '--duration', '0.5',
+                     '--ramp', '0', stdout=out)
+        self.assertRegex(out.getvalue(), r'Deleted [1-9]\d* load test reservation\(s\)\.')
+        self.assertFalse(Reservation.objects.filter(name='Load Test').exists())
+
+        Category.objects.create(name='Starters')
+        with scratch_database() as env:
+            copy = env['DATABASE_URL'].removeprefix('sqlite:///')
+            with closing(sqlite3.connect(copy)) as database:
+                self.assertEqual(database.execute('SELECT name FROM dishes_category').fetchall(), [('Starters',)])
+        self.assertFalse(os.path.exists(copy))
+
+
+class ReservationSummaryTests(TestCase):
+    """Test cases for the per-day reservation summary and its dashboard"""
+
+    def setUp(self):
+        """Set up test data"""
+        self.day = date(2025, 3, 14)  # A Friday
+        self.reservations = [
+            Reservation.objects.create(
+                name=f'Guest {i}', email=f'guest{i}@example.com', guests=guests,
+                date=self.day, time=time(19, 0), status=status
+            )
+            for i, (guests, status) in enumerate(((2, 0), (4, 0), (3, 1), (5, 2)))
+        ]
+
+    def summary(self, slot_time=time(19, 0), day=None):
+        return ReservationDaySummary.objects.values('pending', 'confirmed', 'cancelled', 'guests').get(
+            date=day or self.day, time=slot_time
+        )
+
+    def test_saves_and_deletes_update_summary(self):
+        """Test creating, editing and deleting reservations keeps the counts right"""
+        self.assertEqual(self.summary(), {'pending': 2, 'confirmed': 1, 'cancelled': 1, 'guests': 9})
+        first = self.reservations[0]
+        first.status = 1
+        first.guests = 6
+        first.save()
+        self.assertEqual(self.summary(), {'pending': 1, 'confirmed': 2, 'cancelled': 1, 'guests': 13})
+        first.time = time(20, 0)
+        first.save()
+        self.assertEqual(self.summary(), {'pending': 1, 'confirmed': 1, 'cancelled': 1, 'guests': 7})
+        self.assertEqual(self.summary(time(20, 0)), {'pending': 0, 'confirmed': 1, 'cancelled': 0, 'guests': 6})
+        self.reservations[1].delete()
+        self.assertEqual(self.summary(), {'pending': 0, 'confirmed': 1, 'cancelled': 1, 'guests': 3})
+
+    def test_admin_bulk_action_updates_summary(self):
+        """Test the bulk status actions move the counts with one update per slot"""
+        self.client.force_login(User.objects.create_superuser(username='boss', password='testpass123'))
+        with CaptureQueriesContext(connection) as queries:
+            self.client.post(reverse('admin:dishes_reservation_changelist'), {
+                'action': 'mark_as_cancelled',
+                '_selected_action': list(Reservation.objects.values_list('pk', flat=True)),
+            })
+        self.assertEqual(self.summary(), {'pending': 0, 'confirmed': 0, 'cancelled': 4, 'guests': 0})
+        summary_updates = [q for q in queries if q['sql'].startswith('UPDATE "dishes_reservationdaysummary"')]
+        self.assertEqual(len(summary_updates), 1)
+
+    def test_rebuild_repairs_drift(self):
+        """Test the rebuild command recomputes the summary after unsignalled writes"""
+        Reservation.objects.filter(status=0).update(status=2)  # Bypasses the signals
+        out = io.StringIO()
+        call_command('rebuild_reservation_summary', stdout=out)
+        self.assertIn('1 slot(s)', out.getvalue())
+        self.assertEqual(self.summary(), {'pending': 0, 'confirmed': 1, 'cancelled': 3, 'guests': 3})
+        self.assertEqual(list(summary_rows()), list(ReservationDaySummary.objects.values(
+            'date', 'time', 'pending', 'confirmed', 'cancelled', 'guests'
+        )))
+
+    def test_dashboard_shows_occupancy(self):
+        """Test the dashboard lists each slot with its capacity and is read-only"""
+        SlotCapacity.objects.create(weekday=self.day.weekday(), time=time(19, 0), tables=5, covers=18)
+        self.client.force_login(User.objects.create_superuser(username='boss', password='testpass123'))
+        response = self.client.get(reverse('admin:dishes_reservationdaysummary_changelist'))
+        self.assertContains(response, '<td class="field-occupancy">50%</td>', html=True)
+        self.assertNotContains(response, reverse('admin:dishes_reservationdaysummary_add'))
+
+
+class ConnectionSettingsTests(TestCase):
+    """Test cases for the database connection settings and their benchmark"""
+
+    def test_sqlite_pragmas(self):
+        """Test local SQLite connections wait for locks and leave the journal mode alone unless asked"""
+        if connection.vendor != 'sqlite':
+            self.skipTest('SQLite only')
+        self.assertNotIn('init_command', connection.settings_dict['OPTIONS'])
+        self.assertNotIn('transaction_mode', connection.settings_dict['OPTIONS'])
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA journal_mode')
+            self.assertNotEqual(cursor.fetchone()[0], 'wal')
+            cursor.execute('PRAGMA busy_timeout')
+            self.assertGreater(cursor.fetchone()[0], 0)
+        self.assertTrue(connection.settings_dict['CONN_HEALTH_CHECKS'])
+
+    def test_benchmark_counts_connections(self):
+        """Test the benchmark opens a connection per request only without reuse"""
+        out = io.StringIO()
+        call_command('benchmark_connections', '--requests', '5', stdout=out)
+        rows = {line[:24].strip(): line[24:].split() for line in out.getvalue().splitlines()[1:]}
+        self.assertEqual(rows['no reuse'][0], '5')
+        self.assertEqual(rows['persistent, unchecked'][0], '1')
+        self.assertEqual(rows['configured'][0], '1')
+
+
+class ResponsiveStaticFilesTests(TestCase):
+    """Test cases for the responsive image variants made by collectstatic"""
+
+    def render(self, name):
+        return Template('{% load responsive_images %}{% responsive_image name alt="Dining room" %}').render(
+            Context({'name': name})
+        )
+
+    def test_plain_image_before_collectstatic(self):
+        """Test the tag falls back to an unhashed <img> while there is no manifest"""
+        self.assertHTMLEqual(
+            self.render('img/hero.png'),
+            '<img src="/static/img/hero.png" alt="Dining room" loading="lazy" decoding="async">',
+        )
+
+    def test_settings_keep_manifest_storage(self):
+        """Test only the test runner swaps the storage; the project settings hash static files"""
+        from my_project import settings as project_settings
+        self.assertEqual(project_settings.STORAGES['staticfiles']['BACKEND'], 'dishes.staticfiles.ResponsiveStaticFilesStorage')
+        self.assertEqual(settings.STORAGES['staticfiles']['BACKEND'], 'django.contrib.staticfiles.storage.StaticFilesStorage')
+
+    def test_missing_manifest_fails_outside_debug(self):
+        """Test URLs stay unhashed without a manifest only in development"""
+        with tempfile.TemporaryDirectory() as root:
+            storage = ResponsiveStaticFilesStorage(location=root)
+            with override_settings(DEBUG=True):
+                self.assertEqual(storage.stored_name('site.css'), 'site.css')
+            with self.assertRaisesMessage(ValueError, "Missing staticfiles manifest entry for 'site.css'"):
+                storage.stored_name('site.css')
+
+    @unittest.skipIf(Image is None, 'Pillow is not installed')
+    def test_collectstatic_creates_hashed_variants(self):
+        """Test collectstatic saves hashed, narrower AVIF/WebP variants and precompressed text"""
+        with tempfile.TemporaryDirectory() as source, tempfile.TemporaryDirectory() as root:
+            os.makedirs(os.path.join(source, 'img'))
+            Image.new('RGB', (1000, 500), 'orange').save(os.path.join(source, 'img', 'hero.png'))
+            Image.new('P', (64, 64)).save(os.path.join(source, 'img', 'icon.png'))
+            with open(os.path.join(source, 'site.css'), 'w') as f:
+                f.write('body { background: url("img/hero.png"); }' * 50)
+
+            with override_settings(
+                STATIC_ROOT=root, STATICFILES_DIRS=[source], RESPONSIVE_IMAGE_FORMATS=['webp'],
+                STATICFILES_FINDERS=['django.contrib.staticfiles.finders.FileSystemFinder'],
+                STORAGES={**settings.STORAGES, 'staticfiles': {'BACKEND': 'dishes.staticfiles.ResponsiveStaticFilesStorage'}},
+            ):
+                call_command('collectstatic', interactive=False, verbosity=0)
+                variants = staticfiles_storage.image_variants('img/hero.png')
+                self.assertEqual([w for w, _ in variants['webp']], [480, 960, 1000])
+                self.assertEqual([w for w, _ in variants['png']], [480, 960])
+                self.assertEqual(staticfiles_storage.image_variants('img/icon.png'), {})
+                hashed = staticfiles_storage.stored_name('img/hero-480w.webp')
+                self.assertRegex(hashed, r'^img/hero-480w\.[0-9a-f]{12}\.webp$')
+                with Image.open(os.path.join(root, hashed)) as variant:
+                    self.assertEqual((variant.format, variant.size), ('WEBP', (480, 240)))
+                self.assertTrue(os.path.exists(os.path.join(root, staticfiles_storage.stored_name('site.css') + '.gz')))
+
+                html = self.render('img/hero.png')
+                self.assertIn(f'<source type="image/webp" srcset="/static/{hashed} 480w, ', html)
+                self.assertIn('/static/img/hero.', html)
+                self.assertIn('1000w" sizes="100vw" alt="Dining room"', html)
+
+
+
+class SearchTests(TestCase):
+    """Test cases for the full-text menu search"""
+
+    def setUp(self):
+        """Set up test data"""
+        self.chef = User.objects.create_user(username='chef', password='testpass123')
+        self.mains = Category.objects.create(name='Main Course')
+        self.drinks = Category.objects.create(name='Drinks')
+        self.ndole = Dishes.objects.create(
+            title='Ndole', slug='ndole', author=self.chef, category=self.mains, price=12, status=1,
+            description='Bitter leaves stewed with peanuts and prawns',
+        )
+        Dishes.objects.create(
+            title='Peanut Soup', slug='peanut-soup', author=self.chef, category=self.mains, price=8, status=1,
+        )
+        Dishes.objects.create(title='Koki', slug='koki', author=self.chef, category=self.mains, description='Peanuts', status=0)
+        Drink.objects.create(title='Crème Sour', slug='creme-sour', author=self.chef, category=self.drinks, price=4, status=1)
+
+    def titles(self, query):
+        return [document.title for document in search_menu(query)]
+
+    def test_ranked_prefix_search(self):
+        """Test title matches rank first, words match as stemmed prefixes and drafts stay hidden"""
+        self.assertEqual(self.titles('peanut'), ['Peanut Soup', 'Ndole'])
+        self.assertEqual(self.titles('PRAWN stew'), ['Ndole'])
+        self.assertEqual(self.titles('creme'), ['Crème Sour'])
+        self.assertEqual(self.titles('drinks'), ['Crème Sour'])  # Category names are indexed too
+        self.assertEqual(self.titles('"*) OR ('), [])  # Operators are not passed through
+
+    def test_index_follows_saves(self):
+        """Test saving, renaming and deleting keep the documents current"""
+        self.ndole.title = 'Ndole Royale'
+        self.ndole.save()
+        self.assertEqual(self.titles('royale'), ['Ndole Royale'])
+        self.mains.name = 'Specials'
+        self.mains.save()
+        self.assertEqual(set(self.titles('specials')), {'Ndole Royale', 'Peanut Soup'})
+        self.mains.delete()
+        self.assertEqual(self.titles('specials'), [])
+        self.ndole.delete()
+        self.assertFalse(SearchDocument.objects.filter(kind='dish', object_id=self.ndole.pk).exists())
+
+    def test_admin_search_and_bulk_publish(self):
+        """Test the admin searches the index and its bulk actions publish documents"""
+        self.client.force_login(User.objects.create_superuser(username='boss', password='testpass123'))
+        changelist = reverse('admin:dishes_dishes_changelist')
+        response = self.client.get(changelist, {'q': 'peanut'})
+        self.assertEqual(
+            {dish.title for dish in response.context['cl'].result_list}, {'Ndole', 'Koki', 'Peanut Soup'}
+        )
+        self.assertEqual(self.titles('peanuts'), ['Peanut Soup', 'Ndole'])
+        self.client.post(changelist, {
+            'action': 'change_status_to_published',
+            '_selected_action': list(Dishes.objects.filter(title='Koki').values_list('pk', flat=True)),
+        })
+        self.assertIn('Koki', self.titles('peanuts'))
+
+    def test_home_page_search(self):
+        """Test ?q= shows the matching items instead of the cached menu, in one search query"""
+        self.client.get('/')  # Sets the CSRF cookie
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/', {'q': 'peanut'})
+        self.assertContains(response, '2 results for')
+        self.assertContains(response, 'value="peanut"')
+        self.assertNotContains(response, 'Crème Sour')
+        self.assertNotIn('X-Menu-Cache', response)
+        self.assertNotIn('ETag', response)
+        self.assertEqual(len([q for q in queries if 'dishes_searchdocument' in q['sql']]), 1)
+
+    def test_match_uses_full_text_index(self):
+        """Test the match is answered by the FTS5 index rather than a table scan"""
+        if connection.vendor != 'sqlite':
+            self.skipTest('FTS5 is SQLite only')
+        sql, params = match_sql(['peanut'])
+        with connection.cursor() as cursor:
+            cursor.execute('EXPLAIN QUERY PLAN ' + sql, params)
+            plan = ' '.join(row[-1] for row in cursor.fetchall())
+        self.assertIn('VIRTUAL TABLE INDEX', plan)
+
+    def test_rebuild_command(self):
+        """Test the rebuild command restores documents lost to unsignalled writes"""
+        SearchDocument.objects.all().delete()
+        out = io.StringIO()
+        call_command('rebuild_search_index', stdout=out)
+        self.assertIn('Indexed 4 dishes and drinks.', out.getvalue())
+        self.assertEqual(self.titles('ndole'), ['Ndole'])
+
+
+@override_settings(RESERVATION_RATE_LIMITS={'ip': '3/m', 'email': '2/h'})
+class RateLimitTests(TestCase):
+    """Test cases for the reservation rate limits"""
+
+    def setUp(self):
+        """Set up test data"""
+        ratelimit.get_cache().clear()
+        self.day = date.today() + timedelta(days=7)
+
+    def booking(self, email):
+        return {'name': 'Guest', 'email': email, 'guests': 2, 'date': self.day.isoformat(), 'time': '19:00'}
+
+    def test_ip_limit(self):
+        """Test an IP over its limit gets a 429 without touching the database"""
+        for i in range(3):
+            response = self.client.post(reverse('reserve'), self.booking(f'guest{i}@example.com'))
+            self.assertEqual(response.status_code, 302)
+        with self.assertNumQueries(0):
+            response = self.client.post(reverse('reserve'), self.booking('guest9@example.com'))
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response['Retry-After'], '20')
+        # The home page's legacy reservation POST shares the limit
+        self.assertEqual(self.client.post(reverse('home'), self.booking('guest9@example.com')).status_code, 429)
+        other = self.client.post(reverse('reserve'), self.booking('guest9@example.com'), REMOTE_ADDR='10.0.0.2')
+        self.assertEqual(other.status_code, 302)
+        self.assertEqual(Reservation.objects.count(), 4)
+
+    def test_rejected_requests_spend_no_tokens(self):
+        """Test a request the e-mail bucket turns away leaves the IP bucket untouched"""
+        for _ in range(2):
+            self.assertEqual(self.client.post(reverse('reserve'), self.booking('ada@example.com')).status_code, 302)
+        for _ in range(3):  # Over the e-mail limit, within what the IP has left
+            self.assertEqual(self.client.post(reverse('reserve'), self.booking('ada@example.com')).status_code, 429)
+        # The IP spent two of its three tokens, not five.
+        self.assertEqual(self.client.post(reverse('reserve'), self.booking('bob@example.com')).status_code, 302)
+        self.assertEqual(self.client.post(reverse('reserve'), self.booking('eve@example.com')).status_code, 429)
+
+    @override_settings(RESERVATION_RATE_LIMIT_TRUSTED_PROXIES=1)
+    def test_clients_behind_proxy(self):
+        """Test clients reaching the app through the same proxy get their own IP limit"""
+        def post(forwarded_for, email):
+            return self.client.post(
+                reverse('reserve'), self.booking(email), REMOTE_ADDR='10.1.0.1', HTTP_X_FORWARDED_FOR=forwarded_for
+            )
+        for i in range(3):
+            self.assertEqual(post('203.0.113.5', f'guest{i}@example.com').status_code, 302)
+        # A forged entry in front of the proxy's does not help the first client.
+        self.assertEqual(post('198.51.100.1, 203.0.113.5', 'guest8@example.com').status_code, 429)
+        self.assertEqual(post('203.0.113.6', 'guest9@example.com').status_code, 302)
+        with override_settings(RESERVATION_RATE_LIMIT_TRUSTED_PROXIES=0):  # The header is ignored.
+            self.assertEqual(post('192.0.2.7', 'guest10@example.com').status_code, 302)
+
+    def test_local_memory_cache_deploy_warning(self):
+        """Test check --deploy warns when each worker would keep its own buckets"""
+        self.assertEqual([w.id for w in ratelimit.shared_cache_check(None)], ['dishes.W001'])
+        with override_settings(RESERVATION_RATE_LIMITS={}):
+            self.assertEqual(ratelimit.shared_cache_check(None), [])
+
+    def test_email_limit(self):
+        """Test an e-mail address is limited across IPs, ignoring case"""
+        for i, email in enumerate(['Ada@Example.com', 'ada@example.com ', 'ADA@example.com']):
+            response = self.client.post(
+                reverse('reserve'), self.booking(email), REMOTE_ADDR=f'10.0.0.{i}', HTTP_ACCEPT='application/json'
+            )
+        self.assertEqual(response.status_code, 429)
+        self.assertFalse(response.json()['ok'])
+        self.assertEqual(int(response['Retry-After']), 1800)
+
+    def test_bucket_refills(self):
+        """Test tokens come back at the configured rate"""
+        with mock.patch('dishes.ratelimit.time.time', return_value=1000.0):
+            for i in range(4):
+                response = self.client.post(reverse('reserve'), self.booking(f'guest{i}@example.com'))
+            self.assertEqual(response.status_code, 429)
+        with mock.patch('dishes.ratelimit.time.time', return_value=1020.0):  # One token per 20s
+            self.assertEqual(self.client.post(reverse('reserve'), self.booking('guest5@example.com')).status_code, 302)
+            self.assertEqual(self.client.post(reverse('reserve'), self.booking('guest6@example.com')).status_code, 429)
+
+    @override_settings(ROOT_URLCONF='my_project.urls_async')
+    async def test_async_reserve_limited(self):
+        """Test the async reservation view shares the limits"""
+        for i in range(3):
+            await self.async_client.post('/reservations/', self.booking(f'guest{i}@example.com'))
+        response = await self.async_client.post('/reservations/', self.booking('guest9@example.com'))
+        self.assertEqual(response.status_code, 429)
+
+    def test_invalid_rate(self):
+        """Test malformed rates are reported as configuration errors"""
+        self.assertEqual(ratelimit.parse_rate('3/15m'), (3, 900))
+        with self.assertRaises(ImproperlyConfigured):
+            ratelimit.parse_rate('ten per hour')
+
+
+@override_settings(ADMIN_EXACT_COUNT_LIMIT=5)
+class AdminPaginationTests(TestCase):
+    """Test cases for the estimated counts and keyset pages of the admin lists"""
+
+    def setUp(self):
+        """Set up test data"""
+        self.client.force_login(User.objects.create_superuser(username='boss', password='testpass123'))
+        Reservation.objects.bulk_create(
+            Reservation(name=f'Guest {i}', email='guest@example.com', guests=2, date=date(2025, 3, 14), time=time(19, 0))
+            for i in range(7)
+        )
+        # Ties on created_on are broken by the primary key.
+        Reservation.objects.filter(name__in=['Guest 2', 'Guest 3', 'Guest 4']).update(
+            created_on=timezone.now() - timedelta(days=1)
+        )
+
+    @override_settings(ADMIN_EXACT_COUNT_LIMIT=1000)
+    def test_exact_count_below_limit(self):
+        """Test short lists are counted exactly"""
+        response = self.client.get(reverse('admin:dishes_reservation_changelist'))
+        self.assertEqual(response.context['cl'].result_count, 7)
+        self.assertIsNone(response.context['cl'].paginator.estimated)
+
+    def test_estimated_count_above_limit(self):
+        """Test long lists report a lower bound, or the ANALYZE estimate once there is one"""
+        url = reverse('admin:dishes_reservation_changelist')
+        self.assertContains(self.client.get(url), 'over 5 Reservations')
+        if connection.vendor == 'sqlite':
+            with connection.cursor() as cursor:
+                cursor.execute('ANALYZE dishes_reservation')
+            Reservation.objects.bulk_create(
+                Reservation(name='Late', email='late@example.com', guests=2, date=date(2025, 3, 14), time=time(19, 0))
+                for _ in range(3)
+            )
+            self.assertContains(self.client.get(url), 'about 7 Reservations')  # Stale until the next ANALYZE
+
+    @mock.patch('dishes.admin.ReservationAdmin.list_per_page', 2)
+    def test_keyset_pages_cover_every_row_once(self):
+        """Test following the Older links visits every reservation once, newest first"""
+        url = reverse('admin:dishes_reservation_changelist') + '?status__exact=0'
+        seen = []
+        while url:
+            cl = self.client.get(url).context['cl']
+            self.assertTrue(cl.keyset)
+            seen += [r.pk for r in cl.result_list]
+            url = cl.next_url and reverse('admin:dishes_reservation_changelist') + cl.next_url
+            self.assertIn('status__exact=0', url or 'status__exact=0')
+        self.assertEqual(seen, list(Reservation.objects.order_by('-created_on', '-pk').values_list('pk', flat=True)))
+
+    def test_keyset_pages_walk_an_index(self):
+        """Test no reservation list query grows with the table: no date hierarchy, no sort step"""
+        for params in ({}, {'status__exact': 0}):
+            with CaptureQueriesContext(connection) as queries:
+                self.client.get(reverse('admin:dishes_reservation_changelist'), params)
+            selects = [q['sql'] for q in queries if q['sql'].startswith('SELECT') and 'dishes_reservation' in q['sql']]
+            self.assertFalse([sql for sql in selects if 'MIN(' in sql or 'DISTINCT' in sql], selects)
+            if connection.vendor == 'sqlite':
+                with connection.cursor() as cursor:
+                    cursor.execute('EXPLAIN QUERY PLAN ' + selects[0])
+                    plan = [row[-1] for row in cursor.fetchall()]
+                self.assertFalse([step for step in plan if 'TEMP B-TREE' in step], plan)
+
+    def test_sorted_lists_page_by_number(self):
+        """Test lists sorted by another column fall back to numbered pages"""
+        response = self.client.get(reverse('admin:dishes_reservation_changelist'), {'o': '1'})
+        self.assertFalse(response.context['cl'].keyset)
+        self.assertEqual(response.status_code, 200)
+
+    def test_invalid_cursor(self):
+        """Test a malformed cursor sends the user back to the first page"""
+        response = self.client.get(reverse('admin:dishes_reservation_changelist'), {'after': 'yesterday'})
+        self.assertRedirects(response, reverse('admin:dishes_reservation_changelist') + '?e=1')
+
+
+class DietaryTests(TestCase):
+    """Test cases for the dietary attributes and the menu's dietary filter"""
+
+    def setUp(self):
+        """Set up test data"""
+        self.chef = User.objects.create_user(username='chef', password='testpass123')
+        self.mains = Category.objects.create(name='Main Course', display_order=1)
+        self.juices = Category.objects.create(name='Juices', display_order=2)
+        VEGETARIAN, VEGAN, GLUTEN_FREE, SPICY = 1, 2, 4, 32
+        for title, diet in (('Ndole', SPICY), ('Koki', VEGETARIAN | VEGAN | GLUTEN_FREE), ('Puff-puff', VEGETARIAN)):
+            Dishes.objects.create(title=title, slug=title.lower(), author=self.chef, category=self.mains, dietary=diet, status=1)
+        Dishes.objects.create(title='Draft', slug='draft', author=self.chef, category=self.mains, dietary=VEGETARIAN)
+        Drink.objects.create(title='Folere', slug='folere', author=self.chef, category=self.juices,
+                             dietary=VEGETARIAN | VEGAN | GLUTEN_FREE, status=1)
+        bump_menu_version()
+
+    def test_menu_filter(self):
+        """Test ?diet= keeps the items with every ticked attribute, hiding emptied categories"""
+        response = self.client.get(reverse('home'), {'diet': ['vegetarian', 'gluten_free', 'bogus']})
+        content = response.content.decode()
+        self.assertIn('Koki', content)
+        self.assertIn('Folere', content)
+        self.assertNotIn('Puff-puff', content)
+        self.assertNotIn('Ndole', content)
+        self.assertIn('value="vegetarian" checked', content)
+        self.assertIn('Vegetarian, Vegan, Gluten-free', content)  # Item labels
+        response = self.client.get(reverse('home'), {'diet': 'spicy'})
+        self.assertNotContains(response, '<h3>Juices</h3>')
+        self.assertNotIn('ETag', response)
+
+    def test_filter_counts_in_one_query(self):
+        """Test the count of every attribute comes from a single aggregate over dishes and drinks"""
+        with self.assertNumQueries(1):
+            options = {option['name']: option['count'] for option in dietary_options()}
+        self.assertEqual(options, {
+            'vegetarian': 3, 'vegan': 2, 'gluten_free': 2, 'nut_free': 0, 'dairy_free': 0, 'spicy': 1,
+        })
+        options = {option['name']: option['count'] for option in dietary_options(1)}  # Vegetarian ticked
+        self.assertEqual((options['vegetarian'], options['vegan'], options['spicy']), (3, 2, 0))
+
+    def test_filter_uses_status_dietary_index(self):
+        """Test the filter seeks the (status, dietary) index instead of testing every row"""
+        if connection.vendor != 'sqlite':
+            self.skipTest('Checks the SQLite query plan')
+        queryset = Dishes.objects.filter(dietary__in=[1, 3, 5, 7], status=1).order_by().values('pk')
+        sql, params = queryset.query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute('EXPLAIN QUERY PLAN ' + sql, params)
+            plan = ' '.join(row[-1] for row in cursor.fetchall())
+        self.assertIn('dish_status_dietary_idx (status=? AND dietary=?)', plan)
+
+    def test_menu_api_filter(self):
+        """Test the JSON menu takes ?diet= and rejects unknown attributes"""
+        response = self.client.get(reverse('menu_api'), {'diet': 'vegan,gluten-free'})
+        titles = [item['title'] for group in response.json()['categories'] for item in group['items']]
+        self.assertEqual(titles, ['Koki', 'Folere'])
+        response = self.client.get(reverse('menu_api'), {'diet': 'halal'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_admin_checkboxes(self):
+        """Test the admin form edits the bitmask through checkboxes"""
+        koki = Dishes.objects.get(title='Koki')
+        self.client.force_login(User.objects.create_superuser(username='boss', password='testpass123'))
+        response = self.client.get(reverse('admin:dishes_dishes_change', args=[koki.pk]))
+        self.assertEqual(response.context['adminform'].form['dietary'].value(), [1, 2, 4])
+        response = self.client.post(reverse('admin:dishes_dishes_change', args=[koki.pk]), {
+            'title': 'Koki', 'slug': 'koki', 'author': self.chef.pk, 'category': self.mains.pk,
+            'description': '', 'price': '6.00', 'status': 1, 'dietary': ['1', '8'],
+        })
+        self.assertEqual(response.status_code, 302)
+        koki.refresh_from_db()
+        self.assertEqual(koki.dietary, 1 | 8)
+        response = self.client.get(reverse('admin:dishes_dishes_changelist'), {'diet': '8'})
+        self.assertEqual([dish.title for dish in response.context['cl'].result_list], ['Koki'])
+
+    def test_import_dietary_column(self):
+        """Test imports set attributes by name and keep them when the column is missing"""
+        User.objects.create_superuser(username='boss', password='testpass123')
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'menu.json')
+            for rows in (
+                [{'kind': 'dish', 'title': 'Eru', 'dietary': 'vegan; gluten-free', 'status': 'published'}],
+                [{'kind': 'dish', 'title': 'Eru', 'price': 9, 'status': 'published'}],
+            ):
+                with open(path, 'w') as f:
+                    json.dump(rows, f)
+                call_command('import_menu', path, stdout=io.StringIO())
+            self.assertEqual(Dishes.objects.get(title='Eru').dietary, 2 | 4)
+            with open(path, 'w') as f:
+                json.dump([{'kind': 'dish', 'title': 'Eru', 'dietary': ['halal']}], f)
+            with self.assertRaisesMessage(CommandError, "Row 1: Unknown dietary attribute 'halal'"):
+                call_command('import_menu', path, stdout=io.StringIO())
+
+
+class ReservationArchiveTests(TestCase):
+    """Test cases for archiving past reservations and the history over both tables"""
+
+    def setUp(self):
+        """Set up test data"""
+        today = timezone.localdate()
+        self.old_day = today - timedelta(days=400)
+        self.recent_day = today - timedelta(days=10)
+        self.old = [
+            Reservation.objects.create(
+                name=f'Old Guest {i}', email='regular@example.com', guests=2,
+                date=self.old_day, time=time(19, 0), status=i % 3,
+            )
+            for i in range(5)
+        ]
+        self.recent = Reservation.objects.create(
+            name='Recent Guest', email='regular@example.com', guests=4, date=self.recent_day, time=time(20, 0), status=1,
+        )
+        OutboxEmail.objects.create(reservation=self.old[1], kind='confirmed', to_email='regular@example.com',
+                                   subject='Confirmed', body='See you soon', status=1)
+
+    def test_command_moves_old_reservations_in_batches(self):
+        """Test the command moves reservations past the cutoff, batch by batch, keeping ids"""
+        out = io.StringIO()
+        call_command('archive_reservations', '--days', '365', '--dry-run', stdout=out)
+        self.assertIn('5 reservation(s)', out.getvalue())
+        self.assertEqual(Reservation.objects.count(), 6)
+        out = io.StringIO()
+        call_command('archive_reservations', '--days', '365', '--batch-size', '2', stdout=out)
+        self.assertEqual(out.getvalue().count('...'), 3)  # Batches of 2, 2 and 1
+        self.assertEqual(list(Reservation.objects.values_list('pk', flat=True)), [self.recent.pk])
+        archived = ReservationArchive.objects.get(pk=self.old[1].pk)
+        self.assertEqual((archived.name, archived.status, archived.created_on), ('Old Guest 1', 1, self.old[1].created_on))
+        self.assertIsNone(OutboxEmail.objects.get().reservation)  # The e-mail outlives its reservation
+        self.assertEqual(archive_batch(timezone.localdate() - timedelta(days=365)), 0)
+
+    def test_archiving_keeps_summary(self):
+        """Test archived reservations still count on the dashboard, also after a rebuild"""
+        counts = lambda: ReservationDaySummary.objects.values('pending', 'confirmed', 'cancelled', 'guests').get(
+            date=self.old_day, time=time(19, 0))
+        before = counts()
+        self.assertEqual(before, {'pending': 2, 'confirmed': 2, 'cancelled': 1, 'guests': 8})
+        call_command('archive_reservations', stdout=io.StringIO())
+        self.assertEqual(counts(), before)
+        call_command('rebuild_reservation_summary', stdout=io.StringIO())
+        self.assertEqual(counts(), before)
+        self.assertEqual(ReservationDaySummary.objects.count(), 2)
+
+    def test_history_reads_both_tables(self):
+        """Test the history admin page lists live and archived reservations in one query"""
+        call_command('archive_reservations', stdout=io.StringIO())
+        with self.assertNumQueries(1):
+            rows = history_rows('REGULAR@example.com')
+        self.assertEqual([(row['name'], row['archived']) for row in rows][:2], [('Recent Guest', False), ('Old Guest 4', True)])
+        self.assertEqual(len(rows), 6)
+        self.assertEqual(len(history_rows('old guest', limit=3)), 3)
+
+    def test_history_limits_each_table_by_index(self):
+        """Test each side of the history union reads only its newest rows, through its date index"""
+        if connection.vendor != 'sqlite':
+            self.skipTest('SQLite plans only')
+        call_command('archive_reservations', stdout=io.StringIO())
+        with CaptureQueriesContext(connection) as queries:
+            rows = history_rows(limit=2)
+        self.assertEqual([row['name'] for row in rows], ['Recent Guest', 'Old Guest 4'])
+        sql = queries.captured_queries[0]['sql']
+        self.assertEqual(sql.count(' LIMIT 2'), 3)  # Each side, then the union
+        with connection.cursor() as cursor:
+            cursor.execute('EXPLAIN QUERY PLAN ' + sql)
+            plan = [row[-1] for row in cursor.fetchall()]
+        self.assertIn('SCAN U0 USING INDEX reservation_archive_date_idx', plan)
+        self.assertFalse([step for step in plan if re.match(r'SCAN dishes_', step)], plan)
+
+        self.client.force_login(User.objects.create_superuser(username='boss', password='testpass123'))
+        self.assertContains(self.client.get(reverse('admin:dishes_reservation_changelist')),
+                            reverse('admin:dishes_reservation_history'))
+        response = self.client.get(reverse('admin:dishes_reservation_history'), {'q': 'regular@example.com'})
+        self.assertContains(response, reverse('admin:dishes_reservationarchive_change', args=[self.old[0].pk]))
+        self.assertContains(response, reverse('admin:dishes_reservation_change', args=[self.recent.pk]))
+        self.assertContains(response, '<td>Archived</td>', count=5)
+        response = self.client.get(reverse('admin:dishes_reservationarchive_change', args=[self.old[0].pk]))
+        self.assertEqual(response.status_code, 200)
+        self.assertNotContains(response, 'name="_save"')
@@ -1,64 +1,246 @@
 # dishes/views.py
 
+import hashlib
+import math
+from functools import wraps
+
 from django.shortcuts import render, redirect
+from django.template.loader import render_to_string
 from django.contrib import messages
-from .models import Dishes, Category, Drink, Reservation
+from django.contrib.admin.views.decorators import staff_member_required
+from django.conf import settings
+from asgiref.sync import iscoroutinefunction
+from django.http import HttpResponse, JsonResponse
+from django.utils.cache import patch_cache_control
+from django.utils.dateparse import parse_date
+from django.views.decorators.http import condition, require_GET, require_POST
+from .availability import SlotUnavailable, available_slots, book
 from .forms import ReservationForm
+from . import dietary, ratelimit
+from .menu import MENU_ITEM_FIELDS, get_menu_freshness, get_menu_html, menu_cache_stats, menu_items
+from .search import search_menu
+
+def wants_json(request):
+    # AJAX clients ask for JSON either explicitly or through the X-Requested-With header.
+    return (
+        'application/json' in request.headers.get('Accept', '')
+        or request.headers.get('X-Requested-With') == 'XMLHttpRequest'
+    )
+
+def too_many_requests(request, wait):
+    # A fixed, template-free answer: rejecting a flood must stay cheap.
+    retry_after = math.ceil(wait)
+    message = f'Too many reservation attempts. Please try again in {retry_after} seconds.'
+    if wants_json(request):
+        response = JsonResponse({'ok': False, 'message': message}, status=429)
+    else:
+        response = HttpResponse(message, status=429, content_type='text/plain; charset=utf-8')
+    response['Retry-After'] = retry_after
+    return response
+
+def rate_limited(view):
+    # Rejects reservations over the RESERVATION_RATE_LIMITS token buckets
+    # before the form, the database or a template is touched.
+    if iscoroutinefunction(view):
+        @wraps(view)
+        async def wrapper(request, *args, **kwargs):
+            wait = await ratelimit.acheck(request)
+            if wait:
+                return too_many_requests(request, wait)
+            return await view(request, *args, **kwargs)
+    else:
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            wait = ratelimit.check(request)
+            if wait:
+                return too_many_requests(request, wait)
+            return view(request, *args, **kwargs)
+    return wrapper
+
+@require_POST
+@rate_limited
+def reserve(request):
+    # Validates and books a reservation without touching the menu tables,
+    # so a booking costs a slot check and an INSERT instead of a full menu render.
+    form = ReservationForm(request.POST)
+    if form.is_valid():
+        try:
+            book(form.save(commit=False))
+        except SlotUnavailable as error: # Another booking took the last seats meanwhile.
+            form.add_error(None, str(error))
+    return reserve_response(request, form)
+
+def reserve_response(request, form):
+    # Answers a booking attempt once the form has been validated and saved.
+    if form.is_valid():
+        message = 'Reservation submitted successfully! We will contact you soon.'
+        if wants_json(request):
+            return JsonResponse({'ok': True, 'message': message}, status=201)
+        messages.success(request, message)
+        return redirect('home')
+
+    if wants_json(request):
+        return JsonResponse({'ok': False, 'errors': form.errors.get_json_data()}, status=400)
+    messages.error(request, 'Please correct the errors below.')
+    # Re-renders only the reservation form with its errors.
+    return render(request, 'dishes/reservation.html', {'form': form})
+
+AVAILABILITY_ERROR = 'Pass a valid ?date=YYYY-MM-DD and ?guests= count.'
+
+def availability_query(request):
+    # Reads ?date= and ?guests=, returning None when either is invalid.
+    try:
+        day = parse_date(request.GET.get('date', ''))
+        guests = int(request.GET.get('guests', 1))
+    except ValueError:
+        return None
+    if day is None or guests < 1:
+        return None
+    return day, guests
+
+def availability_response(day, guests, slots):
+    return JsonResponse({
+        'date': day,
+        'guests': guests,
+        'limited': slots is not None, # False when no capacity is configured for that weekday.
+        'slots': [
+            {'time': slot['time'].strftime('%H:%M'), 'tables_left': slot['tables_left'], 'covers_left': slot['covers_left']}
+            for slot in slots or []
+        ],
+    })
+
+@require_GET
+def availability(request):
+    # Answers "which slots on ?date= can still fit ?guests= people".
+    query = availability_query(request)
+    if query is None:
+        return JsonResponse({'error': AVAILABILITY_ERROR}, status=400)
+    day, guests = query
+    return availability_response(day, guests, available_slots(day, guests))
+
+def menu_validators(request):
+    # Conditional GET only applies when the page is the same for every repeat
+    # anonymous visit: no pending messages to show and a CSRF cookie already
+    # set, so the cached copy's form token stays valid. Folding a digest of
+    # that cookie into the ETag retires the cached copy when the token rotates.
+    # Search results (?q=) and dietary selections (?diet=) are not revalidated.
+    if not hasattr(request, '_menu_validators'):
+        request._menu_validators = None
+        csrf_cookie = request.COOKIES.get(settings.CSRF_COOKIE_NAME)
+        if (
+            request.method in ('GET', 'HEAD')
+            and csrf_cookie
+            and not search_query(request)
+            and not dietary_query(request)
+            and not request.user.is_authenticated
+            and not len(messages.get_messages(request))
+        ):
+            last_modified, menu_etag = get_menu_freshness()
+            request._menu_validators = (last_modified, validator_etag(menu_etag, csrf_cookie))
+    return request._menu_validators
+
+def validator_etag(menu_etag, csrf_cookie):
+    csrf_digest = hashlib.md5(csrf_cookie.encode()).hexdigest()[:8]
+    return f'"{menu_etag}-{csrf_digest}"'
 
+def index_last_modified(request):
+    validators = menu_validators(request)
+    return validators and validators[0]
+
+def index_etag(request):
+    validators = menu_validators(request)
+    return validators and validators[1]
+
+@condition(etag_func=index_etag, last_modified_func=index_last_modified)
 def index(request):
-    # Retrieve all published dishes from the database.
-    # Order them by the newest first.
-    dishes = Dishes.objects.filter(status=1).order_by('-created_on')
-    
-    # Retrieve all published drinks from the database.
-    # Order them alphabetically by title.
-    drinks = Drink.objects.filter(status=1).order_by('title')
-
-    # Define a custom order for categories
-    # based on user request: Appetizers, Main Courses, Desserts, then Drinks.
-    # Mapping to existing category names in the database.
-    custom_category_order_names = [
-        "Main Course",
-        "Soup",
-        "Street Food", # Can be considered as a type of appetizer or light meal
-        "Side Dish",
-        "Snack", # Often served before or with meals
-        "Dessert",
-        "Beers",
-        "Juices",
-        "Soft Drinks",
-    ]
-
-    # Retrieve categories in the desired order
-    ordered_categories = []
-    for category_name in custom_category_order_names:
+    # Reservations used to be posted to the home page; keep accepting them
+    # there but hand them straight to the reservation endpoint.
+    if request.method == 'POST':
+        return reserve(request)
+
+    # ?q= swaps the menu section for the matching dishes and drinks.
+    query = search_query(request)
+    if query:
+        return index_response(request, search_results_html(query, search_menu(query)), query=query)
+
+    # The menu section is rendered once per menu version (and dietary
+    # selection) and then served from the cache.
+    menu_html, cache_hit = get_menu_html(dietary_query(request))
+    return index_response(request, menu_html, cache_hit)
+
+def search_query(request):
+    return request.GET.get('q', '').strip()
+
+def dietary_query(request):
+    # The ?diet= attributes ticked in the menu's filter, as a bitmask; unknown names are ignored.
+    mask = 0
+    for name in request.GET.getlist('diet'):
         try:
-            category = Category.objects.get(name=category_name)
-            ordered_categories.append(category)
-        except Category.DoesNotExist:
-            # Skips categories not found in the database.
-            # This prevents errors if the list doesn't exactly match DB categories.
+            mask |= dietary.parse([name])
+        except ValueError:
             pass
+    return mask
 
-    # Handle reservation form submission
-    if request.method == 'POST':
-        form = ReservationForm(request.POST)
-        if form.is_valid():
-            form.save()
-            messages.success(request, 'Reservation submitted successfully! We will contact you soon.')
-            return redirect('home')
-        else:
-            messages.error(request, 'Please correct the errors below.')
-    else:
-        form = ReservationForm()
+def search_results_html(query, results):
+    return render_to_string('dishes/search_results.html', {'query': query, 'results': results})
 
+def index_response(request, menu_html, cache_hit=False, query=''):
     # The context to be passed to the template.
     context = {
-        'dishes': dishes,
-        'drinks': drinks, # Adds drinks to the context.
-        'categories': ordered_categories, # NEW: Adds categories in the custom order to the context.
-        'form': form, # Add reservation form to context
+        'menu_html': menu_html, # Published dishes and drinks grouped under the ordered categories, or search results.
+        'query': query, # The menu search, if any.
+        'form': ReservationForm(), # Add reservation form to context
     }
     
     # Renders the 'index.html' template and passes the context.
-    return render(request, 'dishes/index.html', context)
\ No newline at end of file
+    response = render(request, 'dishes/index.html', context)
+    if not query: # Search results bypass the menu cache.
+        response['X-Menu-Cache'] = 'hit' if cache_hit else 'miss'
+    # Browsers keep the page but revalidate it on every visit; the CSRF token
+    # inside makes it unfit for shared caches.
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+def menu_api_etag(request):
+    # The menu's validator, varied by the query string since it shapes the body.
+    _, menu_etag = get_menu_freshness()
+    query_digest = hashlib.md5(request.META.get('QUERY_STRING', '').encode()).hexdigest()[:8]
+    return f'"{menu_etag}-{query_digest}"'
+
+@require_GET
+@condition(etag_func=menu_api_etag)
+def menu_api(request):
+    # Read-only JSON menu: published dishes and drinks grouped by category.
+    # ?fields=title,price projects the item fields, ?category=1,2 filters by category id
+    # and ?diet=vegan,gluten_free by dietary attributes.
+    fields = MENU_ITEM_FIELDS
+    if request.GET.get('fields'):
+        fields = [f for f in request.GET['fields'].split(',') if f in MENU_ITEM_FIELDS]
+        if not fields:
+            return JsonResponse({'error': f"?fields= takes any of: {', '.join(MENU_ITEM_FIELDS)}."}, status=400)
+    categories = None
+    if request.GET.get('category'):
+        try:
+            categories = [int(c) for c in request.GET['category'].split(',')]
+        except ValueError:
+            return JsonResponse({'error': 'Pass ?category= as comma-separated category ids.'}, status=400)
+    try:
+        diet = dietary.parse(request.GET.get('diet', '').split(','))
+    except ValueError as error:
+        return JsonResponse({'error': str(error)}, status=400)
+
+    # Items arrive in menu order, so each category's items are contiguous.
+    groups = []
+    for item in menu_items(fields, categories, diet):
+        if not groups or groups[-1]['id'] != item.category_id:
+            groups.append({'id': item.category_id, 'name': item.category_name, 'items': []})
+        groups[-1]['items'].append({field: getattr(item, field) for field in fields})
+
+    response = JsonResponse({'categories': groups})
+    patch_cache_control(response, public=True, max_age=60)
+    return response
+
+@staff_member_required
+def menu_cache_status(request):
+    # Exposes the menu cache counters of this worker to staff.
+    return JsonResponse(menu_cache_stats())
\ No newline at end of file
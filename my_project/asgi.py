@@ -9,8 +9,20 @@ https://docs.djangoproject.com/en/4.2/howto/deployment/asgi/
 
 import os
 
-from django.core.asgi import get_asgi_application
+import django
+from django.core.handlers.asgi import ASGIHandler
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'my_project.settings')
 
-application = get_asgi_application()
+
+class AsyncViewsHandler(ASGIHandler):
+    # Serve the public pages with their async views; see my_project/urls_async.py.
+    urlconf = 'my_project.urls_async'
+
+    async def get_response_async(self, request):
+        request.urlconf = self.urlconf # Only this handler's requests, unlike changing ROOT_URLCONF.
+        return await super().get_response_async(request)
+
+
+django.setup(set_prefix=False) # As get_asgi_application() does.
+application = AsyncViewsHandler()
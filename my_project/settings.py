@@ -52,8 +52,9 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'dishes.profiling.ProfilingMiddleware', # Opt-in request profiling, see PROFILING_ENABLED below. Outermost so it times everything.
     'django.middleware.security.SecurityMiddleware',
-    'whitenoise.middleware.WhiteNoiseMiddleware', # Added WhiteNoise middleware for serving static files
+    'dishes.staticfiles.WhiteNoiseMiddleware', # WhiteNoise, also runnable without a thread under ASGI
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -69,7 +70,7 @@ ROOT_URLCONF = 'my_project.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'BACKEND': 'dishes.profiling.ProfiledDjangoTemplates', # DjangoTemplates that reports render time to the profiler
         'DIRS': [BASE_DIR / 'templates'], # Django will now look for templates here
         'APP_DIRS': True,
         'OPTIONS': {
@@ -85,14 +86,120 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'my_project.wsgi.application'
 
+# Request profiling (dishes.profiling.ProfilingMiddleware)
+# Adds Server-Timing headers and "dishes.profiling" log lines with wall time,
+# SQL count/time and template time to the sampled share of requests.
+PROFILING_ENABLED = os.environ.get('PROFILING_ENABLED', '') == '1'
+PROFILING_SAMPLE_RATE = float(os.environ.get('PROFILING_SAMPLE_RATE', 0.1))
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'dishes': {'handlers': ['console'], 'level': 'INFO'},
+    },
+}
+
 
 # Database
 # https://docs.djangoproject.com/en/4.2/ref/settings/#databases
 
 # Use dj_database_url to parse the DATABASE_URL environment variable from Heroku
+# Connections are kept for DB_CONN_MAX_AGE seconds and checked before each
+# request reuses them, so one the server dropped is replaced instead of
+# failing the request. `python manage.py benchmark_connections` measures it.
 DATABASES = {
-    'default': dj_database_url.config(default='sqlite:///db.sqlite3', conn_max_age=600)
+    'default': dj_database_url.config(
+        default='sqlite:///db.sqlite3',
+        conn_max_age=int(os.environ.get('DB_CONN_MAX_AGE', 600)),
+        conn_health_checks=os.environ.get('DB_CONN_HEALTH_CHECKS', '1') == '1',
+    )
+}
+
+if DATABASES['default']['ENGINE'] == 'django.db.backends.postgresql' and int(os.environ.get('DB_POOL_MAX_SIZE', 0)):
+    # psycopg's connection pool (needs psycopg[pool]): each request borrows a
+    # connection and hands it back, so workers share a few warm connections.
+    # Pooling replaces persistent connections, which Django does not allow together.
+    # https://docs.djangoproject.com/en/5.2/ref/databases/#connection-pool
+    DATABASES['default']['CONN_MAX_AGE'] = 0
+    DATABASES['default'].setdefault('OPTIONS', {})['pool'] = {
+        'min_size': int(os.environ.get('DB_POOL_MIN_SIZE', 2)),
+        'max_size': int(os.environ['DB_POOL_MAX_SIZE']),
+        'timeout': float(os.environ.get('DB_POOL_TIMEOUT', 10)),
+    }
+
+if DATABASES['default']['ENGINE'] == 'django.db.backends.sqlite3':
+    # Writers wait up to SQLITE_BUSY_TIMEOUT seconds for the lock instead of
+    # failing with "database is locked". Bookings write first (see
+    # dishes.availability.lock_slot), so they queue for the lock rather than
+    # fail on upgrading a read. SQLITE_JOURNAL_MODE=WAL lets readers carry on
+    # while a booking writes; it is opt-in because the mode is saved in the
+    # database file and keeps -wal/-shm files next to it.
+    # https://docs.djangoproject.com/en/5.2/ref/databases/#sqlite-init-command
+    DATABASES['default'].setdefault('OPTIONS', {})['timeout'] = float(os.environ.get('SQLITE_BUSY_TIMEOUT', 20))
+    if os.environ.get('SQLITE_JOURNAL_MODE'):
+        journal_mode = os.environ['SQLITE_JOURNAL_MODE'].upper()
+        DATABASES['default']['OPTIONS']['init_command'] = f"PRAGMA journal_mode={journal_mode};" + (
+            " PRAGMA synchronous=NORMAL;" if journal_mode == 'WAL' else '' # Still durable across app crashes under WAL.
+        )
+    # Test on a file rather than SQLite's shared in-memory database, whose table
+    # locks fail at once instead of waiting, so concurrent bookings serialise
+    # in tests the way they do on the real database.
+    DATABASES['default']['TEST'] = {'NAME': BASE_DIR / 'test_db.sqlite3'}
+
+
+# Cache
+# https://docs.djangoproject.com/en/4.2/topics/cache/
+
+# Local memory by default; point CACHE_BACKEND/CACHE_LOCATION at a shared
+# backend (file, database, redis) so every worker sees the same menu version.
+CACHES = {
+    'default': {
+        'BACKEND': os.environ.get('CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.environ.get('CACHE_LOCATION', 'cameroonian-table'),
+    }
+}
+
+# Seconds a rendered menu stays cached. Edits invalidate it straight away;
+# the timeout only bounds staleness when workers do not share a cache.
+MENU_CACHE_TIMEOUT = int(os.environ.get('MENU_CACHE_TIMEOUT', 300))
+
+# Reservation submissions allowed per client IP and per e-mail address, as
+# token buckets ("10/h": bursts of 10, then one every 6 minutes). Over the
+# limit, submissions get a 429 before any database work. The buckets live
+# in this cache; with local memory every worker keeps its own, so production
+# needs a shared one (check --deploy warns).
+RESERVATION_RATE_LIMITS = {
+    'ip': os.environ.get('RESERVATION_RATE_LIMIT_IP', '10/h'),
+    'email': os.environ.get('RESERVATION_RATE_LIMIT_EMAIL', '3/h'),
 }
+RESERVATION_RATE_LIMIT_CACHE = 'default'
+# Proxies in front of the app that append the client's address to
+# X-Forwarded-For: 1 behind the Heroku router. 0 uses REMOTE_ADDR, for
+# clients that connect directly and could forge the header.
+RESERVATION_RATE_LIMIT_TRUSTED_PROXIES = int(os.environ.get('RESERVATION_RATE_LIMIT_TRUSTED_PROXIES', 0))
+
+# `python manage.py archive_reservations` moves reservations whose date is
+# more than this many days past into the archive table, see dishes/archive.py.
+RESERVATION_ARCHIVE_DAYS = int(os.environ.get('RESERVATION_ARCHIVE_DAYS', 365))
+
+# Admin lists count their rows exactly up to this many and estimate beyond,
+# see dishes/pagination.py.
+ADMIN_EXACT_COUNT_LIMIT = int(os.environ.get('ADMIN_EXACT_COUNT_LIMIT', 10000))
+
+
+# E-mail
+# Reservation e-mails are queued in the outbox and sent by `manage.py send_outbox`.
+EMAIL_BACKEND = os.environ.get('EMAIL_BACKEND', 'django.core.mail.backends.console.EmailBackend')
+EMAIL_HOST = os.environ.get('EMAIL_HOST', 'localhost')
+EMAIL_PORT = int(os.environ.get('EMAIL_PORT', 587))
+EMAIL_HOST_USER = os.environ.get('EMAIL_HOST_USER', '')
+EMAIL_HOST_PASSWORD = os.environ.get('EMAIL_HOST_PASSWORD', '')
+EMAIL_USE_TLS = os.environ.get('EMAIL_USE_TLS', '1') == '1'
+DEFAULT_FROM_EMAIL = os.environ.get('DEFAULT_FROM_EMAIL', 'The Cameroonian Table <reservations@cameroonian-table.example>')
 
 
 # Password validation
@@ -138,7 +245,23 @@ STATICFILES_DIRS = [
 STATIC_ROOT = BASE_DIR / 'staticfiles'
 
 # WhiteNoise configuration for serving static files in production
-STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
+# STORAGES replaced STATICFILES_STORAGE, which Django 5.1 stopped reading.
+# collectstatic hashes every file (served with immutable, year-long cache
+# headers), precompresses text files with gzip and brotli and saves
+# AVIF/WebP images at the widths below; see dishes/staticfiles.py.
+# https://docs.djangoproject.com/en/5.2/ref/settings/#storages
+STORAGES = {
+    'default': {
+        'BACKEND': 'django.core.files.storage.FileSystemStorage',
+    },
+    'staticfiles': {
+        'BACKEND': 'dishes.staticfiles.ResponsiveStaticFilesStorage',
+    },
+}
+RESPONSIVE_IMAGE_WIDTHS = [480, 960, 1600]
+RESPONSIVE_IMAGE_FORMATS = ['avif', 'webp']
+# Renders test pages without collectstatic; see dishes/test_runner.py.
+TEST_RUNNER = 'dishes.test_runner.TestRunner'
 
 # Media files (for user-uploaded content like images)
 # MEDIA_URL: The URL that will handle media served from MEDIA_ROOT.
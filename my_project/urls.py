@@ -8,6 +8,10 @@ from dishes import views as dishes_views
 
 urlpatterns = [
     path('', dishes_views.index, name='home'),
+    path('reservations/', dishes_views.reserve, name='reserve'),
+    path('reservations/availability/', dishes_views.availability, name='availability'),
+    path('api/menu/', dishes_views.menu_api, name='menu_api'),
+    path('menu/cache-stats/', dishes_views.menu_cache_status, name='menu_cache_stats'),
     path('admin/', admin.site.urls),
      path('accounts/', include('allauth.urls')), # Allauth URLs for authentication
 ]
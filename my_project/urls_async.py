@@ -0,0 +1,16 @@
+# my_project/urls_async.py
+
+# URLconf of the ASGI deployment (see my_project/asgi.py): the public pages
+# are served by their async views, everything else as in my_project/urls.py.
+
+from django.urls import path
+from dishes import async_views
+from . import urls
+
+ASYNC_ROUTES = ('home', 'reserve', 'availability')
+
+urlpatterns = [
+    path('', async_views.index, name='home'),
+    path('reservations/', async_views.reserve, name='reserve'),
+    path('reservations/availability/', async_views.availability, name='availability'),
+] + [pattern for pattern in urls.urlpatterns if getattr(pattern, 'name', None) not in ASYNC_ROUTES]